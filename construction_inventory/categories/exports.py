@@ -0,0 +1,7 @@
+from core import exports
+from .views import CategoryList
+
+exports.register('categories', CategoryList, title='Категории', columns=[
+    exports.Column('name', 'Категория'),
+    exports.Column('product_count', 'Количество товаров'),
+])
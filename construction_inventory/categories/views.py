@@ -5,7 +5,10 @@ from django.urls import reverse_lazy
 from django.views.generic import ListView, CreateView, DeleteView, UpdateView
 from .forms import CategoryForm
 from django.db.models import Count
+from core.querybudget import query_budget
+from core.search import search_filter
 
+@query_budget(7)
 class CategoryList(LoginRequiredMixin, ListView):
     model = Category
     template_name = 'categories/category.html'
@@ -18,7 +21,7 @@ class CategoryList(LoginRequiredMixin, ListView):
 
         search_item = self.request.GET.get('search_name')
         if search_item:
-            queryset = queryset.filter(name__icontains=search_item)
+            queryset = queryset.filter(search_filter('id', 'category', search_item))
         
 
         return queryset
@@ -31,7 +34,7 @@ class CategoryList(LoginRequiredMixin, ListView):
             total=Count('products')
         )['total'] or 0
         context['total_active_categories'] = Category.objects.filter(
-        products__batches__quantity__gt=0).distinct().count() or 0
+        products__on_hand__gt=0).distinct().count() or 0
 
         return context
 
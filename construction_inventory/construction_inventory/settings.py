@@ -40,6 +40,7 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'simple_history',
+    'core',
     'products',
     'sales',
     'supplies',
@@ -49,6 +50,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.querybudget.QueryBudgetMiddleware',
+    'core.database.ReadOnlyRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.locale.LocaleMiddleware',
@@ -78,6 +81,8 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'construction_inventory.wsgi.application'
+# Асинхронные представления (виджеты аналитики) не держат поток под ASGI-сервером
+ASGI_APPLICATION = 'construction_inventory.asgi.application'
 
 
 # Database
@@ -89,6 +94,20 @@ DATABASES = {
         'NAME': BASE_DIR / 'db_new.sqlite3',
     }
 }
+# Второе соединение к тому же файлу для аналитики и выгрузок (core.database).
+# В тестах оно зеркалит default и отдельной базы не создаёт
+DATABASES['readonly'] = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
+DATABASE_ROUTERS = ['core.database.ReadOnlyRouter']
+
+# PRAGMA для каждого нового соединения SQLite (core.database.configure_connection)
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+    'temp_store': 'MEMORY',
+}
 
 
 
@@ -123,6 +142,21 @@ AUTH_USER_MODEL = 'users.CustomUser'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Фоновые задачи (core.jobs): базовая задержка повтора и время, после
+# которого выполняющаяся задача считается брошенной упавшим воркером, секунды
+JOB_RETRY_DELAY = 30
+JOB_STALE_AFTER = 60 * 60
+
 LOGIN_REDIRECT_URL = 'warehouse:batch-list'
 LOGOUT_REDIRECT_URL = 'users:login'
-LOGIN_URL = 'users:login'
\ No newline at end of file
+LOGIN_URL = 'users:login'
+
+# Сколько SQL-запросов допустимо на страницу без собственного @query_budget
+QUERY_BUDGET_DEFAULT = 20
+
+# Справочники для выпадающих списков (core.references) живут в кэше
+# процесса; актуальность проверяется по версии в базе, время жизни — страховка
+REFERENCE_CACHE_TIMEOUT = 60 * 60
+
+# Сколько секунд держать в кэше итоги над таблицей продаж
+SALES_SUMMARY_CACHE_TIMEOUT = 60
\ No newline at end of file
@@ -26,5 +26,6 @@ urlpatterns = [
     path('crm-system/sales/', include('sales.urls')),
     path('crm-system/supplies/', include('supplies.urls')),
     path('crm-system/categories/', include('categories.urls')),
+    path('crm-system/', include('core.urls')),
     path('crm-system/', include('users.urls')),
 ]
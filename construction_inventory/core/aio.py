@@ -0,0 +1,51 @@
+"""
+Помощники для асинхронных представлений.
+
+ORM Django синхронный, поэтому независимые запросы выполняются в потоках
+через sync_to_async(thread_sensitive=False): у каждого потока своё
+соединение SQLite, и в режиме WAL читатели работают параллельно.
+Время ответа равно самому долгому запросу, а не их сумме.
+
+Счётчики запросов (core.querybudget) переезжают в поток вместе с
+контекстом, а обёртка на соединения потока ставится в _isolated.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.views import redirect_to_login
+from django.db import connections
+
+from .querybudget import wrap_connections
+
+
+def _isolated(call):
+    def run():
+        try:
+            with wrap_connections():
+                return call()
+        finally:
+            # Соединение открыто в потоке пула: закрываем, чтобы не висело
+            connections.close_all()
+    return run
+
+
+async def run_queries(*calls):
+    """
+    Выполняет синхронные функции с запросами одновременно и возвращает
+    их результаты в том же порядке.
+    """
+    return await asyncio.gather(*(
+        sync_to_async(_isolated(call), thread_sensitive=False)() for call in calls
+    ))
+
+
+async def login_required(request):
+    """
+    Асинхронная замена LoginRequiredMixin: возвращает редирект на вход
+    для анонимного пользователя или None.
+    """
+    # request.user загружается из базы лениво, в async-контексте — через поток
+    authenticated = await sync_to_async(lambda: request.user.is_authenticated)()
+    if not authenticated:
+        return redirect_to_login(request.get_full_path())
+    return None
@@ -0,0 +1,20 @@
+from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+from django.utils.module_loading import autodiscover_modules
+
+
+class CoreConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "core"
+
+    def ready(self):
+        # Каждое приложение регистрирует свои выгрузки в <app>/exports.py
+        # и фоновые задачи в <app>/jobs.py
+        autodiscover_modules('exports')
+        autodiscover_modules('jobs')
+
+        from . import references
+        references.connect_signals()
+
+        from .database import configure_connection
+        connection_created.connect(configure_connection, dispatch_uid='core-sqlite-pragmas')
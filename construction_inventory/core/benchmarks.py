@@ -0,0 +1,172 @@
+"""
+Замеры времени ответа страниц через тестовый клиент Django.
+
+Каждая цель — именованный URL; для страниц с параметрами аргументы
+подбираются по данным в базе (самый «тяжёлый» товар и т. п.). Потоковые
+ответы (выгрузки) вычитываются полностью, чтобы в замер попало всё время
+генерации файла.
+
+Замер идёт под существующим пользователем (username) или под временным
+суперпользователем, который удаляется вместе с сессией после замера.
+"""
+import json
+import math
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from products.models import Product
+from sales.models import Sale
+from users.models import CustomUser
+from warehouse.models import Batch
+from .querybudget import count_queries
+
+
+class Target:
+    def __init__(self, name, url_name, kwargs=None, query=''):
+        self.name = name
+        self.url_name = url_name
+        # Словарь или функция без аргументов, возвращающая словарь
+        self.kwargs = kwargs
+        self.query = query
+
+    def url(self):
+        kwargs = self.kwargs() if callable(self.kwargs) else self.kwargs
+        url = reverse(self.url_name, kwargs=kwargs)
+        return f'{url}?{self.query}' if self.query else url
+
+
+def _busiest_product():
+    product = Product.objects.annotate(batch_count=Count('batches')).order_by('-batch_count').first()
+    return {'pk': product.pk if product else 0}
+
+
+TARGETS = [
+    Target('batch-list', 'warehouse:batch-list'),
+    Target('product-list', 'products:product-list'),
+    Target('product-detail', 'products:product-detail', _busiest_product),
+    Target('analytics', 'products:analytics'),
+    Target('analytics-chart', 'products:analytics-widget', {'name': 'daily-chart'}),
+    Target('analytics-stock', 'products:analytics-widget', {'name': 'stock'}),
+    Target('analytics-growth', 'products:analytics-widget', {'name': 'growth'}),
+    Target('analytics-profit', 'products:analytics-widget', {'name': 'profit'}),
+    Target('sales-list', 'sales:sales-list'),
+    Target('supplies-list', 'supplies:supplies-list'),
+    Target('category-list', 'categories:category-list'),
+    Target('export-xlsx', 'warehouse:export-xml'),
+    Target('export-sales-csv', 'core:export', {'name': 'sales', 'fmt': 'csv'}),
+]
+
+
+def percentile(values, share):
+    """Перцентиль с линейной интерполяцией, share от 0 до 1."""
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    position = (len(ordered) - 1) * share
+    lower = math.floor(position)
+    upper = math.ceil(position)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+@contextmanager
+def benchmark_client(username=None):
+    """Тестовый клиент, вошедший под username или под временным пользователем."""
+    if username:
+        user = CustomUser.objects.filter(username=username).first()
+        if user is None:
+            raise ValueError(f'Пользователь "{username}" не найден')
+    else:
+        user = CustomUser(username=f'benchmark-{uuid.uuid4().hex[:12]}', is_staff=True, is_superuser=True)
+        user.set_unusable_password()
+        user.save()
+    client = Client(HTTP_HOST='localhost')
+    client.force_login(user)
+    try:
+        yield client
+    finally:
+        client.logout()
+        if not username:
+            user.delete()
+
+
+def fetch(client, url):
+    """Запрос с полным чтением ответа; возвращает (статус, байты, запросы к БД)."""
+    # Все базы и потоки run_queries: выгрузки читают из readonly,
+    # виджеты аналитики — из рабочих потоков
+    with count_queries() as recorder:
+        response = client.get(url)
+        if response.streaming:
+            size = sum(len(chunk) for chunk in response.streaming_content)
+        else:
+            size = len(response.content)
+    return response.status_code, size, recorder.count
+
+
+def run(targets=TARGETS, repeat=10, warmup=1, log=None, username=None):
+    log = log or (lambda message: None)
+    results = {}
+    with benchmark_client(username) as client:
+        for target in targets:
+            url = target.url()
+            for _ in range(warmup):
+                fetch(client, url)
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                status, size, queries = fetch(client, url)
+                timings.append((time.perf_counter() - started) * 1000)
+            results[target.name] = {
+                'url': url,
+                'status': status,
+                'bytes': size,
+                'queries': queries,
+                'p50_ms': round(percentile(timings, 0.5), 2),
+                'p95_ms': round(percentile(timings, 0.95), 2),
+                'mean_ms': round(sum(timings) / len(timings), 2),
+                'min_ms': round(min(timings), 2),
+                'max_ms': round(max(timings), 2),
+            }
+            log(f'{target.name}: p50 {results[target.name]["p50_ms"]} мс, '
+                f'p95 {results[target.name]["p95_ms"]} мс, запросов {queries}')
+    return {
+        'created': timezone.now().isoformat(),
+        'repeat': repeat,
+        'dataset': {
+            'products': Product.objects.count(),
+            'batches': Batch.objects.count(),
+            'sales': Sale.objects.count(),
+        },
+        'results': results,
+    }
+
+
+def compare(previous, current):
+    """Строки сравнения p50/p95 с предыдущим прогоном."""
+    lines = []
+    for name, result in current['results'].items():
+        before = previous.get('results', {}).get(name)
+        if not before:
+            continue
+        change = (result['p50_ms'] - before['p50_ms']) / before['p50_ms'] * 100 if before['p50_ms'] else 0
+        lines.append(
+            f'{name}: p50 {before["p50_ms"]} → {result["p50_ms"]} мс ({change:+.0f}%), '
+            f'p95 {before["p95_ms"]} → {result["p95_ms"]} мс, '
+            f'запросов {before["queries"]} → {result["queries"]}'
+        )
+    return lines
+
+
+def load(path):
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)
+
+
+def save(report, path):
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
@@ -0,0 +1,100 @@
+"""
+Профиль SQLite и маршрутизация долгих чтений.
+
+configure_connection вызывается по сигналу connection_created и выставляет
+PRAGMA из SQLITE_PRAGMAS: в режиме WAL читатели не мешают записи продаж,
+busy_timeout ждёт освобождения блокировки вместо мгновенного
+"database is locked". Соединение READ_ONLY_DATABASE открывается к тому же
+файлу с query_only, записать через него ничего нельзя.
+
+Тяжёлые представления (аналитика, выгрузки) помечаются декоратором:
+
+    @read_only
+    class AnalyticsView(LoginRequiredMixin, TemplateView): ...
+
+ReadOnlyRoutingMiddleware включает ReadOnlyRouter на время такого запроса
+(вместе с отрисовкой шаблона), и чтения моделей уходят в отдельное
+соединение. Запись всегда идёт в default.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+READ_ONLY_DATABASE = 'readonly'
+
+_routing = ContextVar('read_only_routing', default=False)
+
+
+def configure_connection(sender, connection, **kwargs):
+    """Обработчик connection_created: PRAGMA для каждого нового соединения SQLite."""
+    if connection.vendor != 'sqlite':
+        return
+    # Напрямую через sqlite3, мимо execute_wrapper: PRAGMA не должны
+    # попадать в бюджет запросов представления
+    raw = connection.connection
+    for name, value in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+        raw.execute(f'PRAGMA {name} = {value}')
+    if connection.alias == READ_ONLY_DATABASE:
+        raw.execute('PRAGMA query_only = ON')
+
+
+def read_only(view):
+    """Помечает функцию-представление или класс представления как только читающие."""
+    view.read_only = True
+    return view
+
+
+def is_read_only(view_func):
+    view_class = getattr(view_func, 'view_class', None)
+    return bool(getattr(view_func, 'read_only', False) or getattr(view_class, 'read_only', False))
+
+
+@contextmanager
+def reading_replica():
+    """Чтения внутри блока идут в READ_ONLY_DATABASE (если алиас настроен)."""
+    token = _routing.set(True)
+    try:
+        yield
+    finally:
+        _routing.reset(token)
+
+
+class ReadOnlyRouter:
+    def db_for_read(self, model, **hints):
+        if not _routing.get() or READ_ONLY_DATABASE not in settings.DATABASES:
+            return None
+        # Внутри транзакции свои незакоммиченные изменения видны только
+        # в основном соединении, поэтому читаем оттуда же
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return READ_ONLY_DATABASE
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Оба алиаса смотрят в один файл
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        if db == READ_ONLY_DATABASE:
+            return False
+        return None
+
+
+class ReadOnlyRoutingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        token = getattr(request, '_read_only_token', None)
+        if token is not None:
+            _routing.reset(token)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if is_read_only(view_func):
+            request._read_only_token = _routing.set(True)
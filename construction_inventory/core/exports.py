@@ -0,0 +1,173 @@
+"""
+Реестр выгрузок списков в CSV / JSON Lines / XLSX.
+
+Приложение описывает выгрузку в своём модуле exports.py:
+
+    exports.register('sales', SaleList, title='Продажи', columns=[
+        exports.Column('sale_date', 'Дата продажи'),
+        exports.Column('product', 'Товар', 'batch__product__name'),
+    ])
+
+Данные берутся из get_queryset() самого списка, поэтому фильтры из GET
+(поиск, даты, категория) применяются так же, как на странице. Строки
+читаются через values_list().iterator() порциями и сразу уходят в ответ,
+модели не создаются и память не растёт с размером выгрузки.
+"""
+import csv
+import json
+from datetime import date, datetime
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .xlsx import XLSX_CONTENT_TYPE, stream_xlsx
+
+CHUNK_SIZE = 2000
+
+_exports = {}
+_formats = {}
+
+
+class Column:
+    def __init__(self, key, header, source=None):
+        self.key = key
+        self.header = header
+        # Путь поля для values_list() или выражение для annotate()
+        self.source = source or key
+
+
+class Export:
+    def __init__(self, name, view_class, columns, title=None):
+        self.name = name
+        self.view_class = view_class
+        self.columns = columns
+        self.title = title or name
+
+    @property
+    def headers(self):
+        return [column.header for column in self.columns]
+
+    @property
+    def keys(self):
+        return [column.key for column in self.columns]
+
+    def get_view(self, request, **kwargs):
+        view = self.view_class()
+        view.setup(request, **kwargs)
+        return view
+
+    def get_queryset(self, view):
+        # prefetch_related несовместим с values_list, а select_related не нужен
+        queryset = view.get_queryset().prefetch_related(None).select_related(None)
+        # Строки читаются уже после выхода из представления, поэтому
+        # соединение выбирается сейчас, пока действует маршрутизация запроса
+        queryset = queryset.using(queryset.db)
+        lookups = []
+        annotations = {}
+        for column in self.columns:
+            if isinstance(column.source, str):
+                lookups.append(column.source)
+            else:
+                alias = f'export_{column.key}'
+                annotations[alias] = column.source
+                lookups.append(alias)
+        if annotations:
+            queryset = queryset.annotate(**annotations)
+        return queryset.values_list(*lookups)
+
+    def rows(self, view, chunk_size=CHUNK_SIZE):
+        return self.get_queryset(view).iterator(chunk_size=chunk_size)
+
+
+def register(name, view_class, columns, title=None):
+    _exports[name] = Export(name, view_class, columns, title)
+    return _exports[name]
+
+
+def get_export(name):
+    return _exports.get(name)
+
+
+def register_format(name):
+    def decorator(writer_class):
+        _formats[name] = writer_class()
+        return writer_class
+    return decorator
+
+
+def get_format(name):
+    return _formats.get(name)
+
+
+def _local(value):
+    if isinstance(value, datetime) and timezone.is_aware(value):
+        return timezone.localtime(value)
+    return value
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+@register_format('csv')
+class CsvWriter:
+    extension = 'csv'
+    content_type = 'text/csv; charset=utf-8'
+
+    def stream(self, export, rows):
+        writer = csv.writer(_Echo())
+        # BOM, чтобы Excel открыл кириллицу в UTF-8
+        yield '\ufeff' + writer.writerow(export.headers)
+        for row in rows:
+            yield writer.writerow([
+                _local(value).strftime('%Y-%m-%d %H:%M:%S') if isinstance(value, datetime) else value
+                for value in row
+            ])
+
+
+@register_format('jsonl')
+class JsonLinesWriter:
+    extension = 'jsonl'
+    content_type = 'application/x-ndjson; charset=utf-8'
+
+    @staticmethod
+    def _default(value):
+        if isinstance(value, (datetime, date)):
+            return _local(value).isoformat()
+        return str(value)
+
+    def stream(self, export, rows):
+        keys = export.keys
+        for row in rows:
+            yield json.dumps(dict(zip(keys, row)), ensure_ascii=False, default=self._default) + '\n'
+
+
+@register_format('xlsx')
+class XlsxWriter:
+    extension = 'xlsx'
+    content_type = XLSX_CONTENT_TYPE
+
+    def stream(self, export, rows):
+        rows = (
+            [
+                _local(value).replace(tzinfo=None) if isinstance(value, datetime) else value
+                for value in row
+            ]
+            for row in rows
+        )
+        return stream_xlsx(export.headers, rows, sheet_title=export.title)
+
+
+def export_filename(export, writer):
+    return f'{export.name}_export_{timezone.now().strftime("%Y-%m-%d")}.{writer.extension}'
+
+
+def export_response(export, writer, view):
+    filename = export_filename(export, writer)
+    response = StreamingHttpResponse(
+        writer.stream(export, export.rows(view)),
+        content_type=writer.content_type
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
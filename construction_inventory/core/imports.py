@@ -0,0 +1,66 @@
+"""
+Общее для загрузки файлов (поставки, каталог товаров): чтение CSV или
+XLSX построчно и отчёт об импорте с ошибками по номерам строк файла.
+"""
+import csv
+import io
+
+from .xlsx import read_xlsx
+
+CHUNK_SIZE = 1000
+
+
+class ImportResult:
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.errors = []
+        self.duration = 0.0
+
+    @property
+    def ok(self):
+        return not self.errors
+
+    def add_error(self, line, message):
+        self.errors.append((line, message))
+
+
+def normalize(name):
+    """Ключ для сравнения названий: без лишних пробелов и регистра."""
+    return ' '.join(name.split()).casefold()
+
+
+def read_rows(file, name=''):
+    """Строки файла как списки строк; XLSX узнаётся по сигнатуре zip."""
+    head = file.read(4)
+    file.seek(0)
+    if head.startswith(b'PK') or name.lower().endswith('.xlsx'):
+        return read_xlsx(file)
+
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    sample = text.read(4096)
+    text.seek(0)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+    except csv.Error:
+        dialect = csv.excel
+    return csv.reader(text, dialect)
+
+
+def header_map(header, columns):
+    """Номера колонок по заголовку: {ключ: индекс} для найденных синонимов."""
+    positions = {}
+    for index, title in enumerate(header):
+        title = normalize(str(title))
+        for key, aliases in columns.items():
+            if title in aliases and key not in positions:
+                positions[key] = index
+    return positions
+
+
+def cell(row, positions, key):
+    index = positions.get(key)
+    if index is None or index >= len(row):
+        return ''
+    return str(row[index]).strip()
@@ -0,0 +1,265 @@
+"""
+Фоновые задачи: тяжёлые выгрузки и пересчёты вне HTTP-запроса.
+
+Приложение регистрирует обработчики в своём модуле jobs.py:
+
+    @jobs.register('rebuild-sales-rollup', title='Пересчёт выручки по дням', staff_only=True)
+    def rebuild_sales_rollup(job, report):
+        DailySalesRollup.rebuild()
+
+report(процент, сообщение) сохраняет прогресс, но не чаще раза в
+PROGRESS_INTERVAL секунд. Если обработчик возвращает Output, файл пишется
+в MEDIA_ROOT (Job.result) и отдаётся через core:job-download.
+
+Очередь — таблица Job. Команда run_jobs забирает задачи условным UPDATE
+и выполняет их пулом потоков; упавшая задача повторяется с растущей
+задержкой (JOB_RETRY_DELAY * 2^попытка), пока не исчерпает max_attempts.
+"""
+import logging
+import tempfile
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.db import connections
+from django.db.models import F
+from django.http import HttpRequest, QueryDict
+from django.utils import timezone
+
+from . import exports
+from .database import reading_replica
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_INTERVAL = 1.0
+
+_handlers = {}
+
+
+class Handler:
+    def __init__(self, name, func, title=None, staff_only=False, validate=None):
+        self.name = name
+        self.func = func
+        self.title = title or name
+        self.staff_only = staff_only
+        self.validate = validate
+
+
+class Output:
+    """Файл результата: имя и поток кусков (str или bytes)."""
+
+    def __init__(self, filename, chunks):
+        self.filename = filename
+        self.chunks = chunks
+
+
+def register(name, title=None, staff_only=False, validate=None):
+    def decorator(func):
+        _handlers[name] = Handler(name, func, title, staff_only, validate)
+        return func
+    return decorator
+
+
+def get_handler(name):
+    return _handlers.get(name)
+
+
+def enqueue(kind, params=None, user=None, max_attempts=None):
+    """Ставит задачу в очередь; ValidationError, если параметры не подходят."""
+    handler = _handlers.get(kind)
+    if handler is None:
+        raise ValidationError(f'Неизвестный тип задачи: {kind}')
+    params = params or {}
+    if handler.validate:
+        handler.validate(params)
+    job = Job(kind=kind, params=params, created_by=user if user and user.is_authenticated else None)
+    if max_attempts:
+        job.max_attempts = max_attempts
+    job.save()
+    return job
+
+
+class Reporter:
+    def __init__(self, job):
+        self.job = job
+        self._last = None
+
+    def __call__(self, progress, message=''):
+        now = time.monotonic()
+        if self._last is not None and now - self._last < PROGRESS_INTERVAL:
+            return
+        self._last = now
+        # 100 ставит только execute после сохранения результата
+        Job.objects.filter(pk=self.job.pk).update(
+            progress=max(0, min(99, int(progress))),
+            message=message[:255],
+        )
+
+
+def claim(limit):
+    """Забирает до limit готовых задач и возвращает их id."""
+    now = timezone.now()
+    candidates = list(
+        Job.objects.filter(status=Job.PENDING, run_after__lte=now)
+        .order_by('run_after', 'id').values_list('id', flat=True)[:limit]
+    )
+    claimed = []
+    for job_id in candidates:
+        # Другой воркер мог забрать задачу между SELECT и UPDATE
+        taken = Job.objects.filter(pk=job_id, status=Job.PENDING).update(
+            status=Job.RUNNING,
+            started_at=now,
+            attempts=F('attempts') + 1,
+            progress=0,
+        )
+        if taken:
+            claimed.append(job_id)
+    return claimed
+
+
+def requeue_stale():
+    """Возвращает в очередь задачи, брошенные упавшим воркером."""
+    deadline = timezone.now() - timedelta(seconds=settings.JOB_STALE_AFTER)
+    return Job.objects.filter(status=Job.RUNNING, started_at__lt=deadline).update(
+        status=Job.PENDING, message='Возвращена в очередь после остановки воркера'
+    )
+
+
+def _save_output(job, output):
+    with tempfile.TemporaryFile() as buffer:
+        for chunk in output.chunks:
+            buffer.write(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+        buffer.seek(0)
+        job.result.save(output.filename, File(buffer), save=False)
+
+
+def execute(job_id):
+    """Выполняет забранную задачу; True при успехе."""
+    job = Job.objects.select_related('created_by').get(pk=job_id)
+    handler = _handlers.get(job.kind)
+    if handler is None:
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.FAILED, finished_at=timezone.now(), error=f'Неизвестный тип задачи: {job.kind}'
+        )
+        return False
+
+    try:
+        output = handler.func(job, Reporter(job))
+        if output is not None:
+            _save_output(job, output)
+    except Exception:
+        logger.exception('Задача #%s (%s) завершилась ошибкой', job.pk, job.kind)
+        error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            delay = settings.JOB_RETRY_DELAY * 2 ** (job.attempts - 1)
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.PENDING,
+                run_after=timezone.now() + timedelta(seconds=delay),
+                error=error,
+                message=f'Ошибка, повтор через {delay} с',
+            )
+        else:
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.FAILED, finished_at=timezone.now(), error=error, message='Ошибка'
+            )
+        return False
+
+    Job.objects.filter(pk=job.pk).update(
+        status=Job.DONE,
+        progress=100,
+        finished_at=timezone.now(),
+        result=job.result.name or '',
+        error='',
+        message='Готово',
+    )
+    return True
+
+
+def _execute_in_thread(job_id):
+    try:
+        return execute(job_id)
+    finally:
+        # У каждого потока пула своё соединение
+        connections.close_all()
+
+
+def work(workers=2, once=False, poll_interval=1.0, log=None, stop=None):
+    """
+    Цикл воркера: забирает задачи, пока в пуле есть свободные потоки.
+
+    once — выйти, когда готовых задач не останется (задачи с отложенным
+    повтором ждать не будем). stop — threading.Event для остановки.
+    Возвращает (выполнено, с ошибкой).
+    """
+    log = log or (lambda message: None)
+    if requeue_stale():
+        log('Брошенные задачи возвращены в очередь')
+
+    done = failed = 0
+    running = {}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job') as pool:
+        while True:
+            for future in [future for future in running if future.done()]:
+                job_id = running.pop(future)
+                if future.result():
+                    done += 1
+                    log(f'Задача #{job_id} выполнена')
+                else:
+                    failed += 1
+                    log(f'Задача #{job_id} завершилась ошибкой')
+
+            if stop is not None and stop.is_set():
+                break
+            claimed = claim(workers - len(running)) if len(running) < workers else []
+            for job_id in claimed:
+                log(f'Задача #{job_id} взята в работу')
+                running[pool.submit(_execute_in_thread, job_id)] = job_id
+
+            if once and not claimed and not running:
+                break
+            if not claimed:
+                if running:
+                    wait(running, timeout=poll_interval, return_when=FIRST_COMPLETED)
+                else:
+                    time.sleep(poll_interval)
+    return done, failed
+
+
+def _validate_export(params):
+    if exports.get_export(params.get('name')) is None or exports.get_format(params.get('fmt')) is None:
+        raise ValidationError('Неизвестная выгрузка')
+
+
+@register('export', title='Выгрузка списка', validate=_validate_export)
+def export_job(job, report):
+    """
+    Выгрузка списка в фоне: params = {'name', 'fmt', 'query'}, где query —
+    строка GET-параметров страницы (фильтры применяются так же, как в списке).
+    """
+    export = exports.get_export(job.params['name'])
+    writer = exports.get_format(job.params['fmt'])
+
+    request = HttpRequest()
+    request.GET = QueryDict(job.params.get('query', ''))
+    request.user = job.created_by or AnonymousUser()
+    view = export.get_view(request)
+
+    # Соединение выбирается при построении queryset (см. Export.get_queryset)
+    with reading_replica():
+        total = export.get_queryset(view).count()
+        rows = export.rows(view)
+
+    def counted():
+        for number, row in enumerate(rows, 1):
+            if number % exports.CHUNK_SIZE == 0:
+                report(number * 100 / total, f'Выгружено {number} из {total} строк')
+            yield row
+
+    report(0, f'Строк к выгрузке: {total}')
+    return Output(exports.export_filename(export, writer), writer.stream(export, counted()))
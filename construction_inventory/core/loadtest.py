@@ -0,0 +1,237 @@
+"""
+Смешанная нагрузка на приложение в одном процессе.
+
+Кассиры проводят чеки через /sales/checkout/ и изредка смотрят склад,
+менеджеры открывают аналитику, выгрузки и правят партии. Каждый участник —
+отдельный поток со своим тестовым клиентом Django (запрос проходит весь
+WSGI-стек с middleware) и своим соединением с базой. В конце проверяется
+согласованность остатков.
+"""
+import json
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+
+from django.core.signals import got_request_exception
+from django.db import OperationalError, close_old_connections, connections
+from django.db.models import Sum
+from django.test import Client
+from django.urls import reverse
+
+from sales.models import DailySalesRollup, Sale
+from warehouse.models import Batch
+from warehouse.services import reconcile_stock
+from .benchmarks import benchmark_client, percentile
+
+SAMPLE_SIZE = 500
+
+# Исключение последнего запроса в текущем потоке. Тестовый клиент сам
+# ловит его через глобальный сигнал и при нескольких потоках может
+# поднять чужую ошибку, поэтому клиенты работают с raise_request_exception=False
+_request_errors = threading.local()
+
+
+def _remember_exception(sender, request, **kwargs):
+    _request_errors.error = sys.exc_info()[1]
+
+
+class Workload:
+    """Общее состояние прогона: выборки товаров и партий, счётчики, задержки."""
+
+    def __init__(self, seed=None):
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self.lock_errors = 0
+        self.errors = []
+        self.sold_quantity = 0
+        self.product_ids = list(
+            Batch.objects.filter(quantity__gt=0).values_list('product_id', flat=True).distinct()[:SAMPLE_SIZE]
+        )
+        self.batch_ids = list(
+            Batch.objects.filter(quantity__gt=0).values_list('id', flat=True)[:SAMPLE_SIZE]
+        )
+
+    def pick(self, values):
+        with self.lock:
+            return self.random.choice(values) if values else None
+
+    def record(self, scenario, status, elapsed):
+        with self.lock:
+            self.latencies[scenario].append(elapsed * 1000)
+            self.statuses[scenario][status] += 1
+
+
+def _read(response):
+    if response.streaming:
+        for _ in response.streaming_content:
+            pass
+    return response
+
+
+def sale(client, workload):
+    product_id = workload.pick(workload.product_ids)
+    quantity = workload.random.randint(1, 3)
+    response = client.post(
+        reverse('sales:checkout'),
+        data=json.dumps({'lines': [{'product': product_id, 'quantity': quantity}]}),
+        content_type='application/json',
+    )
+    if response.status_code == 201:
+        sold = sum(line['quantity'] for line in response.json()['sales'])
+        with workload.lock:
+            workload.sold_quantity += sold
+    return response
+
+
+def browse_warehouse(client, workload):
+    return client.get(reverse('warehouse:batch-list'))
+
+
+def analytics(client, workload):
+    response = client.get(reverse('products:analytics'))
+    # Браузер сразу запрашивает виджеты страницы
+    for name in ('daily-chart', 'stock', 'growth', 'profit'):
+        widget = client.get(reverse('products:analytics-widget', kwargs={'name': name}))
+        if widget.status_code != 200:
+            return widget
+    return response
+
+
+def export(client, workload):
+    if workload.random.random() < 0.5:
+        return _read(client.get(reverse('warehouse:export-xml')))
+    return _read(client.get(reverse('core:export', kwargs={'name': 'products', 'fmt': 'csv'})))
+
+
+def edit_batch(client, workload):
+    batch_id = workload.pick(workload.batch_ids)
+    return client.post(
+        reverse('warehouse:edit-batch', kwargs={'pk': batch_id}),
+        {'price': workload.random.randint(100, 5000), 'quantity': workload.random.randint(10, 100)},
+    )
+
+
+SCENARIOS = {
+    'sale': sale,
+    'browse_warehouse': browse_warehouse,
+    'analytics': analytics,
+    'export': export,
+    'edit_batch': edit_batch,
+}
+
+# Доли сценариев для каждой роли
+ROLES = {
+    'cashier': {'sale': 85, 'browse_warehouse': 15},
+    'manager': {'analytics': 40, 'browse_warehouse': 25, 'export': 20, 'edit_batch': 15},
+}
+
+
+def _worker(role, cookies, workload, deadline, iterations):
+    client = Client(HTTP_HOST='localhost', raise_request_exception=False)
+    client.cookies.update(cookies)
+    names = list(ROLES[role])
+    weights = list(ROLES[role].values())
+    done = 0
+    try:
+        while (iterations is None or done < iterations) and (deadline is None or time.perf_counter() < deadline):
+            with workload.lock:
+                scenario = workload.random.choices(names, weights)[0]
+            _request_errors.error = None
+            started = time.perf_counter()
+            try:
+                status = SCENARIOS[scenario](client, workload).status_code
+            except Exception as error:
+                # Ошибка вне обработки запроса, например при чтении выгрузки
+                _request_errors.error = error
+            error = _request_errors.error
+            if isinstance(error, OperationalError) and 'locked' in str(error):
+                status = 'locked'
+                with workload.lock:
+                    workload.lock_errors += 1
+            elif error is not None:
+                status = 'error'
+                with workload.lock:
+                    workload.errors.append(f'{scenario}: {error!r}')
+            workload.record(scenario, status, time.perf_counter() - started)
+            done += 1
+    finally:
+        connections.close_all()
+
+
+def check_consistency(sales_before, sold_quantity):
+    """Нарушения согласованности остатков после прогона (пустой список — всё в порядке)."""
+    problems = []
+    products, groups = reconcile_stock(dry_run=True)
+    if products or groups:
+        problems.append(f'остатки расходятся с партиями: товары — {products}, группы — {groups}')
+    negative = Batch.objects.filter(quantity__lt=0).count()
+    if negative:
+        problems.append(f'партий с отрицательным остатком: {negative}')
+    recorded = Sale.objects.filter(pk__gt=sales_before).aggregate(total=Sum('quantity'))['total'] or 0
+    if recorded != sold_quantity:
+        problems.append(f'подтверждено продаж {sold_quantity} шт., записано {recorded} шт.')
+    rollup = DailySalesRollup.objects.aggregate(total=Sum('quantity'))['total'] or 0
+    total = Sale.objects.aggregate(total=Sum('quantity'))['total'] or 0
+    if rollup != total:
+        problems.append(f'дневные итоги {rollup} шт. при продажах {total} шт.')
+    return problems
+
+
+def run(cashiers=10, managers=3, duration=30, iterations=None, seed=None, log=None, username=None):
+    log = log or (lambda message: None)
+    workload = Workload(seed)
+    if not workload.product_ids:
+        raise ValueError('На складе нет остатков: сначала заполните базу (seed_data)')
+    sales_before = Sale.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+
+    # Все потоки работают под одной сессией; временный пользователь
+    # удаляется после нагрузки
+    with benchmark_client(username) as client:
+        cookies = client.cookies
+        close_old_connections()
+        deadline = time.perf_counter() + duration if iterations is None else None
+        threads = [
+            threading.Thread(target=_worker, args=(role, cookies, workload, deadline, iterations))
+            for role, count in (('cashier', cashiers), ('manager', managers))
+            for _ in range(count)
+        ]
+        got_request_exception.connect(_remember_exception)
+        started = time.perf_counter()
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            got_request_exception.disconnect(_remember_exception)
+        elapsed = time.perf_counter() - started
+    log(f'Нагрузка завершена за {elapsed:.1f} с')
+
+    def summary(values):
+        return {
+            'count': len(values),
+            'p50_ms': round(percentile(values, 0.5), 2),
+            'p95_ms': round(percentile(values, 0.95), 2),
+            'p99_ms': round(percentile(values, 0.99), 2),
+        }
+
+    everything = [value for values in workload.latencies.values() for value in values]
+    return {
+        'cashiers': cashiers,
+        'managers': managers,
+        'elapsed_s': round(elapsed, 2),
+        'throughput_rps': round(len(everything) / elapsed, 2) if elapsed else 0,
+        'latency': summary(everything) if everything else {'count': 0},
+        'scenarios': {
+            name: dict(summary(values), statuses=dict(workload.statuses[name]))
+            for name, values in workload.latencies.items()
+        },
+        'lock_errors': workload.lock_errors,
+        'errors': workload.errors[:20],
+        'sold_quantity': workload.sold_quantity,
+        'consistency_violations': check_consistency(sales_before, workload.sold_quantity),
+    }
@@ -0,0 +1,37 @@
+"""
+JSON-подсказки для полей выбора (товар, партия) вместо полного <select>.
+
+Представление готовит queryset: фильтр по строке поиска через core.search
+и подписи — собранные в SQL (annotate + Concat) или в Python функцией
+describe, если значение нужно привести к местному времени. lookup_response
+отдаёт страницу по курсору, так что размер ответа не зависит от размера
+каталога.
+"""
+from django.http import JsonResponse
+
+from .pagination import InvalidCursor, KeysetPaginator
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 50
+
+
+def lookup_response(request, queryset, ordering, fields, describe=None):
+    """
+    Ответ {"results": [...], "next": курсор или null}.
+
+    fields попадают в values(), ordering должен входить в fields.
+    describe(строка) возвращает словарь для ответа вместо строки values().
+    Следующая страница запрашивается с ?after=<next>.
+    """
+    try:
+        limit = min(max(int(request.GET.get('limit', DEFAULT_LIMIT)), 1), MAX_LIMIT)
+    except ValueError:
+        limit = DEFAULT_LIMIT
+
+    paginator = KeysetPaginator(queryset.values(*fields), limit, ordering)
+    try:
+        page = paginator.page(after=request.GET.get('after'))
+    except InvalidCursor as error:
+        return JsonResponse({'errors': [str(error)]}, status=400)
+    results = page.object_list if describe is None else [describe(row) for row in page.object_list]
+    return JsonResponse({'results': results, 'next': page.next_cursor})
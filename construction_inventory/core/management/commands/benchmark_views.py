@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+from core import benchmarks
+
+
+class Command(BaseCommand):
+    help = 'Замеряет время ответа основных страниц (p50/p95) и сохраняет результат в JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=10, help='Повторов на страницу')
+        parser.add_argument('--warmup', type=int, default=1, help='Прогревочных запросов')
+        parser.add_argument('--only', nargs='+', metavar='NAME',
+                            help='Замерить только указанные страницы')
+        parser.add_argument('--output', help='Куда сохранить JSON с результатами')
+        parser.add_argument('--compare', metavar='FILE',
+                            help='JSON предыдущего прогона для сравнения')
+        parser.add_argument('--user', metavar='USERNAME',
+                            help='Существующий пользователь; по умолчанию создаётся временный '
+                                 'суперпользователь и удаляется после замера')
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat должно быть больше нуля')
+
+        targets = benchmarks.TARGETS
+        if options['only']:
+            known = {target.name for target in targets}
+            unknown = set(options['only']) - known
+            if unknown:
+                raise CommandError(
+                    f'Неизвестные страницы: {", ".join(sorted(unknown))}. '
+                    f'Доступны: {", ".join(sorted(known))}'
+                )
+            targets = [target for target in targets if target.name in options['only']]
+
+        try:
+            report = benchmarks.run(
+                targets, repeat=options['repeat'], warmup=options['warmup'],
+                log=self.stdout.write, username=options['user'],
+            )
+        except ValueError as error:
+            raise CommandError(str(error))
+        if options['output']:
+            benchmarks.save(report, options['output'])
+            self.stdout.write(f'Результат сохранён в {options["output"]}')
+        if options['compare']:
+            for line in benchmarks.compare(benchmarks.load(options['compare']), report):
+                self.stdout.write(line)
+        self.stdout.write(self.style.SUCCESS('Готово'))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from core.queryplans import catalog
+
+
+class Command(BaseCommand):
+    help = (
+        'Прогоняет каталог горячих запросов через EXPLAIN QUERY PLAN и показывает '
+        'полные просмотры таблиц, для которых нужен индекс'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-plans', action='store_true',
+                            help='Печатать план каждого запроса целиком')
+        parser.add_argument('--fail-on-scan', action='store_true',
+                            help='Завершиться с ошибкой, если найдены неожиданные полные просмотры')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Разбор планов написан для SQLite')
+
+        problems = 0
+        for query in catalog():
+            plan = query.plan()
+            scans = query.scans(plan)
+            if scans and not query.allow_scan:
+                problems += 1
+                status = self.style.ERROR('ПОЛНЫЙ ПРОСМОТР')
+            elif scans:
+                status = self.style.WARNING('просмотр допустим')
+            else:
+                status = self.style.SUCCESS('индекс ' + ', '.join(sorted(query.indexes(plan))))
+            self.stdout.write(f'{query.name} ({query.where}): {status}')
+            for line in plan if options['verbose_plans'] else scans:
+                self.stdout.write(f'    {line}')
+
+        if problems and options['fail_on_scan']:
+            raise CommandError(f'Запросов с полным просмотром: {problems}')
+        self.stdout.write(f'Проверено запросов: {len(catalog())}, требуют индекса: {problems}')
@@ -0,0 +1,64 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from core import loadtest
+
+
+class Command(BaseCommand):
+    help = (
+        'Смешанная нагрузка в одном процессе: кассиры проводят продажи, менеджеры '
+        'открывают аналитику, выгрузки и правят партии. Выводит пропускную способность, '
+        'перцентили задержек, ошибки блокировок и проверку остатков'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cashiers', type=int, default=10, help='Потоков-кассиров')
+        parser.add_argument('--managers', type=int, default=3, help='Потоков-менеджеров')
+        parser.add_argument('--duration', type=float, default=30, help='Длительность, секунд')
+        parser.add_argument('--iterations', type=int, default=None,
+                            help='Запросов на поток вместо ограничения по времени')
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--user', metavar='USERNAME',
+                            help='Существующий пользователь; по умолчанию создаётся временный')
+        parser.add_argument('--output', help='Куда сохранить JSON с результатами')
+
+    def handle(self, *args, **options):
+        if options['cashiers'] + options['managers'] < 1:
+            raise CommandError('Нужен хотя бы один кассир или менеджер')
+
+        try:
+            report = loadtest.run(
+                cashiers=options['cashiers'],
+                managers=options['managers'],
+                duration=options['duration'],
+                iterations=options['iterations'],
+                seed=options['seed'],
+                log=self.stdout.write,
+                username=options['user'],
+            )
+        except ValueError as error:
+            raise CommandError(str(error))
+
+        latency = report['latency']
+        self.stdout.write(
+            f'Запросов: {latency["count"]}, {report["throughput_rps"]} в секунду; '
+            f'p50 {latency.get("p50_ms")} мс, p95 {latency.get("p95_ms")} мс, p99 {latency.get("p99_ms")} мс'
+        )
+        for name, scenario in report['scenarios'].items():
+            self.stdout.write(
+                f'  {name}: {scenario["count"]} запр., p50 {scenario["p50_ms"]} мс, '
+                f'p95 {scenario["p95_ms"]} мс, статусы {scenario["statuses"]}'
+            )
+        self.stdout.write(f'Ошибок блокировки базы: {report["lock_errors"]}')
+        for error in report['errors']:
+            self.stdout.write(self.style.ERROR(error))
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+
+        if report['consistency_violations']:
+            for problem in report['consistency_violations']:
+                self.stdout.write(self.style.ERROR(f'Нарушение: {problem}'))
+            raise CommandError('Остатки несогласованы')
+        self.stdout.write(self.style.SUCCESS('Остатки согласованы'))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+from core import jobs
+
+
+class Command(BaseCommand):
+    help = (
+        'Воркер фоновых задач: забирает задачи из таблицы Job и выполняет их '
+        'пулом потоков с повторами при ошибках'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help='Потоков в пуле')
+        parser.add_argument('--poll', type=float, default=1.0,
+                            help='Пауза между проверками очереди, секунд')
+        parser.add_argument('--once', action='store_true',
+                            help='Выполнить готовые задачи и выйти')
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1:
+            raise CommandError('--workers должно быть больше нуля')
+
+        self.stdout.write(f'Воркер запущен, потоков: {options["workers"]}')
+        try:
+            done, failed = jobs.work(
+                workers=options['workers'],
+                once=options['once'],
+                poll_interval=options['poll'],
+                log=self.stdout.write,
+            )
+        except KeyboardInterrupt:
+            self.stdout.write('Остановлен')
+            return
+        self.stdout.write(self.style.SUCCESS(f'Выполнено задач: {done}, с ошибкой: {failed}'))
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+from core.seeding import seed
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу синтетическими данными для замеров: товары, категории, '
+        'поставщики, партии с историей и продажи за несколько лет'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=20000)
+        parser.add_argument('--categories', type=int, default=60)
+        parser.add_argument('--suppliers', type=int, default=300)
+        parser.add_argument('--batches', type=int, default=200000)
+        parser.add_argument('--sales', type=int, default=2000000,
+                            help='Примерное число продаж, ограничено остатками партий')
+        parser.add_argument('--years', type=int, default=5,
+                            help='За сколько лет распределить поставки и продажи')
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=None,
+                            help='Зерно генератора для воспроизводимого набора')
+
+    def handle(self, *args, **options):
+        for option in ('products', 'categories', 'suppliers', 'years', 'chunk_size'):
+            if options[option] < 1:
+                raise CommandError(f'--{option.replace("_", "-")} должно быть больше нуля')
+
+        created = seed(
+            products=options['products'],
+            categories=options['categories'],
+            suppliers=options['suppliers'],
+            batches=options['batches'],
+            sales=options['sales'],
+            years=options['years'],
+            chunk_size=options['chunk_size'],
+            seed=options['seed'],
+            log=self.stdout.write,
+        )
+        summary = ', '.join(f'{name}: {count}' for name, count in created.items())
+        self.stdout.write(self.style.SUCCESS(f'Создано — {summary}'))
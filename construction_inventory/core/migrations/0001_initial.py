@@ -0,0 +1,33 @@
+# Generated by Django 4.2.24 on 2026-10-18 14:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name="CacheVersion",
+            fields=[
+                (
+                    "key",
+                    models.CharField(
+                        max_length=100,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="Модель",
+                    ),
+                ),
+                ("token", models.CharField(max_length=32, verbose_name="Версия")),
+            ],
+            options={
+                "verbose_name": "Версия кэша",
+                "verbose_name_plural": "Версии кэша",
+                "db_table": "Версии кэша",
+            },
+        ),
+    ]
@@ -0,0 +1,55 @@
+from django.db import migrations
+
+# (код вида в core.search.KINDS, таблица, колонка с названием)
+SOURCES = [
+    (1, "Товары", "name"),
+    (2, "supplies_supplier", "name"),
+    (3, "Категории", "name"),
+]
+
+NORMALIZED = "replace(replace({0}, 'ё', 'е'), 'Ё', 'Е')"
+
+
+def forward_sql():
+    statements = [
+        "CREATE VIRTUAL TABLE search_index USING fts5("
+        "name UNINDEXED, text, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+    ]
+    for code, table, column in SOURCES:
+        new_row = f"new.id * 8 + {code}, new.{column}, " + NORMALIZED.format(f"new.{column}")
+        statements += [
+            f'INSERT INTO search_index (rowid, name, text) SELECT id * 8 + {code}, {column}, '
+            + NORMALIZED.format(column)
+            + f' FROM "{table}"',
+            f'CREATE TRIGGER "search_index_{code}_insert" AFTER INSERT ON "{table}" BEGIN '
+            f"INSERT INTO search_index (rowid, name, text) VALUES ({new_row}); END",
+            f'CREATE TRIGGER "search_index_{code}_update" AFTER UPDATE OF {column} ON "{table}" BEGIN '
+            f"DELETE FROM search_index WHERE rowid = old.id * 8 + {code}; "
+            f"INSERT INTO search_index (rowid, name, text) VALUES ({new_row}); END",
+            f'CREATE TRIGGER "search_index_{code}_delete" AFTER DELETE ON "{table}" BEGIN '
+            f"DELETE FROM search_index WHERE rowid = old.id * 8 + {code}; END",
+        ]
+    return statements
+
+
+def reverse_sql():
+    statements = [
+        f'DROP TRIGGER IF EXISTS "search_index_{code}_{event}"'
+        for code, _, _ in SOURCES
+        for event in ("insert", "update", "delete")
+    ]
+    return statements + ["DROP TABLE IF EXISTS search_index"]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0001_initial"),
+        ("products", "0003_hot_path_indexes"),
+        ("supplies", "0001_initial"),
+        ("categories", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RunSQL(sql=forward_sql(), reverse_sql=reverse_sql()),
+    ]
@@ -0,0 +1,71 @@
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+
+
+class CacheVersion(models.Model):
+    """
+    Версия закэшированных справочников по модели. Хранится в базе, чтобы
+    все процессы приложения видели смену версии сразу после коммита.
+    """
+    key = models.CharField(max_length=100, primary_key=True, verbose_name="Модель")
+    token = models.CharField(max_length=32, verbose_name="Версия")
+
+    class Meta:
+        db_table = "Версии кэша"
+        verbose_name = "Версия кэша"
+        verbose_name_plural = "Версии кэша"
+
+    def __str__(self):
+        return f"{self.key}: {self.token}"
+
+
+class Job(models.Model):
+    """
+    Фоновая задача (выгрузка, пересчёт), которую выполняет команда run_jobs.
+    Очередь — сама таблица: воркер забирает задачу условным UPDATE по статусу.
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Готово'),
+        (FAILED, 'Ошибка'),
+    ]
+
+    kind = models.CharField(max_length=50, verbose_name="Тип задачи")
+    params = models.JSONField(default=dict, blank=True, verbose_name="Параметры")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING, verbose_name="Статус")
+    progress = models.PositiveSmallIntegerField(default=0, verbose_name="Прогресс, %")
+    message = models.CharField(max_length=255, blank=True, verbose_name="Сообщение")
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name="Попыток")
+    max_attempts = models.PositiveSmallIntegerField(default=3, verbose_name="Максимум попыток")
+    error = models.TextField(blank=True, verbose_name="Ошибка")
+    result = models.FileField(upload_to='jobs/%Y/%m/', blank=True, verbose_name="Файл результата")
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='jobs', verbose_name="Автор",
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Создана")
+    run_after = models.DateTimeField(default=timezone.now, verbose_name="Не раньше")
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="Начата")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Завершена")
+
+    class Meta:
+        db_table = "Фоновые задачи"
+        verbose_name = "Фоновая задача"
+        verbose_name_plural = "Фоновые задачи"
+        indexes = [
+            # Выбор следующей задачи: ожидающие в порядке готовности
+            models.Index(
+                fields=['run_after', 'id'],
+                condition=models.Q(status='pending'),
+                name='job_queue_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f"#{self.pk} {self.kind}: {self.get_status_display()}"
@@ -0,0 +1,138 @@
+"""
+Постраничный вывод по ключу (keyset) вместо OFFSET.
+
+Страница задаётся курсором — значениями полей сортировки у последней
+(или первой) строки предыдущей страницы. Условие вида
+"sale_date <= X AND (sale_date < X OR id < Y)" идёт по составному индексу,
+поэтому сотая страница стоит столько же, сколько первая.
+"""
+import base64
+import json
+from functools import reduce
+from operator import or_
+
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    @property
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+
+class KeysetPaginator:
+    """
+    ordering — поля сортировки в формате order_by(), последнее должно быть
+    уникальным (обычно '-id'). Для них нужен составной индекс.
+    """
+
+    def __init__(self, queryset, per_page, ordering=('-id',)):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = list(ordering)
+        self.fields = [field.lstrip('-') for field in self.ordering]
+        self.model = queryset.model
+
+    def _attname(self, name):
+        return self.model._meta.get_field(name).attname
+
+    def encode(self, obj):
+        if isinstance(obj, dict):
+            # Строка из values(): ключ — имя поля, как в ordering
+            values = [obj[name] for name in self.fields]
+        else:
+            values = [getattr(obj, self._attname(name)) for name in self.fields]
+        # isoformat() без округления: DjangoJSONEncoder срезает микросекунды,
+        # и строки с одинаковым временем на границе страницы терялись бы
+        raw = json.dumps(
+            [value.isoformat() if hasattr(value, 'isoformat') else value for value in values],
+            default=str,
+        ).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode(self, cursor):
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            values = json.loads(raw)
+            if not isinstance(values, list) or len(values) != len(self.fields):
+                raise ValueError
+            return [
+                self.model._meta.get_field(name).to_python(value)
+                for name, value in zip(self.fields, values)
+            ]
+        except (ValueError, TypeError) as error:
+            raise InvalidCursor('Некорректный курсор страницы') from error
+
+    @staticmethod
+    def _reverse(ordering):
+        return [field[1:] if field.startswith('-') else f'-{field}' for field in ordering]
+
+    def _beyond(self, ordering, values):
+        """Условие «строго дальше курсора» для заданной сортировки."""
+        lookups = [('lt' if field.startswith('-') else 'gt', field.lstrip('-')) for field in ordering]
+        branches = []
+        for position, (lookup, name) in enumerate(lookups):
+            condition = Q(**{f'{name}__{lookup}': values[position]})
+            for index in range(position):
+                condition &= Q(**{lookups[index][1]: values[index]})
+            branches.append(condition)
+        first_lookup, first_name = lookups[0]
+        # Нестрогое ограничение по первому полю даёт планировщику диапазон индекса
+        bound = Q(**{f'{first_name}__{first_lookup}e': values[0]})
+        return bound & reduce(or_, branches)
+
+    def window(self, after=None, before=None):
+        """
+        Запрос строк страницы: на одну больше per_page, чтобы узнать, есть ли
+        следующая. Для before строки идут в обратном порядке.
+        """
+        if before:
+            ordering = self._reverse(self.ordering)
+            queryset = self.queryset.filter(self._beyond(ordering, self.decode(before)))
+        else:
+            ordering = self.ordering
+            queryset = self.queryset
+            if after:
+                queryset = queryset.filter(self._beyond(ordering, self.decode(after)))
+        return queryset.order_by(*ordering)[:self.per_page + 1]
+
+    def page(self, after=None, before=None):
+        """Страница после курсора after, перед курсором before или первая."""
+        rows = list(self.window(after, before))
+        more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+
+        if before:
+            if not more:
+                # Дошли до начала списка: показываем полную первую страницу
+                return self.page()
+            rows.reverse()
+            next_cursor = self.encode(rows[-1])
+            previous_cursor = self.encode(rows[0])
+        else:
+            next_cursor = self.encode(rows[-1]) if rows and more else None
+            previous_cursor = self.encode(rows[0]) if rows and after else None
+        return KeysetPage(rows, next_cursor, previous_cursor)
@@ -0,0 +1,169 @@
+"""
+Учёт SQL-запросов на один HTTP-запрос.
+
+QueryBudgetMiddleware считает запросы, суммарное время SQL и повторяющиеся
+выражения (типичный след N+1), отдаёт их в заголовке Server-Timing и пишет
+предупреждение в лог 'core.querybudget', если представление превысило
+свой бюджет. Бюджет задаётся декоратором:
+
+    @query_budget(5)
+    class BatchList(LoginRequiredMixin, ListView): ...
+
+По умолчанию действует QUERY_BUDGET_DEFAULT из настроек.
+
+Считаются запросы ко всем базам из settings.DATABASES (и к основной, и к
+readonly), в том числе из потоков core.aio.run_queries: активные счётчики
+лежат в ContextVar, который sync_to_async переносит в рабочий поток, а
+run_queries ставит там обёртку на соединения этого потока. Тело потокового
+ответа (выгрузки) читается уже после представления: его запросы попадают
+в лог бюджета, но не в Server-Timing — заголовок к тому времени отправлен.
+"""
+import logging
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# Счётчики, в которые сейчас пишутся запросы; вложенные замеры
+# (бенчмарк поверх middleware) считают одни и те же запросы
+_recorders = ContextVar('query_recorders', default=())
+
+
+def query_budget(limit):
+    """Задаёт бюджет запросов для функции-представления или класса представления."""
+    def decorator(view):
+        view.query_budget = limit
+        return view
+    return decorator
+
+
+def get_view_budget(view_func):
+    view_class = getattr(view_func, 'view_class', None)
+    budget = getattr(view_func, 'query_budget', None)
+    if budget is None and view_class is not None:
+        budget = getattr(view_class, 'query_budget', None)
+    if budget is None:
+        budget = getattr(settings, 'QUERY_BUDGET_DEFAULT', None)
+    return budget
+
+
+class QueryRecorder:
+    """Статистика запросов; пополняется из нескольких потоков сразу."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+        self._lock = threading.Lock()
+
+    def add(self, sql, duration):
+        with self._lock:
+            self.duration += duration
+            self.count += 1
+            self.statements[sql] += 1
+
+    @property
+    def duplicates(self):
+        return {sql: times for sql, times in self.statements.items() if times > 1}
+
+    def server_timing(self):
+        duplicated = sum(times - 1 for times in self.duplicates.values())
+        return (
+            f'db;dur={self.duration * 1000:.1f};desc="{self.count} queries", '
+            f'dup;desc="{duplicated} repeated"'
+        )
+
+
+def _record(execute, sql, params, many, context):
+    recorders = _recorders.get()
+    if not recorders:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - started
+        for recorder in recorders:
+            recorder.add(sql, duration)
+
+
+@contextmanager
+def wrap_connections():
+    """
+    Ставит счётчик на соединения текущего потока ко всем базам. Соединения
+    в Django у каждого потока свои, поэтому run_queries вызывает это в
+    рабочем потоке заново.
+    """
+    with ExitStack() as stack:
+        if _recorders.get():
+            for alias in settings.DATABASES:
+                connection = connections[alias]
+                if _record not in connection.execute_wrappers:
+                    stack.enter_context(connection.execute_wrapper(_record))
+        yield
+
+
+@contextmanager
+def count_queries(recorder=None):
+    """
+    Считает запросы внутри блока:
+
+        with count_queries() as recorder:
+            client.get(url)
+        recorder.count
+    """
+    recorder = recorder or QueryRecorder()
+    token = _recorders.set(_recorders.get() + (recorder,))
+    try:
+        with wrap_connections():
+            yield recorder
+    finally:
+        _recorders.reset(token)
+
+
+class QueryBudgetMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with count_queries() as recorder:
+            response = self.get_response(request)
+
+        response['Server-Timing'] = recorder.server_timing()
+        if response.streaming:
+            response.streaming_content = self._stream(request, response.streaming_content, recorder)
+        else:
+            self._check_budget(request, recorder)
+        return response
+
+    def _stream(self, request, content, recorder):
+        chunks = iter(content)
+        while True:
+            # Счётчик включается только на время чтения очередного куска:
+            # между ними сервер отдаёт данные, а не ходит в базу
+            with count_queries(recorder):
+                chunk = next(chunks, None)
+            if chunk is None:
+                break
+            yield chunk
+        self._check_budget(request, recorder)
+
+    def _check_budget(self, request, recorder):
+        budget = getattr(request, 'query_budget', None)
+        if budget is not None and recorder.count > budget:
+            logger.warning(
+                '%s %s: %d SQL-запросов при бюджете %d (%.1f мс, повторов: %d)',
+                request.method, request.path, recorder.count, budget,
+                recorder.duration * 1000, len(recorder.duplicates),
+                extra={'duplicates': recorder.duplicates},
+            )
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_budget = get_view_budget(view_func)
+        return None
@@ -0,0 +1,165 @@
+"""
+Каталог «горячих» запросов приложения для проверки планов выполнения.
+
+Элементы строятся тем же кодом, что выполняется в приложении: списки —
+через get_queryset() самого представления (как в core.exports), сервисы —
+через их функции. Для агрегатов берётся queryset, который агрегируется:
+какие строки и по какому индексу читаются, в нём видно так же.
+Команда explain_queries прогоняет их через EXPLAIN QUERY PLAN и
+показывает полные просмотры таблиц и сортировки во временном B-дереве.
+"""
+import re
+from datetime import timedelta
+
+from django.db import connections
+from django.test import RequestFactory
+from django.utils import timezone
+
+from categories.views import CategoryList
+from core.pagination import KeysetPaginator
+from products.models import Product
+from sales.forms import SaleCreateForm
+from sales.models import DailySalesRollup
+from sales.views import SaleList
+from supplies.views import SuppliesList
+from warehouse import history
+from warehouse.services import active_batches, fifo_batches, initial_history_records, supplier_tree_batches
+from warehouse.views import BatchList
+
+_catalog = []
+
+SCAN = re.compile(r'\bSCAN (?P<target>.+?)(?: USING |$)')
+# Подзапрос, в который Django оборачивает фильтр по оконной функции
+DERIVED = {'qualify'}
+INDEX = re.compile(r'USING (?:COVERING )?INDEX (.+?)(?: \(|$)')
+
+
+class PlannedQuery:
+    def __init__(self, name, build, where, allow_scan=False):
+        self.name = name
+        self.build = build
+        # Где в приложении выполняется запрос
+        self.where = where
+        # Полный просмотр ожидаем: таблица маленькая или индекс не поможет
+        self.allow_scan = allow_scan
+
+    def plan(self):
+        # QuerySet.explain() в Django 4.2 ломается на фильтре по оконной
+        # функции (обёртка "qualify"), поэтому EXPLAIN ставится перед
+        # готовым SQL, а строки плана форматируются так же, как у explain()
+        queryset = self.build()
+        sql, params = queryset.query.sql_with_params()
+        with connections[queryset.db].cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            return [' '.join(str(value) for value in row) for row in cursor.fetchall()]
+
+    def scans(self, plan=None):
+        """Строки плана с полным просмотром таблицы (без индекса)."""
+        return [
+            line for line in (plan or self.plan())
+            if (match := SCAN.search(line)) and match.group('target') not in DERIVED
+            and not match.group('target').startswith('(') and 'INDEX' not in line
+        ]
+
+    def indexes(self, plan=None):
+        """Имена индексов, которые использует план."""
+        return {match.group(1) for line in (plan or self.plan()) for match in INDEX.finditer(line)}
+
+
+def planned(name, where, allow_scan=False):
+    def decorator(build):
+        _catalog.append(PlannedQuery(name, build, where, allow_scan))
+        return build
+    return decorator
+
+
+def catalog():
+    return list(_catalog)
+
+
+def _view(view_class, **params):
+    """Представление, настроенное на GET-запрос с параметрами params."""
+    view = view_class()
+    view.setup(RequestFactory().get('/', params))
+    return view
+
+
+def _sales_paginator():
+    view = _view(SaleList)
+    return KeysetPaginator(view.get_queryset(), view.per_page, ordering=view.keyset_ordering)
+
+
+@planned('active-batches', 'BatchList → build_supplier_tree')
+def _active_batches():
+    return supplier_tree_batches(_view(BatchList).get_queryset())
+
+
+@planned('active-stock', 'SuppliesList (число партий), виджет аналитики stock (стоимость остатков)')
+def _active_stock():
+    # count() и aggregate() сортировку по умолчанию отбрасывают
+    return active_batches().order_by()
+
+
+@planned('fifo-allocation', 'allocate_fifo')
+def _fifo_allocation():
+    return fifo_batches([1, 2])
+
+
+@planned('product-batches', 'ProductDetail')
+def _product_batches():
+    return Product(pk=1).batches.all()
+
+
+@planned('products-in-stock', 'SaleCreateForm')
+def _products_in_stock():
+    return SaleCreateForm.base_fields['product'].queryset
+
+
+@planned('sales-page', 'SaleList')
+def _sales_page():
+    return _sales_paginator().window()
+
+
+@planned('sales-next-page', 'SaleList, переход по курсору')
+def _sales_next_page():
+    paginator = _sales_paginator()
+    return paginator.window(after=paginator.encode({'sale_date': timezone.now(), 'id': 1000}))
+
+
+@planned('sales-period', 'SaleList с фильтром дат, выгрузка продаж')
+def _sales_period():
+    end = timezone.now()
+    return _view(
+        SaleList, start_date=(end - timedelta(days=30)).isoformat(), end_date=end.isoformat(),
+    ).get_queryset()
+
+
+@planned('rollup-month', 'виджеты аналитики daily-chart, growth, profit')
+def _rollup_month():
+    today = timezone.localdate()
+    return DailySalesRollup.for_month(today.year, today.month)
+
+
+@planned('batch-initial-history', 'ProductDetail → initial_batch_histories')
+def _batch_initial_history():
+    return initial_history_records([1, 2, 3])
+
+
+@planned('batch-history-retention', 'compact_batch_history')
+def _batch_history_retention():
+    return history.compaction_candidates(history.older_than(90), 0, 500)
+
+
+@planned('product-search', 'поиск в SaleList (core.search)')
+def _product_search():
+    return _view(SaleList, search='цемент').get_queryset()
+
+
+@planned('categories-by-size', 'CategoryList', allow_scan=True)
+def _categories_by_size():
+    return _view(CategoryList).get_queryset()
+
+
+@planned('suppliers', 'SuppliesList', allow_scan=True)
+def _suppliers():
+    return _view(SuppliesList).get_queryset()
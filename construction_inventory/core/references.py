@@ -0,0 +1,96 @@
+"""
+Кэш справочников для выпадающих списков (категории, поставщики).
+
+Списки лежат в кэше Django (по умолчанию — локальная память процесса)
+под ключом, в который входят версии моделей из CacheVersion. Сохранение
+или удаление объекта меняет версию его модели в той же транзакции, поэтому
+остальные процессы после коммита читают уже новый ключ, а старые записи
+просто истекают. Проверка версий — один запрос по первичному ключу.
+"""
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+
+from categories.models import Category
+from supplies.models import Supplier
+from .models import CacheVersion
+
+_references = {}
+
+
+class Reference:
+    def __init__(self, name, loader, models):
+        self.name = name
+        self.loader = loader
+        self.models = models
+
+    @property
+    def labels(self):
+        return sorted(model._meta.label_lower for model in self.models)
+
+
+def register(name, loader, models):
+    _references[name] = Reference(name, loader, models)
+
+
+def _tokens(labels):
+    tokens = dict(CacheVersion.objects.filter(key__in=labels).values_list('key', 'token'))
+    missing = [label for label in labels if label not in tokens]
+    if missing:
+        CacheVersion.objects.bulk_create(
+            [CacheVersion(key=label, token=uuid4().hex) for label in missing],
+            ignore_conflicts=True,
+        )
+        tokens = dict(CacheVersion.objects.filter(key__in=labels).values_list('key', 'token'))
+    return [tokens[label] for label in labels]
+
+
+def get_many(*names):
+    """Списки нескольких справочников; версии читаются одним запросом."""
+    references = [_references[name] for name in names]
+    labels = sorted({label for reference in references for label in reference.labels})
+    tokens = dict(zip(labels, _tokens(labels)))
+
+    keys = {
+        reference.name: f'reference:{reference.name}:'
+        + '.'.join(tokens[label] for label in reference.labels)
+        for reference in references
+    }
+    cached = cache.get_many(keys.values())
+    result = []
+    for reference in references:
+        objects = cached.get(keys[reference.name])
+        if objects is None:
+            objects = list(reference.loader())
+            cache.set(keys[reference.name], objects, getattr(settings, 'REFERENCE_CACHE_TIMEOUT', 3600))
+        result.append(objects)
+    return result
+
+
+def get(name):
+    """Список объектов справочника name из кэша или из базы."""
+    return get_many(name)[0]
+
+
+def bump(model):
+    # Новый случайный токен, а не счётчик: после отката транзакции или
+    # восстановления базы старый номер версии не совпадёт со свежими данными
+    label = model._meta.label_lower
+    if not CacheVersion.objects.filter(key=label).update(token=uuid4().hex):
+        CacheVersion.objects.bulk_create([CacheVersion(key=label, token=uuid4().hex)], ignore_conflicts=True)
+
+
+def _changed(sender, **kwargs):
+    bump(sender)
+
+
+def connect_signals():
+    for model in {model for reference in _references.values() for model in reference.models}:
+        post_save.connect(_changed, sender=model, dispatch_uid=f'references-save-{model._meta.label_lower}')
+        post_delete.connect(_changed, sender=model, dispatch_uid=f'references-delete-{model._meta.label_lower}')
+
+
+register('categories', lambda: Category.objects.order_by('name'), [Category])
+register('suppliers', lambda: Supplier.objects.order_by('name'), [Supplier])
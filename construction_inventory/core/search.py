@@ -0,0 +1,83 @@
+"""
+Полнотекстовый поиск по названиям товаров, поставщиков и категорий.
+
+Индекс — виртуальная таблица SQLite FTS5 search_index (миграция
+core 0002). Триггеры на таблицах товаров, поставщиков и категорий держат
+её в актуальном состоянии при любых изменениях, включая bulk_create и
+update(). rowid строки — id объекта * 8 + код вида, поэтому обновление
+и удаление идут по первичному ключу индекса.
+
+Индексируется колонка text — название, где «ё» заменена на «е» (так же
+нормализуется запрос), исходное название хранится в неиндексируемой name.
+Токенизатор unicode61 приводит к одному регистру и кириллицу. Каждое слово запроса
+ищется как префикс: «цем м5» найдёт «Цемент М500».
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+TABLE = 'search_index'
+ROWID_STEP = 8
+KINDS = {
+    'product': 1,
+    'supplier': 2,
+    'category': 3,
+}
+
+_WORD = re.compile(r'\w+')
+
+
+def normalize(text):
+    return text.replace('ё', 'е').replace('Ё', 'Е')
+
+
+def match_expression(text):
+    """Выражение для MATCH: все слова запроса как префиксы; None для пустого запроса."""
+    words = _WORD.findall(normalize(text or ''))
+    if not words:
+        return None
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def matching_ids(kind, text):
+    """Подзапрос id объектов вида kind, подходящих под text (для __in)."""
+    return RawSQL(
+        f'SELECT rowid / {ROWID_STEP} FROM {TABLE} '
+        f'WHERE {TABLE} MATCH %s AND rowid %% {ROWID_STEP} = %s',
+        [match_expression(text), KINDS[kind]],
+    )
+
+
+def search_filter(field, kind, text):
+    """
+    Условие для queryset: field (путь до id объекта) входит в результаты поиска.
+
+        queryset.filter(search_filter('batch__product_id', 'product', query))
+
+    Пустой запрос ничего не ограничивает.
+    """
+    if match_expression(text) is None:
+        return Q()
+    return Q(**{f'{field}__in': matching_ids(kind, text)})
+
+
+def search(text, limit=20, kinds=None):
+    """Ранжированные (bm25) совпадения по всем видам: список (вид, id, название)."""
+    expression = match_expression(text)
+    if expression is None:
+        return []
+    codes = {code: kind for kind, code in KINDS.items() if kinds is None or kind in kinds}
+    placeholders = ', '.join(['%s'] * len(codes))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT rowid, name FROM {TABLE} '
+            f'WHERE {TABLE} MATCH %s AND rowid %% {ROWID_STEP} IN ({placeholders}) '
+            f'ORDER BY bm25({TABLE}) LIMIT %s',
+            [expression, *codes, limit],
+        )
+        return [
+            (codes[rowid % ROWID_STEP], rowid // ROWID_STEP, name)
+            for rowid, name in cursor.fetchall()
+        ]
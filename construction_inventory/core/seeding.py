@@ -0,0 +1,147 @@
+"""
+Генератор синтетических данных для нагрузочных замеров.
+
+Объекты пишутся через bulk_create порциями, минуя Model.save(): списание
+остатков и дневные итоги восстанавливаются в конце reconcile_stock() и
+DailySalesRollup.rebuild(). Остаток партии сразу равен поставке минус
+сгенерированные продажи, поэтому данные согласованы.
+"""
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from categories.models import Category
+from products.models import Product
+from sales.models import DailySalesRollup, Sale
+from supplies.models import Supplier
+from warehouse.models import Batch, BatchGroup
+from warehouse.services import reconcile_stock
+
+
+@contextmanager
+def _explicit_dates(*fields):
+    # auto_now_add перезаписал бы даты поступления при bulk_create
+    saved = [(field, field.auto_now_add) for field in fields]
+    for field, _ in saved:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, value in saved:
+            field.auto_now_add = value
+
+
+def _chunks(total, size):
+    for start in range(0, total, size):
+        yield min(size, total - start)
+
+
+def seed(products=20000, categories=60, suppliers=300, batches=200000, sales=2000000,
+         years=5, chunk_size=5000, seed=None, log=None):
+    """Создаёт набор данных; возвращает количество созданных объектов по моделям."""
+    rnd = random.Random(seed)
+    log = log or (lambda message: None)
+    now = timezone.now()
+    start = now - timedelta(days=365 * years)
+    span = (now - start).total_seconds()
+    # Имена уникальны в модели, метка запуска позволяет сидировать повторно
+    run = format(int(now.timestamp()) % 10 ** 6, '06d')
+    created = {}
+
+    with transaction.atomic():
+        category_ids = [
+            obj.pk for obj in Category.objects.bulk_create(
+                Category(name=f'Категория {run}-{n}') for n in range(categories)
+            )
+        ]
+        supplier_ids = [
+            obj.pk for obj in Supplier.objects.bulk_create(
+                Supplier(
+                    name=f'Поставщик {run}-{n}',
+                    contact_face=f'Менеджер {n}',
+                    telephone=f'+7900{n:07d}'[:14],
+                )
+                for n in range(suppliers)
+            )
+        ]
+    created['categories'] = len(category_ids)
+    created['suppliers'] = len(supplier_ids)
+
+    product_ids = []
+    for size in _chunks(products, chunk_size):
+        offset = len(product_ids)
+        with transaction.atomic():
+            product_ids.extend(
+                obj.pk for obj in Product.objects.bulk_create(
+                    Product(
+                        name=f'Товар {run}-{offset + n}',
+                        category_id=rnd.choice(category_ids),
+                        supplier_id=rnd.choice(supplier_ids),
+                    )
+                    for n in range(size)
+                )
+            )
+    created['products'] = len(product_ids)
+    log(f'Товары: {len(product_ids)}')
+
+    with transaction.atomic():
+        groups = BatchGroup.objects.bulk_create(
+            (BatchGroup(product_id=product_id) for product_id in product_ids),
+            batch_size=chunk_size,
+        )
+    group_by_product = {group.product_id: group.pk for group in groups}
+    created['batch_groups'] = len(groups)
+
+    sales_per_batch = sales / batches if batches else 0
+    created['batches'] = created['sales'] = 0
+    date_fields = [Batch._meta.get_field('arrival_date')]
+    with _explicit_dates(*date_fields):
+        for size in _chunks(batches, chunk_size):
+            chunk_batches = []
+            chunk_sales = []
+            for _ in range(size):
+                product_id = rnd.choice(product_ids)
+                arrival = start + timedelta(seconds=rnd.random() * span)
+                remaining = rnd.randint(20, 500)
+                sold = []
+                for _ in range(int(rnd.random() * 2 * sales_per_batch + 0.5)):
+                    if not remaining:
+                        break
+                    quantity = min(remaining, rnd.randint(1, 5))
+                    remaining -= quantity
+                    sale_date = arrival + timedelta(seconds=rnd.random() * (now - arrival).total_seconds())
+                    sold.append((quantity, sale_date))
+                batch = Batch(
+                    product_id=product_id,
+                    group_id=group_by_product[product_id],
+                    price=Decimal(rnd.randint(5000, 500000)) / 100,
+                    quantity=remaining,
+                    arrival_date=arrival,
+                )
+                batch._history_date = arrival
+                chunk_batches.append(batch)
+                chunk_sales.append(sold)
+
+            with transaction.atomic():
+                Batch.objects.bulk_create(chunk_batches)
+                Batch.history.bulk_history_create(chunk_batches, batch_size=chunk_size)
+                Sale.objects.bulk_create(
+                    (
+                        Sale(batch_id=batch.pk, quantity=quantity, price=batch.price, sale_date=sale_date)
+                        for batch, sold in zip(chunk_batches, chunk_sales)
+                        for quantity, sale_date in sold
+                    ),
+                    batch_size=chunk_size,
+                )
+            created['batches'] += len(chunk_batches)
+            created['sales'] += sum(len(sold) for sold in chunk_sales)
+            log(f'Партии: {created["batches"]}, продажи: {created["sales"]}')
+
+    reconcile_stock()
+    DailySalesRollup.rebuild()
+    log('Остатки и дневные итоги пересчитаны')
+    return created
@@ -0,0 +1,55 @@
+from django.utils import timezone
+
+from categories.models import Category
+from products.models import Product
+from sales.models import Sale
+from supplies.models import Supplier
+from warehouse.models import Batch, BatchGroup
+from .querybudget import count_queries
+
+
+class QueryBudgetMixin:
+    """
+    Проверка бюджета запросов для страниц в тестах.
+
+        self.assertQueryBudget('/crm-system/sales/', 6)
+
+    При превышении тест падает со списком выполненных запросов.
+    """
+
+    def assertQueryBudget(self, url, budget, method='get', data=None, status=200, **extra):
+        # Считаются запросы ко всем базам, в том числе из потоков run_queries
+        with count_queries() as recorder:
+            response = getattr(self.client, method)(url, data or {}, **extra)
+        self.assertEqual(response.status_code, status, url)
+        if recorder.count > budget:
+            statements = '\n'.join(
+                f'{times}× {sql}' for sql, times in recorder.statements.most_common()
+            )
+            self.fail(f'{url}: {recorder.count} запросов при бюджете {budget}\n{statements}')
+        return response
+
+
+def create_store(products=4, batches_per_product=3, sales_per_batch=2):
+    """
+    Небольшой магазин для тестов страниц: поставщики, категории, товары,
+    партии и продажи. Бюджет запросов не должен зависеть от этих чисел.
+    """
+    store = {'products': [], 'batches': [], 'sales': []}
+    for number in range(products):
+        category, _ = Category.objects.get_or_create(name=f'Категория {number % 2}')
+        supplier, _ = Supplier.objects.get_or_create(
+            name=f'Поставщик {number % 2}',
+            defaults={'contact_face': 'Иванов', 'telephone': '+70000000000', 'email': 'info@example.com'},
+        )
+        product = Product.objects.create(name=f'Товар {number}', category=category, supplier=supplier)
+        group = BatchGroup.objects.create(product=product)
+        store['products'].append(product)
+        for _ in range(batches_per_product):
+            batch = Batch.objects.create(product=product, group=group, price=100, quantity=50)
+            store['batches'].append(batch)
+            for _ in range(sales_per_batch):
+                store['sales'].append(
+                    Sale.objects.create(batch=batch, quantity=1, sale_date=timezone.now())
+                )
+    return store
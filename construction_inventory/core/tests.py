@@ -0,0 +1,410 @@
+import csv
+import io
+import json
+import tempfile
+import zipfile
+from xml.etree import ElementTree
+
+from asgiref.sync import async_to_sync
+from django.contrib.sessions.models import Session
+from django.db import OperationalError, connection, connections, transaction
+from django.db.models import F, Sum
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+
+from products.models import Product
+from sales.models import DailySalesRollup, Sale
+from users.models import CustomUser
+from warehouse.models import Batch
+from warehouse.services import reconcile_stock
+from categories.models import Category
+from supplies.models import Supplier
+from . import exports, jobs, loadtest, queryplans, references, search
+from .aio import run_queries
+from .benchmarks import benchmark_client, fetch, percentile
+from .database import READ_ONLY_DATABASE, reading_replica
+from .models import Job
+from .seeding import seed
+from .testing import create_store
+from .xlsx import read_xlsx
+
+
+class QueryBudgetMiddlewareTests(TestCase):
+    def setUp(self):
+        create_store(products=2)
+        self.client.force_login(CustomUser.objects.create(username='manager'))
+
+    def test_server_timing_reports_queries(self):
+        response = self.client.get('/crm-system/sales/')
+
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries", dup;desc="\d+ repeated"$')
+
+    @override_settings(QUERY_BUDGET_DEFAULT=0)
+    def test_exceeded_budget_is_logged(self):
+        with self.assertLogs('core.querybudget', level='WARNING') as logs:
+            # У страницы создания поставщика нет своего бюджета
+            self.client.get('/crm-system/supplies/create-supplies/')
+
+        self.assertIn('/crm-system/supplies/create-supplies/', logs.output[0])
+
+
+class SeedingTests(TestCase):
+    def test_seeded_data_is_consistent(self):
+        created = seed(products=20, categories=3, suppliers=4, batches=60, sales=300, chunk_size=25, seed=1)
+
+        self.assertEqual(created['batches'], Batch.objects.count())
+        self.assertEqual(created['sales'], Sale.objects.count())
+        self.assertEqual(reconcile_stock(dry_run=True), (0, 0))
+        self.assertEqual(
+            DailySalesRollup.objects.aggregate(total=Sum('quantity'))['total'],
+            Sale.objects.aggregate(total=Sum('quantity'))['total'],
+        )
+        self.assertFalse(Sale.objects.filter(sale_date__lt=F('batch__arrival_date')).exists())
+        self.assertEqual(Batch.history.count(), created['batches'])
+        self.assertEqual(Product.objects.count(), 20)
+
+
+class ExportTests(TestCase):
+    names = ('categories', 'products', 'sales', 'supplies', 'warehouse')
+    formats = ('csv', 'jsonl', 'xlsx')
+
+    def setUp(self):
+        store = create_store(products=3, batches_per_product=2, sales_per_batch=2)
+        # Распроданная партия в складскую выгрузку не попадает
+        Batch.objects.filter(pk=store['batches'][0].pk).update(quantity=0)
+        self.client.force_login(CustomUser.objects.create(username='manager'))
+        self.expected_rows = {
+            'categories': Category.objects.count(),
+            'products': Product.objects.count(),
+            'sales': Sale.objects.count(),
+            'supplies': Supplier.objects.count(),
+            'warehouse': Batch.objects.filter(quantity__gt=0).count(),
+        }
+
+    def download(self, name, fmt):
+        response = self.client.get(f'/crm-system/export/{name}/{fmt}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(f'{name}_export_', response['Content-Disposition'])
+        return b''.join(response.streaming_content)
+
+    def parse(self, export, fmt, body):
+        """Заголовок и строки выгрузки как списки строк."""
+        if fmt == 'csv':
+            rows = list(csv.reader(io.StringIO(body.decode('utf-8-sig'))))
+            return rows[0], rows[1:]
+        if fmt == 'jsonl':
+            records = [json.loads(line) for line in body.decode().splitlines()]
+            for record in records:
+                self.assertEqual(list(record), export.keys)
+            return export.headers, [[str(value) for value in record.values()] for record in records]
+
+        with zipfile.ZipFile(io.BytesIO(body)) as archive:
+            self.assertIsNone(archive.testzip())
+            self.assertIn('[Content_Types].xml', archive.namelist())
+            self.assertIn('xl/workbook.xml', archive.namelist())
+            for member in archive.namelist():
+                if member.endswith('.xml') or member.endswith('.rels'):
+                    # Битый XML Excel не откроет
+                    ElementTree.fromstring(archive.read(member))
+        rows = list(read_xlsx(io.BytesIO(body)))
+        return rows[0], rows[1:]
+
+    def test_every_export_in_every_format(self):
+        self.assertEqual(len(self.names) * len(self.formats), 15)
+        for name in self.names:
+            export = exports.get_export(name)
+            for fmt in self.formats:
+                with self.subTest(export=name, fmt=fmt):
+                    header, rows = self.parse(export, fmt, self.download(name, fmt))
+                    self.assertEqual(header, export.headers)
+                    self.assertEqual(len(rows), self.expected_rows[name])
+                    self.assertTrue(all(len(row) == len(header) for row in rows))
+
+    def test_values_match_the_list(self):
+        _, rows = self.parse(exports.get_export('sales'), 'xlsx', self.download('sales', 'xlsx'))
+
+        self.assertEqual(
+            sorted(row[1] for row in rows),
+            sorted(Sale.objects.values_list('batch__product__name', flat=True)),
+        )
+        self.assertEqual({row[3] for row in rows}, {'1'})
+
+    def test_filters_from_the_page_apply(self):
+        header, rows = self.parse(
+            exports.get_export('products'), 'csv',
+            self.client.get('/crm-system/export/products/csv/', {'search': 'Товар 1'}).getvalue(),
+        )
+
+        self.assertEqual([row[1] for row in rows], ['Товар 1'])
+
+    def test_unknown_export_or_format(self):
+        self.assertEqual(self.client.get('/crm-system/export/нет/csv/').status_code, 404)
+        self.assertEqual(self.client.get('/crm-system/export/sales/pdf/').status_code, 404)
+
+
+class PercentileTests(SimpleTestCase):
+    def test_interpolates_between_samples(self):
+        self.assertEqual(percentile([40, 10, 30, 20], 0.5), 25)
+        self.assertEqual(percentile([10, 20], 0.95), 19.5)
+        self.assertIsNone(percentile([], 0.5))
+
+
+class BenchmarkClientTests(TestCase):
+    @override_settings(ALLOWED_HOSTS=['localhost'])
+    def test_temporary_user_is_removed_with_its_session(self):
+        with benchmark_client() as client:
+            user = CustomUser.objects.get()
+            self.assertTrue(user.is_superuser)
+            self.assertFalse(user.has_usable_password())
+            self.assertEqual(client.get('/crm-system/sales/').status_code, 200)
+
+        self.assertFalse(CustomUser.objects.exists())
+        self.assertFalse(Session.objects.exists())
+
+    def test_existing_user_is_kept(self):
+        manager = CustomUser.objects.create(username='manager')
+
+        with benchmark_client('manager') as client:
+            self.assertEqual(int(client.session['_auth_user_id']), manager.pk)
+
+        self.assertEqual(list(CustomUser.objects.all()), [manager])
+        with self.assertRaisesMessage(ValueError, 'не найден'):
+            with benchmark_client('нет'):
+                pass
+
+
+class LoadTestTests(TransactionTestCase):
+    def test_mixed_workload_keeps_stock_consistent(self):
+        create_store(products=3, sales_per_batch=0)
+
+        report = loadtest.run(cashiers=2, managers=1, iterations=3, seed=1)
+
+        self.assertEqual(report['latency']['count'], 9)
+        self.assertEqual(report['errors'], [])
+        self.assertEqual(report['consistency_violations'], [])
+        # Временный пользователь нагрузки не остаётся в базе
+        self.assertFalse(CustomUser.objects.exists())
+
+
+class ReferenceCacheTests(TestCase):
+    def test_lists_are_served_from_cache_until_model_changes(self):
+        Category.objects.create(name='Крепёж')
+        references.get('categories')
+
+        with self.assertNumQueries(1):
+            self.assertEqual([category.name for category in references.get('categories')], ['Крепёж'])
+
+        Category.objects.create(name='Инструмент')
+
+        self.assertEqual(
+            [category.name for category in references.get('categories')], ['Инструмент', 'Крепёж']
+        )
+
+
+class QueryPlanTests(TestCase):
+    expected_indexes = {
+        'active-batches': 'batch_product_arrival_idx',
+        'fifo-allocation': 'batch_active_fifo_idx',
+        'active-stock': 'batch_active_fifo_idx',
+        'product-batches': 'batch_product_arrival_idx',
+        'products-in-stock': 'product_in_stock_idx',
+        'sales-page': 'sale_date_id_idx',
+        'sales-next-page': 'sale_date_id_idx',
+        'sales-period': 'sale_date_id_idx',
+        'batch-initial-history': 'batch_history_timeline_idx',
+        'batch-history-retention': 'batch_history_timeline_idx',
+    }
+
+    def test_hot_queries_use_their_indexes(self):
+        queries = {query.name: query for query in queryplans.catalog()}
+        for name, index in self.expected_indexes.items():
+            with self.subTest(name):
+                self.assertIn(index, queries[name].indexes())
+
+    def test_no_unexpected_full_scans(self):
+        for query in queryplans.catalog():
+            if not query.allow_scan:
+                with self.subTest(query.name):
+                    self.assertEqual(query.scans(), [])
+
+
+class SearchIndexTests(TestCase):
+    def setUp(self):
+        self.client.force_login(CustomUser.objects.create(username='manager'))
+        self.category = Category.objects.create(name='Сухие смеси')
+        self.supplier = Supplier.objects.create(name='ЦементТорг', contact_face='Петров', telephone='+70000000000')
+        self.cement = Product.objects.create(name='Цемент М500', category=self.category, supplier=self.supplier)
+        self.glue = Product.objects.create(name='Клей плиточный', category=self.category)
+
+    def product_ids(self, text):
+        return set(Product.objects.filter(search.search_filter('id', 'product', text)).values_list('id', flat=True))
+
+    def test_prefix_search_ignores_cyrillic_case_and_yo(self):
+        Product.objects.bulk_create([Product(name='Ёлочные крепления')])
+
+        self.assertEqual(self.product_ids('цем м5'), {self.cement.pk})
+        self.assertEqual(len(self.product_ids('елоч')), 1)
+        self.assertEqual(self.product_ids(''), set(Product.objects.values_list('id', flat=True)))
+
+    def test_index_follows_renames_and_deletes(self):
+        Product.objects.filter(pk=self.glue.pk).update(name='Грунтовка')
+        self.cement.delete()
+
+        self.assertEqual(self.product_ids('клей'), set())
+        self.assertEqual(self.product_ids('грунт'), {self.glue.pk})
+        self.assertEqual(self.product_ids('цемент'), set())
+
+    def test_list_search_boxes_use_index(self):
+        response = self.client.get('/crm-system/categories/', {'search_name': 'сухие'})
+        self.assertEqual([category.pk for category in response.context['categories']], [self.category.pk])
+
+        response = self.client.get('/crm-system/supplies/', {'search': 'цементт'})
+        self.assertEqual([supplier.pk for supplier in response.context['supplies']], [self.supplier.pk])
+
+        response = self.client.get('/crm-system/products/product-list/', {'search': 'клей'})
+        self.assertEqual([product.pk for product in response.context['products']], [self.glue.pk])
+
+    def test_global_search_ranks_hits_across_entities(self):
+        response = self.client.get('/crm-system/search/', {'q': 'цемент'})
+
+        hits = {hit['kind']: hit for hit in response.json()['results']}
+        self.assertEqual(set(hits), {'product', 'supplier'})
+        self.assertEqual(hits['product']['id'], self.cement.pk)
+        self.assertEqual(hits['product']['url'], f'/crm-system/products/product-info/{self.cement.pk}/')
+        self.assertEqual(hits['supplier']['id'], self.supplier.pk)
+
+        response = self.client.get('/crm-system/search/', {'q': 'цемент', 'kind': 'supplier'})
+        self.assertEqual([hit['kind'] for hit in response.json()['results']], ['supplier'])
+
+
+class ReadOnlyRoutingTests(TransactionTestCase):
+    databases = {'default', READ_ONLY_DATABASE}
+
+    def setUp(self):
+        create_store(products=2)
+        self.client.force_login(CustomUser.objects.create(username='manager'))
+
+    def test_connection_profile_is_applied(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+            cursor.execute('PRAGMA synchronous')
+            # 1 — NORMAL
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+    def recording(self, statements):
+        def record(execute, sql, params, many, context):
+            statements.append(sql)
+            return execute(sql, params, many, context)
+        return connections[READ_ONLY_DATABASE].execute_wrapper(record)
+
+    def test_concurrent_queries_keep_routing(self):
+        with reading_replica():
+            databases = async_to_sync(run_queries)(
+                lambda: Product.objects.all().db,
+                lambda: Product.objects.count(),
+            )
+
+        self.assertEqual(databases, [READ_ONLY_DATABASE, 2])
+
+    def test_export_streams_from_read_only_connection(self):
+        statements = []
+        with self.recording(statements):
+            response = self.client.get('/crm-system/export/sales/csv/')
+            # Строки читаются при итерации ответа, уже после представления
+            body = b''.join(response.streaming_content).decode('utf-8-sig')
+
+        self.assertEqual(len(body.strip().splitlines()), Sale.objects.count() + 1)
+        self.assertTrue(any('"Продажи"' in sql for sql in statements))
+
+    def test_export_queries_are_counted(self):
+        # Выгрузка читает из readonly и уже после представления
+        status, size, queries = fetch(self.client, '/crm-system/export/sales/csv/')
+
+        self.assertEqual(status, 200)
+        self.assertGreater(size, 0)
+        # Сессия, пользователь и сами продажи
+        self.assertGreaterEqual(queries, 3)
+
+    @override_settings(QUERY_BUDGET_DEFAULT=2)
+    def test_streamed_queries_count_towards_budget(self):
+        response = self.client.get('/crm-system/export/sales/csv/')
+        with self.assertLogs('core.querybudget', level='WARNING') as logs:
+            b''.join(response.streaming_content)
+
+        self.assertIn('/crm-system/export/sales/csv/', logs.output[0])
+
+    def test_read_only_connection_rejects_writes(self):
+        with self.assertRaises(OperationalError):
+            with connections[READ_ONLY_DATABASE].cursor() as cursor:
+                cursor.execute('DELETE FROM "Товары"')
+        self.assertTrue(Product.objects.exists())
+
+    def test_reads_inside_transaction_stay_on_default(self):
+        with reading_replica():
+            self.assertEqual(Product.objects.all().db, READ_ONLY_DATABASE)
+            with transaction.atomic():
+                self.assertEqual(Product.objects.all().db, 'default')
+        self.assertEqual(Product.objects.all().db, 'default')
+
+
+@jobs.register('test-flaky')
+def flaky_job(job, report):
+    if job.attempts < job.params.get('succeed_on', 99):
+        raise RuntimeError('временный сбой')
+    report(50, 'половина')
+
+
+@override_settings(JOB_RETRY_DELAY=0)
+class JobQueueTests(TransactionTestCase):
+    databases = {'default', READ_ONLY_DATABASE}
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        create_store(products=3)
+        self.user = CustomUser.objects.create(username='manager')
+        self.client.force_login(self.user)
+
+    def work(self):
+        return jobs.work(workers=2, once=True, poll_interval=0.01)
+
+    def test_export_runs_in_worker_and_is_downloaded(self):
+        response = self.client.post('/crm-system/jobs/start/export/', {
+            'name': 'sales', 'fmt': 'csv', 'query': '',
+        })
+        self.assertEqual(response.status_code, 202)
+        status_url = response.json()['status_url']
+        self.assertEqual(self.client.get(status_url).json()['status'], Job.PENDING)
+
+        self.assertEqual(self.work(), (1, 0))
+
+        job = self.client.get(status_url).json()
+        self.assertEqual((job['status'], job['progress']), (Job.DONE, 100))
+        download = self.client.get(job['download_url'])
+        body = b''.join(download.streaming_content).decode('utf-8-sig')
+        self.assertEqual(len(body.strip().splitlines()), Sale.objects.count() + 1)
+        self.assertIn('sales_export_', download['Content-Disposition'])
+
+    def test_failed_job_is_retried(self):
+        recovered = jobs.enqueue('test-flaky', {'succeed_on': 2})
+        broken = jobs.enqueue('test-flaky', max_attempts=2)
+
+        with self.assertLogs('core.jobs', level='ERROR') as logs:
+            self.assertEqual(self.work(), (1, 3))
+
+        self.assertEqual(len(logs.records), 3)
+        recovered.refresh_from_db()
+        broken.refresh_from_db()
+        self.assertEqual((recovered.status, recovered.attempts), (Job.DONE, 2))
+        self.assertEqual((broken.status, broken.attempts), (Job.FAILED, 2))
+        self.assertIn('временный сбой', broken.error)
+
+    def test_access_rules(self):
+        self.assertEqual(
+            self.client.post('/crm-system/jobs/start/export/', {'name': 'нет', 'fmt': 'csv'}).status_code, 400
+        )
+        self.assertEqual(self.client.post('/crm-system/jobs/start/reconcile-stock/').status_code, 403)
+
+        foreign = jobs.enqueue('reconcile-stock', user=CustomUser.objects.create(username='other'))
+        self.assertEqual(self.client.get(f'/crm-system/jobs/{foreign.pk}/').status_code, 404)
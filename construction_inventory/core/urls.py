@@ -0,0 +1,12 @@
+from django.urls import path
+from . import views
+
+app_name = 'core'
+
+urlpatterns = [
+    path('export/<slug:name>/<slug:fmt>/', views.ExportView.as_view(), name='export'),
+    path('search/', views.SearchView.as_view(), name='search'),
+    path('jobs/start/<slug:kind>/', views.JobStartView.as_view(), name='job-start'),
+    path('jobs/<int:pk>/', views.JobStatusView.as_view(), name='job-status'),
+    path('jobs/<int:pk>/download/', views.JobDownloadView.as_view(), name='job-download'),
+]
@@ -0,0 +1,175 @@
+import csv
+import os
+import time
+import zipfile
+from urllib.parse import urlencode
+
+from django.contrib import messages
+from django.contrib.auth.mixins import AccessMixin, LoginRequiredMixin
+from django.core.exceptions import ValidationError
+from django.http import FileResponse, Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.views import View
+from django.views.generic import FormView
+
+from . import exports, jobs, search
+from .database import read_only
+from .models import Job
+
+
+@read_only
+class ExportView(View):
+    def get(self, request, name, fmt):
+        export = exports.get_export(name)
+        writer = exports.get_format(fmt)
+        if export is None or writer is None:
+            raise Http404('Неизвестная выгрузка')
+
+        view = export.get_view(request)
+        # Выгрузка доступна тем же пользователям, что и сам список
+        if isinstance(view, AccessMixin) and not request.user.is_authenticated:
+            return view.handle_no_permission()
+
+        return exports.export_response(export, writer, view)
+
+
+class ImportView(LoginRequiredMixin, FormView):
+    """
+    Загрузка файла (CSV или XLSX) с отчётом на той же странице: сколько
+    записей создано и ошибки по строкам. Подклассы задают форму, шаблон
+    (он подключает core/import_form.html) и run_import.
+    """
+    submit_label = 'Загрузить'
+    created_label = 'Создано записей'
+    failed_message = 'Файл не загружен'
+    reports_updates = False
+
+    def run_import(self, upload, partial):
+        """Импортирует загруженный файл и возвращает ImportResult."""
+        raise NotImplementedError
+
+    def get_success_message(self, result):
+        if result.created:
+            return f'{self.created_label}: {result.created} за {result.duration:.1f} с'
+        return ''
+
+    def form_valid(self, form):
+        upload = form.cleaned_data['file']
+        try:
+            result = self.run_import(upload, form.cleaned_data['partial'])
+        except ValidationError as error:
+            form.add_error('file', error)
+            return self.form_invalid(form)
+        except (ValueError, csv.Error, zipfile.BadZipFile):
+            # UnicodeDecodeError тоже ValueError
+            form.add_error('file', 'Не удалось прочитать файл: нужен CSV в UTF-8 или XLSX')
+            return self.form_invalid(form)
+
+        message = self.get_success_message(result)
+        if message:
+            messages.success(self.request, message)
+        return self.render_to_response(self.get_context_data(form=form, result=result))
+
+
+class SearchView(LoginRequiredMixin, View):
+    """
+    Общий поиск по товарам, поставщикам и категориям.
+
+    GET ?q=цем&limit=20&kind=product — JSON с результатами по убыванию
+    релевантности (bm25) и ссылками на страницы объектов.
+    """
+    max_limit = 50
+
+    @staticmethod
+    def url_for(kind, object_id, name):
+        if kind == 'product':
+            return reverse('products:product-detail', kwargs={'pk': object_id})
+        if kind == 'supplier':
+            return f"{reverse('supplies:supplies-list')}?{urlencode({'search': name})}"
+        return f"{reverse('categories:category-list')}?{urlencode({'search_name': name})}"
+
+    def get(self, request):
+        query = request.GET.get('q', '').strip()
+        try:
+            limit = min(max(int(request.GET.get('limit', 20)), 1), self.max_limit)
+        except ValueError:
+            limit = 20
+        kinds = [kind for kind in request.GET.getlist('kind') if kind in search.KINDS] or None
+
+        started = time.perf_counter()
+        hits = search.search(query, limit=limit, kinds=kinds)
+        return JsonResponse({
+            'query': query,
+            'took_ms': round((time.perf_counter() - started) * 1000, 2),
+            'results': [
+                {'kind': kind, 'id': object_id, 'name': name, 'url': self.url_for(kind, object_id, name)}
+                for kind, object_id, name in hits
+            ],
+        })
+
+
+def job_payload(job):
+    payload = {
+        'id': job.pk,
+        'kind': job.kind,
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'progress': job.progress,
+        'message': job.message,
+        'attempts': job.attempts,
+        'status_url': reverse('core:job-status', kwargs={'pk': job.pk}),
+        'download_url': None,
+    }
+    if job.status == Job.DONE and job.result:
+        payload['download_url'] = reverse('core:job-download', kwargs={'pk': job.pk})
+    return payload
+
+
+class JobStartView(LoginRequiredMixin, View):
+    """
+    POST jobs/start/<kind>/ — ставит задачу в очередь и сразу отвечает 202.
+
+    Поля формы становятся параметрами задачи; для выгрузки это name, fmt
+    и query (GET-параметры списка). Ход выполнения — в status_url.
+    """
+
+    def post(self, request, kind):
+        handler = jobs.get_handler(kind)
+        if handler is None:
+            raise Http404('Неизвестный тип задачи')
+        if handler.staff_only and not request.user.is_staff:
+            return JsonResponse({'errors': ['Недостаточно прав']}, status=403)
+
+        params = request.POST.dict()
+        params.pop('csrfmiddlewaretoken', None)
+        try:
+            job = jobs.enqueue(kind, params, user=request.user)
+        except ValidationError as error:
+            return JsonResponse({'errors': error.messages}, status=400)
+        return JsonResponse(job_payload(job), status=202)
+
+
+class JobAccessMixin(LoginRequiredMixin):
+    def get_job(self, pk):
+        jobs_visible = Job.objects.all()
+        if not self.request.user.is_staff:
+            jobs_visible = jobs_visible.filter(created_by=self.request.user)
+        return get_object_or_404(jobs_visible, pk=pk)
+
+
+class JobStatusView(JobAccessMixin, View):
+    """GET jobs/<pk>/ — статус и прогресс задачи для опроса со страницы."""
+
+    def get(self, request, pk):
+        return JsonResponse(job_payload(self.get_job(pk)))
+
+
+class JobDownloadView(JobAccessMixin, View):
+    def get(self, request, pk):
+        job = self.get_job(pk)
+        if job.status != Job.DONE or not job.result:
+            raise Http404('Результат ещё не готов')
+        return FileResponse(
+            job.result.open('rb'), as_attachment=True, filename=os.path.basename(job.result.name)
+        )
@@ -0,0 +1,244 @@
+import re
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal
+from itertools import chain, islice
+from xml.etree.ElementTree import iterparse
+from xml.sax.saxutils import escape
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Стили ячеек из _STYLES: 0 — обычная, 1 — жирная, 2 — дата и время, 3 — дата
+_BOLD, _DATETIME, _DATE = 1, 2, 3
+
+_EXCEL_EPOCH = datetime(1899, 12, 30)
+_ILLEGAL_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '</Types>'
+)
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{title}" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '<Relationship Id="rId2" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+    'Target="styles.xml"/>'
+    '</Relationships>'
+)
+_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<numFmts count="1"><numFmt numFmtId="164" formatCode="dd.mm.yyyy hh:mm"/></numFmts>'
+    '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+    '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="4">'
+    '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/>'
+    '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="14" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '</cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+
+
+class _ChunkBuffer:
+    """Файловый объект без seek: zipfile пишет в него, а генератор забирает байты."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _text(value):
+    return escape(_ILLEGAL_XML_CHARS.sub('', str(value)))
+
+
+def _cell(value, style=0):
+    style_attr = f' s="{style}"' if style else ''
+    if value is None:
+        return f'<c{style_attr}/>'
+    if isinstance(value, bool):
+        return f'<c t="b"{style_attr}><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float, Decimal)):
+        return f'<c{style_attr}><v>{value}</v></c>'
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.replace(tzinfo=None)
+        serial = (value - _EXCEL_EPOCH).total_seconds() / 86400
+        return f'<c s="{_DATETIME}"><v>{serial}</v></c>'
+    if isinstance(value, date):
+        serial = (value - _EXCEL_EPOCH.date()).days
+        return f'<c s="{_DATE}"><v>{serial}</v></c>'
+    return f'<c t="inlineStr"{style_attr}><is><t xml:space="preserve">{_text(value)}</t></is></c>'
+
+
+def _row(values, style=0):
+    return '<row>' + ''.join(_cell(value, style) for value in values) + '</row>'
+
+
+def _display_length(value):
+    if isinstance(value, datetime):
+        return 16
+    if isinstance(value, date):
+        return 10
+    return len(str(value)) if value is not None else 0
+
+
+def estimate_widths(headers, sample, max_width=50):
+    widths = [len(str(header)) for header in headers]
+    for row in sample:
+        for index, value in enumerate(row):
+            widths[index] = max(widths[index], _display_length(value))
+    return [min(width + 2, max_width) for width in widths]
+
+
+def stream_xlsx(headers, rows, sheet_title='Лист1', sample_size=200, flush_every=500):
+    """
+    Генератор байтов XLSX-файла с одним листом.
+
+    Строки пишутся сразу в deflate-поток внутри zip-архива, поэтому в памяти
+    находится не больше flush_every строк независимо от размера выгрузки.
+    Ширина колонок оценивается по первым sample_size строкам.
+    """
+    rows = iter(rows)
+    sample = list(islice(rows, sample_size))
+    widths = estimate_widths(headers, sample)
+
+    buffer = _ChunkBuffer()
+    with zipfile.ZipFile(buffer, mode='w', compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('[Content_Types].xml', _CONTENT_TYPES)
+        archive.writestr('_rels/.rels', _ROOT_RELS)
+        archive.writestr('xl/workbook.xml', _WORKBOOK.format(title=_text(sheet_title[:31])))
+        archive.writestr('xl/_rels/workbook.xml.rels', _WORKBOOK_RELS)
+        archive.writestr('xl/styles.xml', _STYLES)
+        yield buffer.pop()
+
+        with archive.open('xl/worksheets/sheet1.xml', mode='w') as sheet:
+            cols = ''.join(
+                f'<col min="{index}" max="{index}" width="{width}" customWidth="1"/>'
+                for index, width in enumerate(widths, 1)
+            )
+            sheet.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                f'<cols>{cols}</cols><sheetData>'
+                + _row(headers, style=_BOLD)
+            ).encode())
+
+            pending = []
+            for row in chain(sample, rows):
+                pending.append(_row(row))
+                if len(pending) >= flush_every:
+                    sheet.write(''.join(pending).encode())
+                    pending.clear()
+                    yield buffer.pop()
+
+            pending.append('</sheetData></worksheet>')
+            sheet.write(''.join(pending).encode())
+        yield buffer.pop()
+    yield buffer.pop()
+
+
+_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+_COLUMN = re.compile(r'[A-Z]+')
+
+
+def _column_index(reference):
+    letters = _COLUMN.match(reference).group()
+    index = 0
+    for letter in letters:
+        index = index * 26 + ord(letter) - ord('A') + 1
+    return index - 1
+
+
+def _shared_strings(archive):
+    if 'xl/sharedStrings.xml' not in archive.namelist():
+        return []
+    strings = []
+    with archive.open('xl/sharedStrings.xml') as source:
+        for _, element in iterparse(source):
+            if element.tag == f'{_NS}si':
+                # Строка может состоять из нескольких фрагментов <r><t>
+                strings.append(''.join(text.text or '' for text in element.iter(f'{_NS}t')))
+                element.clear()
+    return strings
+
+
+def read_xlsx(file):
+    """
+    Генератор строк первого листа XLSX-файла: списки строковых значений.
+
+    Лист разбирается потоково (iterparse), в памяти — только общие строки
+    и текущая строка. Числа возвращаются как записаны в файле, пустые
+    ячейки — пустыми строками.
+    """
+    with zipfile.ZipFile(file) as archive:
+        strings = _shared_strings(archive)
+        sheets = sorted(name for name in archive.namelist() if name.startswith('xl/worksheets/sheet'))
+        if not sheets:
+            raise ValueError('В файле нет листов')
+        with archive.open(sheets[0]) as source:
+            for _, element in iterparse(source):
+                if element.tag != f'{_NS}row':
+                    continue
+                values = []
+                for cell in element.iter(f'{_NS}c'):
+                    kind = cell.get('t')
+                    if kind == 'inlineStr':
+                        value = ''.join(text.text or '' for text in cell.iter(f'{_NS}t'))
+                    else:
+                        raw = cell.find(f'{_NS}v')
+                        value = raw.text if raw is not None and raw.text is not None else ''
+                        if kind == 's' and value:
+                            value = strings[int(value)]
+                    reference = cell.get('r')
+                    if reference:
+                        # Пропущенные пустые ячейки в файле не записываются
+                        values.extend([''] * (_column_index(reference) - len(values)))
+                    values.append(value)
+                element.clear()
+                yield values
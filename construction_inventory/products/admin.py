@@ -1,6 +1,7 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from .models import Product
 from warehouse.models import Batch, BatchGroup
+from warehouse.services import consolidate_batches
 from categories.models import Category
 
 @admin.register(Batch)
@@ -71,6 +72,36 @@ class BatchGroupAdmin(admin.ModelAdmin):
     ]
 
 
+@admin.register(Product)
+class ProductAdmin(admin.ModelAdmin):
+    list_display = [
+        'name',
+        'category',
+        'supplier',
+        'on_hand'
+    ]
+
+    # После инвентаризации: отфильтровать по поставщику или категории,
+    # выбрать все товары и объединить их партии
+    list_filter = [
+        'category',
+        'supplier'
+    ]
+
+    search_fields = [
+        'name'
+    ]
+
+    actions = ['consolidate']
+
+    @admin.action(description='Объединить активные партии в последнюю')
+    def consolidate(self, request, queryset):
+        merged, emptied = consolidate_batches(queryset, user=request.user)
+        if merged:
+            self.message_user(request, f'Партии объединены: товаров {merged}, обнулено партий {emptied}')
+        else:
+            self.message_user(request, 'Нет товаров с несколькими активными партиями', messages.INFO)
+
+
 # Остальные модели можно оставить как есть
-admin.site.register(Product)
 admin.site.register(Category)
\ No newline at end of file
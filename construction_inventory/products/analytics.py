@@ -0,0 +1,161 @@
+"""
+Виджеты страницы аналитики.
+
+Каждый виджет — асинхронная функция, которая запускает свои независимые
+запросы одновременно (core.aio.run_queries) и возвращает словарь для JSON.
+Страница AnalyticsView отдаёт только каркас, а виджеты подгружаются
+параллельно из AnalyticsWidget.
+"""
+import calendar
+from datetime import datetime
+
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from core.aio import run_queries
+from sales.models import DailySalesRollup
+from warehouse.services import active_batches
+from .models import Product
+
+WEEKDAYS = ['Пн', 'Вт', 'Ср', 'Чт', 'Пт', 'Сб', 'Вс']
+
+ABOVE_AVERAGE = 'rgba(40, 167, 69, 0.8)'  # Зеленый - выше среднего
+BELOW_AVERAGE = 'rgba(220, 53, 69, 0.8)'  # Красный - ниже среднего
+AVERAGE = 'rgba(108, 117, 125, 0.8)'  # Серый - равно среднему
+
+
+def selected_period(params):
+    """Год и месяц из GET; по умолчанию текущие, неверные значения игнорируются."""
+    now = timezone.now()
+    try:
+        year = int(params.get('year', now.year))
+        month = int(params.get('month', now.month))
+    except ValueError:
+        return now.year, now.month
+    if not (1 <= month <= 12 and 1 <= year <= 9999):
+        return now.year, now.month
+    return year, month
+
+
+def _previous(year, month):
+    return (year, month - 1) if month > 1 else (year - 1, 12)
+
+
+def _revenue_by_day(year, month):
+    return {
+        row.day.day: row.revenue
+        for row in DailySalesRollup.for_month(year, month)
+    }
+
+
+def _month_totals(year, month):
+    return DailySalesRollup.for_month(year, month).aggregate(
+        sales=Sum('sales_count'),
+        revenue=Sum('revenue'),
+    )
+
+
+def _all_months():
+    return DailySalesRollup.objects.filter(sales_count__gt=0).aggregate(
+        total_revenue=Sum('revenue'),
+        month_count=Count(TruncMonth('day'), distinct=True),
+    )
+
+
+def _product_counts():
+    return Product.objects.aggregate(
+        total_products=Count('id'),
+        products_in_stock=Count('id', filter=Q(on_hand__gt=0)),
+        total_quantity=Sum('on_hand'),
+    )
+
+
+def _stock_value():
+    # Стоимость остатков считается в базе по частичному индексу активных партий
+    return active_batches().aggregate(
+        total=Sum(F('quantity') * F('price'))
+    )['total'] or 0
+
+
+async def daily_chart(year, month):
+    """Выручка по дням месяца с цветом точки относительно средней."""
+    [revenue_by_day] = await run_queries(lambda: _revenue_by_day(year, month))
+    days_in_month = calendar.monthrange(year, month)[1]
+    avg_daily_revenue = sum(revenue_by_day.values()) / days_in_month
+
+    labels, values, colors = [], [], []
+    for day in range(1, days_in_month + 1):
+        daily_revenue = revenue_by_day.get(day, 0)
+        if daily_revenue > avg_daily_revenue:
+            color = ABOVE_AVERAGE
+        elif daily_revenue < avg_daily_revenue:
+            color = BELOW_AVERAGE
+        else:
+            color = AVERAGE
+        labels.append(f"{day}\n{WEEKDAYS[datetime(year, month, day).weekday()]}")
+        values.append(float(daily_revenue))
+        colors.append(color)
+
+    return {
+        'labels': labels,
+        'values': values,
+        'colors': colors,
+        'avg_daily_revenue': round(float(avg_daily_revenue), 2),
+    }
+
+
+async def stock_stats(year, month):
+    """Товары, остатки и их стоимость (от периода не зависят)."""
+    counts, total_value = await run_queries(_product_counts, _stock_value)
+    total_quantity = counts['total_quantity'] or 0
+    return {
+        'total_products': counts['total_products'],
+        'products_in_stock': counts['products_in_stock'],
+        'products_out_of_stock': counts['total_products'] - counts['products_in_stock'],
+        'total_quantity': total_quantity,
+        'total_value': round(float(total_value), 2),
+        'average_price': round(float(total_value / total_quantity), 2) if total_quantity else 0,
+    }
+
+
+async def sales_growth(year, month):
+    """Продажи и выручка за месяц, рост числа продаж к предыдущему месяцу."""
+    current, previous = await run_queries(
+        lambda: _month_totals(year, month),
+        lambda: _month_totals(*_previous(year, month)),
+    )
+    total_sales = current['sales'] or 0
+    prev_sales = previous['sales'] or 0
+    growth_percentage = (total_sales - prev_sales) / prev_sales * 100 if prev_sales else 0
+    return {
+        'total_sales': total_sales,
+        'total_revenue': round(float(current['revenue'] or 0), 2),
+        'growth_percentage': round(growth_percentage, 1),
+    }
+
+
+async def average_profit(year, month):
+    """Средняя выручка в день и отклонение месяца от средней месячной выручки."""
+    current, overall = await run_queries(lambda: _month_totals(year, month), _all_months)
+    days_in_month = calendar.monthrange(year, month)[1]
+    month_revenue = current['revenue'] or 0
+    month_count = overall['month_count'] or 0
+    avg_previous_revenue = (overall['total_revenue'] or 0) / month_count if month_count else 0
+
+    if avg_previous_revenue > 0:
+        profit_percentage = (month_revenue - avg_previous_revenue) / avg_previous_revenue * 100
+    else:
+        profit_percentage = 0 if month_revenue == 0 else 100
+    return {
+        'avg_profit': round(float(month_revenue / days_in_month), 2),
+        'profit_percentage': round(float(profit_percentage), 1),
+    }
+
+
+WIDGETS = {
+    'daily-chart': daily_chart,
+    'stock': stock_stats,
+    'growth': sales_growth,
+    'profit': average_profit,
+}
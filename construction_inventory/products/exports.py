@@ -0,0 +1,10 @@
+from core import exports
+from .views import ProductList
+
+exports.register('products', ProductList, title='Товары', columns=[
+    exports.Column('id', 'ID товара'),
+    exports.Column('name', 'Название товара'),
+    exports.Column('category', 'Категория', 'category__name'),
+    exports.Column('supplier', 'Поставщик', 'supplier__name'),
+    exports.Column('total_quantity', 'Остаток', 'on_hand'),
+])
@@ -6,3 +6,19 @@ class ProductForm(forms.ModelForm):
         model = Product
         fields = '__all__'
 
+
+
+class CatalogImportForm(forms.Form):
+    file = forms.FileField(
+        label='Файл каталога',
+        help_text='CSV или XLSX с колонками "Название товара", "Категория", "Поставщик"',
+        widget=forms.ClearableFileInput(attrs={
+            'class': 'form-control',
+            'accept': '.csv,.xlsx',
+        }),
+    )
+    partial = forms.BooleanField(
+        required=False,
+        label='Загрузить корректные строки, даже если в файле есть ошибки',
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'}),
+    )
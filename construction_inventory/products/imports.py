@@ -0,0 +1,200 @@
+"""
+Импорт каталога товаров из CSV или XLSX: одна строка файла — один товар.
+
+Колонки узнаются по заголовку (те же, что в выгрузке товаров):
+"Название товара", "Категория", "Поставщик". Товар ищется по названию
+без учёта регистра и лишних пробелов: найденный обновляется, новый
+создаётся. Пустая ячейка категории или поставщика оставляет текущее
+значение. Недостающие категории создаются заранее одним bulk_create,
+а поставщик должен уже быть в справочнике: без контактов его нельзя
+сохранить. Если названию подходят несколько записей, отличающихся только
+регистром или пробелами, строка попадает в отчёт с ошибкой.
+
+Товары, категории и поставщики загружаются в словари тремя запросами,
+после проверки всех строк неизменённые товары пропускаются, а остальные
+пишутся bulk_create(update_conflicts=True) по уникальному name порциями
+по chunk_size, каждая порция — в своей транзакции.
+"""
+import time
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from categories.models import Category
+from core import references
+from core.imports import CHUNK_SIZE, ImportResult, cell, header_map, normalize, read_rows
+from supplies.models import Supplier
+from .models import Product
+
+COLUMNS = {
+    'name': ('название товара', 'товар', 'product', 'name'),
+    'category': ('категория', 'category'),
+    'supplier': ('поставщик', 'supplier'),
+}
+
+_max_length = {
+    'name': Product._meta.get_field('name').max_length,
+    'category': Category._meta.get_field('name').max_length,
+    'supplier': Supplier._meta.get_field('name').max_length,
+}
+
+
+# Значение в словаре для названий, которые совпали после normalize
+AMBIGUOUS = object()
+
+
+def _index(pairs):
+    """Словарь normalize(название) → значение для пар (название, значение)."""
+    index = {}
+    for name, value in pairs:
+        key = normalize(name)
+        index[key] = AMBIGUOUS if key in index else value
+    return index
+
+
+def _header_map(header):
+    positions = header_map(header, COLUMNS)
+    if 'name' not in positions:
+        raise ValidationError('Нет колонки "Название товара"')
+    return positions
+
+
+def _parse_row(row, positions):
+    """(название, категория, поставщик) или ValidationError с текстом для отчёта."""
+    values = {key: ' '.join(cell(row, positions, key).split()) for key in COLUMNS}
+    errors = []
+    if not values['name']:
+        errors.append('Не указано название товара')
+    for key, title in (('name', 'Название'), ('category', 'Категория'), ('supplier', 'Поставщик')):
+        if len(values[key]) > _max_length[key]:
+            errors.append(f'{title} длиннее {_max_length[key]} символов')
+    if errors:
+        raise ValidationError(errors)
+    return values['name'], values['category'], values['supplier']
+
+
+def _ambiguous(title, name):
+    return f'{title} "{name}": в базе несколько записей, отличающихся только регистром или пробелами'
+
+
+def _reference_errors(category, supplier, categories, suppliers):
+    errors = []
+    if category and categories.get(normalize(category)) is AMBIGUOUS:
+        errors.append(_ambiguous('Категория', category))
+    if supplier:
+        supplier_id = suppliers.get(normalize(supplier))
+        if supplier_id is None:
+            errors.append(f'Поставщик "{supplier}" не найден: сначала добавьте его в справочник')
+        elif supplier_id is AMBIGUOUS:
+            errors.append(_ambiguous('Поставщик', supplier))
+    return errors
+
+
+def _create_categories(names, known):
+    """Создаёт категории, которых нет в known, и дополняет known их id."""
+    missing = [name for key, name in names.items() if key not in known]
+    if not missing:
+        return
+    with transaction.atomic():
+        created = Category.objects.bulk_create([Category(name=name) for name in missing], batch_size=CHUNK_SIZE)
+        # bulk_create не шлёт post_save: кэш справочников сбрасываем сами
+        references.bump(Category)
+    for obj in created:
+        known[normalize(obj.name)] = obj.pk
+
+
+def _write_chunk(products):
+    with transaction.atomic():
+        Product.objects.bulk_create(
+            products,
+            update_conflicts=True,
+            unique_fields=['name'],
+            update_fields=['category', 'supplier'],
+        )
+
+
+def import_catalog(file, name='', partial=False, chunk_size=CHUNK_SIZE):
+    """
+    Загружает каталог и возвращает ImportResult: created — новые товары,
+    updated — товары со сменившейся категорией или поставщиком.
+
+    Если есть ошибки, по умолчанию не меняется ничего; с partial=True
+    загружаются только корректные строки. Ошибки заголовка файла
+    поднимаются как ValidationError.
+    """
+    started = time.perf_counter()
+    result = ImportResult()
+    rows = iter(read_rows(file, name))
+    header = next(rows, None)
+    if header is None:
+        raise ValidationError('Файл пуст')
+    positions = _header_map(header)
+
+    existing = _index(
+        (product_name, (product_name, category_id, supplier_id))
+        for product_name, category_id, supplier_id
+        in Product.objects.values_list('name', 'category_id', 'supplier_id')
+    )
+    categories = _index((value, pk) for pk, value in Category.objects.order_by().values_list('id', 'name'))
+    suppliers = _index((value, pk) for pk, value in Supplier.objects.values_list('id', 'name'))
+
+    valid = []
+    seen = {}
+    new_categories = {}
+    # Строка 1 — заголовок, номера в отчёте совпадают с номерами в файле
+    for line, row in enumerate(rows, 2):
+        if not any(str(value).strip() for value in row):
+            continue
+        result.rows += 1
+        try:
+            product_name, category, supplier = _parse_row(row, positions)
+        except ValidationError as error:
+            result.add_error(line, '; '.join(error.messages))
+            continue
+        key = normalize(product_name)
+        if key in seen:
+            result.add_error(line, f'Товар "{product_name}" уже есть в строке {seen[key]}')
+            continue
+        seen[key] = line
+        errors = _reference_errors(category, supplier, categories, suppliers)
+        if existing.get(key) is AMBIGUOUS:
+            errors.insert(0, _ambiguous('Товар', product_name))
+        if errors:
+            result.add_error(line, '; '.join(errors))
+            continue
+        if category:
+            new_categories.setdefault(normalize(category), category)
+        valid.append((product_name, category, supplier))
+
+    if not (result.ok or partial):
+        result.duration = time.perf_counter() - started
+        return result
+
+    _create_categories(new_categories, categories)
+
+    changed = []
+    for product_name, category, supplier in valid:
+        key = normalize(product_name)
+        current = existing.get(key)
+        category_id = categories[normalize(category)] if category else None
+        supplier_id = suppliers[normalize(supplier)] if supplier else None
+        if current is None:
+            result.created += 1
+        else:
+            # Конфликт по name срабатывает только на точное совпадение,
+            # поэтому пишем название так, как оно уже хранится
+            product_name, current_category, current_supplier = current
+            category_id = category_id or current_category
+            supplier_id = supplier_id or current_supplier
+            if (category_id, supplier_id) == (current_category, current_supplier):
+                continue
+            result.updated += 1
+        changed.append(Product(name=product_name, category_id=category_id, supplier_id=supplier_id))
+
+    changed = iter(changed)
+    while chunk := list(islice(changed, chunk_size)):
+        _write_chunk(chunk)
+
+    result.duration = time.perf_counter() - started
+    return result
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.24 on 2026-10-18 14:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="on_hand",
+            field=models.IntegerField(
+                default=0,
+                editable=False,
+                help_text="Сумма количества по всем партиям, обновляется вместе с партиями",
+                verbose_name="Остаток на складе",
+            ),
+        ),
+    ]
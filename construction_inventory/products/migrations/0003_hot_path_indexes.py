@@ -0,0 +1,21 @@
+# Generated by Django 4.2.24 on 2026-10-18 14:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0002_stock_on_hand"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                condition=models.Q(("on_hand__gt", 0)),
+                fields=["name"],
+                name="product_in_stock_idx",
+            ),
+        ),
+    ]
@@ -20,19 +20,29 @@ class Product(models.Model):
         blank=True,
         related_name="products",
         verbose_name="Поставщик"
-    )    
+    )
+    on_hand = models.IntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Остаток на складе",
+        help_text="Сумма количества по всем партиям, обновляется вместе с партиями"
+    )
 
 
     class Meta:
         db_table = "Товары"
         verbose_name = "Товар"
         verbose_name_plural = "Товары"
+        indexes = [
+            # Товары в наличии по алфавиту: форма продажи, счётчики на страницах
+            models.Index(fields=['name'], condition=models.Q(on_hand__gt=0), name='product_in_stock_idx'),
+        ]
 
     def __str__(self):
         return str(self.name)
 
     @property
     def total_quantity(self):
-        return self.batches.aggregate(total=models.Sum('quantity'))['total'] or 0
+        return self.on_hand
 
 
@@ -1,3 +1,257 @@
-from django.test import TestCase
+from datetime import date
+from io import BytesIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, TransactionTestCase
+
+from categories.models import Category
+from core.database import READ_ONLY_DATABASE
+from core.search import search_filter
+from core.testing import QueryBudgetMixin, create_store
+from core.xlsx import stream_xlsx
+from products.imports import import_catalog
+from products.models import Product
+from products.views import AnalyticsWidget
+from sales.models import DailySalesRollup
+from supplies.models import Supplier
+from users.models import CustomUser
+
+
+class ProductPageQueryBudgetTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.store = create_store()
+        cls.user = CustomUser.objects.create(username='manager')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_pages_stay_within_query_budget(self):
+        product = self.store['products'][0]
+        self.assertQueryBudget('/crm-system/products/product-list/', 6)
+        self.assertQueryBudget(f'/crm-system/products/product-info/{product.pk}/', 6)
+        self.assertQueryBudget(f'/crm-system/products/product-update/{product.pk}/', 6)
+        # Каркас без агрегатов: данные виджетов приходят отдельными запросами
+        self.assertQueryBudget('/crm-system/products/analytics/', 3)
+        self.assertQueryBudget('/crm-system/products/lookup/', 3, data={'q': 'тов'})
+
+    def test_catalog_import_stays_within_query_budget(self):
+        url = '/crm-system/products/import-catalog/'
+        rows = ''.join(f'{product.name},Новая категория,Поставщик 1\n' for product in self.store['products'])
+        self.assertQueryBudget(url, 2)
+        # Файл в одну порцию: каждая следующая добавляет SAVEPOINT, вставки и RELEASE
+        self.assertQueryBudget(url, 12, method='post', data={
+            'file': SimpleUploadedFile('catalog.csv', f'Товар,Категория,Поставщик\n{rows}Бетон,,\n'.encode()),
+        })
+
+
+class ProductLookupTests(TestCase):
+    url = '/crm-system/products/lookup/'
+
+    def setUp(self):
+        self.client.force_login(CustomUser.objects.create(username='manager'))
+        Product.objects.bulk_create(
+            Product(name=f'Цемент М{number:03}', on_hand=number % 2) for number in range(30)
+        )
+        Product.objects.create(name='Кирпич', on_hand=5)
+
+    def test_pages_walk_whole_catalog_by_name(self):
+        names = []
+        query = {'limit': 7}
+        while True:
+            data = self.client.get(self.url, query).json()
+            names.extend(row['name'] for row in data['results'])
+            if not data['next']:
+                break
+            query['after'] = data['next']
+
+        self.assertEqual(names, list(Product.objects.order_by('name').values_list('name', flat=True)))
+
+    def test_prefix_search_and_stock_filter(self):
+        data = self.client.get(self.url, {'q': 'цем', 'in_stock': 1, 'limit': 50}).json()
+
+        self.assertEqual(len(data['results']), 15)
+        self.assertIsNone(data['next'])
+        first = data['results'][0]
+        self.assertEqual(first['label'], 'Цемент М001 — 1 шт.')
+        self.assertEqual(first['details'], 'Категория: — | Поставщик: —')
+
+    def test_limit_is_capped_and_bad_cursor_rejected(self):
+        Product.objects.bulk_create(Product(name=f'Щебень {number}') for number in range(30))
+
+        self.assertEqual(len(self.client.get(self.url, {'limit': 1000}).json()['results']), 50)
+        self.assertEqual(self.client.get(self.url, {'after': 'мусор'}).status_code, 400)
+
+    def test_sale_form_does_not_render_product_list(self):
+        response = self.client.get('/crm-system/sales/create-sale/')
+
+        self.assertNotContains(response, 'Цемент')
+        self.assertContains(response, f'data-url="{self.url}?in_stock=1"')
+
+
+class CatalogImportTests(TestCase):
+    def setUp(self):
+        self.tools = Category.objects.create(name='Инструмент')
+        self.cement = Product.objects.create(name='Цемент М500', category=self.tools, on_hand=7)
+        self.supplier = Supplier.objects.create(
+            name='ООО Стройснаб', contact_face='Иванов', telephone='+70000000000', email='info@example.com',
+        )
+
+    def csv(self, text):
+        return BytesIO(text.encode('utf-8-sig'))
+
+    def test_upserts_products_and_creates_missing_categories(self):
+        result = import_catalog(self.csv(
+            'Название товара;Категория;Поставщик\n'
+            'цемент  м500;Сыпучие;ООО Стройснаб\n'
+            'Бетон В25;сыпучие;\n'
+            'Кирпич;;ооо стройснаб\n'
+        ))
+
+        self.assertTrue(result.ok)
+        self.assertEqual((result.rows, result.created, result.updated), (3, 2, 1))
+        self.assertEqual(list(Category.objects.values_list('name', flat=True)), ['Инструмент', 'Сыпучие'])
+        self.assertEqual(Supplier.objects.count(), 1)
+        self.assertEqual(
+            sorted(Product.objects.values_list('name', 'category__name', 'supplier__name')),
+            [('Бетон В25', 'Сыпучие', None), ('Кирпич', None, 'ООО Стройснаб'),
+             ('Цемент М500', 'Сыпучие', 'ООО Стройснаб')],
+        )
+        # Существующий товар обновлён на месте, остаток не тронут
+        self.assertEqual(Product.objects.get(pk=self.cement.pk).on_hand, 7)
+        # Новые товары попадают в поисковый индекс триггером
+        self.assertTrue(Product.objects.filter(search_filter('id', 'product', 'бето')).exists())
+
+    def test_unchanged_rows_and_empty_cells_keep_current_values(self):
+        with self.assertNumQueries(3):
+            result = import_catalog(self.csv('Товар,Категория\nЦемент М500,\nцемент м500 ,\n'))
+
+        self.assertEqual((result.created, result.updated), (0, 0))
+        self.assertEqual([line for line, message in result.errors], [3])
+        self.assertEqual(Product.objects.get(pk=self.cement.pk).category, self.tools)
+
+    def test_errors_are_reported_per_row_and_nothing_is_written(self):
+        result = import_catalog(self.csv(
+            'Название товара,Категория\n'
+            'Бетон,Сыпучие\n'
+            ',Сыпучие\n'
+            f'{"Щ" * 300},\n'
+        ))
+
+        self.assertEqual([line for line, message in result.errors], [3, 4])
+        self.assertFalse(Product.objects.filter(name='Бетон').exists())
+        self.assertFalse(Category.objects.filter(name='Сыпучие').exists())
+
+        partial = import_catalog(self.csv('Название товара,Категория\nБетон,Сыпучие\n,Сыпучие\n'), partial=True)
+        self.assertEqual((partial.created, len(partial.errors)), (1, 1))
+
+    def test_unknown_supplier_is_a_row_error(self):
+        result = import_catalog(self.csv('Товар,Поставщик\nБетон,ООО Новый\nКирпич,ооо  стройснаб\n'), partial=True)
+
+        self.assertEqual(result.errors, [(2, 'Поставщик "ООО Новый" не найден: сначала добавьте его в справочник')])
+        self.assertEqual(result.created, 1)
+        self.assertEqual(Supplier.objects.count(), 1)
+        self.assertEqual(Product.objects.get(name='Кирпич').supplier, self.supplier)
+
+    def test_names_equal_after_normalizing_are_ambiguous(self):
+        Product.objects.create(name='цемент м500')
+        Category.objects.bulk_create([Category(name='Сыпучие'), Category(name='СЫПУЧИЕ')])
+
+        result = import_catalog(self.csv(
+            'Товар,Категория\n'
+            'Цемент  М500,\n'
+            'Бетон,сыпучие\n'
+            'Кирпич,Инструмент\n'
+        ), partial=True)
+
+        self.assertEqual(result.errors, [
+            (2, 'Товар "Цемент М500": в базе несколько записей, отличающихся только регистром или пробелами'),
+            (3, 'Категория "сыпучие": в базе несколько записей, отличающихся только регистром или пробелами'),
+        ])
+        self.assertEqual((result.created, result.updated), (1, 0))
+        self.assertFalse(Product.objects.filter(name='Бетон').exists())
+
+    def test_xlsx_in_chunks_with_fixed_queries_per_chunk(self):
+        rows = [[f'Товар {number:03}', f'Категория {number % 3}', ''] for number in range(60)]
+        data = b''.join(stream_xlsx(['Название товара', 'Категория', 'Поставщик'], rows))
+
+        # 3 словаря, новые категории со сбросом кэша, по SAVEPOINT/INSERT/RELEASE на порцию
+        with self.assertNumQueries(3 + 4 + 3 * 3):
+            result = import_catalog(BytesIO(data), name='catalog.xlsx', chunk_size=20)
+
+        self.assertEqual(result.created, 60)
+        self.assertEqual(Product.objects.filter(category__name='Категория 1').count(), 20)
+
+    def test_upload_page_shows_report(self):
+        self.client.force_login(CustomUser.objects.create(username='manager'))
+
+        response = self.client.post('/crm-system/products/import-catalog/', {
+            'file': SimpleUploadedFile('catalog.csv', 'Товар,Категория\nБетон,Сыпучие\nБетон,\n'.encode()),
+        })
+
+        self.assertContains(response, 'уже есть в строке 2')
+        self.assertContains(response, 'создано товаров: 0, обновлено: 0,')
+        self.assertContains(response, 'Каталог не загружен')
+        response = self.client.post('/crm-system/products/import-catalog/', {
+            'file': SimpleUploadedFile('catalog.csv', 'Категория\nСыпучие\n'.encode()),
+        })
+        self.assertContains(response, 'Нет колонки')
+
+
+class AnalyticsWidgetTests(QueryBudgetMixin, TransactionTestCase):
+    # Запросы виджетов идут в отдельных потоках и соединениях,
+    # поэтому данные должны быть закоммичены
+    databases = {'default', READ_ONLY_DATABASE}
+    url = '/crm-system/products/analytics/widgets/{}/'
+
+    def setUp(self):
+        create_store(products=2, batches_per_product=2, sales_per_batch=0)
+        DailySalesRollup.objects.bulk_create([
+            DailySalesRollup(day=date(2025, 8, 10), revenue=300, quantity=3, sales_count=2),
+            DailySalesRollup(day=date(2025, 9, 1), revenue=600, quantity=6, sales_count=3),
+            DailySalesRollup(day=date(2025, 9, 2), revenue=300, quantity=3, sales_count=1),
+        ])
+        self.client.force_login(CustomUser.objects.create(username='manager'))
+
+    def widget(self, name, **params):
+        response = self.client.get(self.url.format(name), {'year': 2025, 'month': 9, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_widgets_compute_month_figures(self):
+        chart = self.widget('daily-chart')
+        self.assertEqual(len(chart['values']), 30)
+        self.assertEqual(chart['values'][:3], [600.0, 300.0, 0.0])
+        self.assertEqual(chart['avg_daily_revenue'], 30.0)
+
+        self.assertEqual(self.widget('growth'), {
+            'total_sales': 4, 'total_revenue': 900.0, 'growth_percentage': 100.0,
+        })
+        self.assertEqual(self.widget('profit'), {'avg_profit': 30.0, 'profit_percentage': 50.0})
+
+        stock = self.widget('stock')
+        self.assertEqual(stock['total_products'], 2)
+        self.assertEqual(stock['total_quantity'], 200)
+        self.assertEqual(stock['total_value'], 20000.0)
+
+    def test_unknown_widget_and_anonymous_user(self):
+        self.assertEqual(self.client.get(self.url.format('нет')).status_code, 404)
+        self.client.logout()
+        response = self.client.get(self.url.format('stock'))
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('login', response['Location'])
+
+    def test_widgets_fit_query_budget(self):
+        for name in ('daily-chart', 'stock', 'growth', 'profit'):
+            with self.subTest(name):
+                self.assertQueryBudget(self.url.format(name), AnalyticsWidget.query_budget)
+
+    def test_widget_over_budget_is_logged(self):
+        # Сессия и пользователь — два запроса, всё сверх них делает виджет
+        # в потоках run_queries на readonly-соединении
+        with mock.patch.object(AnalyticsWidget, 'query_budget', 2):
+            with self.assertLogs('core.querybudget', level='WARNING') as logs:
+                self.widget('stock')
+
+        self.assertIn('/widgets/stock/', logs.output[0])
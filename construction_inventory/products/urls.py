@@ -6,8 +6,11 @@ app_name = 'products'
 urlpatterns = [
     path('product-list/', views.ProductList.as_view(), name='product-list'),
     path('create-product/', views.CreateProduct.as_view(), name='create-product'),
+    path('import-catalog/', views.ImportCatalog.as_view(), name='import-catalog'),
     path('product-info/<int:pk>/', views.ProductDetail.as_view(), name='product-detail'),
+    path('lookup/', views.ProductLookup.as_view(), name='product-lookup'),
     path('product-update/<int:pk>/', views.UpdateProduct.as_view(), name='update-product'),
     path('analytics/', views.AnalyticsView.as_view(), name='analytics'),
+    path('analytics/widgets/<slug:name>/', views.AnalyticsWidget.as_view(), name='analytics-widget'),
     path('manual-info/', views.Manual.as_view(), name='manual-info'),
 ]
\ No newline at end of file
@@ -1,33 +1,45 @@
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.urls import reverse_lazy
+from django.http import Http404, JsonResponse
+from django.urls import reverse, reverse_lazy
+from django.views import View
 from django.views.generic import CreateView, DetailView, ListView, UpdateView, TemplateView
-import calendar
-from django.db.models import Sum, Count, Avg, F
+from django.db.models import CharField, Value
 from django.utils import timezone
-from datetime import datetime
-from .forms import ProductForm
+from . import analytics
+from .forms import CatalogImportForm, ProductForm
+from .imports import import_catalog
 from .models import Product
-from django.db.models.functions import TruncMonth
-from warehouse.models import Batch
-from sales.models import Sale
-
+from django.db.models.functions import Coalesce, Concat
+from warehouse.services import initial_batch_histories
+from core.querybudget import query_budget
+from core.aio import login_required
+from core.database import read_only
+from core.lookups import lookup_response
+from core.search import search_filter
+from core.views import ImportView
+
+@query_budget(6)
 class ProductList(LoginRequiredMixin, ListView):
     model = Product
     template_name = 'products/products.html'
     context_object_name = 'products'
 
     def get_queryset(self):
-        queryset = super().get_queryset().order_by('name')
-        queryset = queryset.prefetch_related('batches')
+        queryset = super().get_queryset().select_related('category').order_by('name')
+
+        search_param = self.request.GET.get('search')
+        if search_param:
+            queryset = queryset.filter(search_filter('id', 'product', search_param))
         return queryset
 
     def get_context_data(self,**kwargs):
         context = super().get_context_data(**kwargs)
         context['total_product'] = Product.objects.count()
-        context['total_in_stock'] = len((list(product for product in context['object_list'] if product.total_quantity > 0)))
+        context['total_in_stock'] = Product.objects.filter(on_hand__gt=0).count()
         context['total_out_stock'] =  context['total_product']-context['total_in_stock']
         return context
 
+@query_budget(6)
 class ProductDetail(LoginRequiredMixin, DetailView):
     model = Product
     template_name = 'products/product_card.html'
@@ -35,25 +47,46 @@ class ProductDetail(LoginRequiredMixin, DetailView):
     pk_url_kwarg = 'pk'
 
     def get_queryset(self):
-        return Product.objects.prefetch_related('batches')
+        return Product.objects.select_related('category', 'supplier')
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        last_batches = context['product'].batches.all()[:1][0]
-        context['price'] = last_batches.price
-        context['arrival_date'] = last_batches.arrival_date
-        batches = context['product'].batches.all()
+        # Партии уже отсортированы по дате поступления (новые первыми):
+        # цена и дата последней поставки берутся из того же списка
+        batches = list(context['product'].batches.all())
+        last_batch = batches[0] if batches else None
+        context['price'] = last_batch.price if last_batch else None
+        context['arrival_date'] = last_batch.arrival_date if last_batch else None
         context['batches'] = batches
 
-        # ервичные состояния историй по всем партиям товара
-        initial_histories = []
-        for batch in batches:
-            initial = batch.history.order_by('history_date').first()
-            if initial:
-                initial_histories.append(initial)
-        context['initial_histories'] = initial_histories
+        # Первичные состояния историй по всем партиям товара одним запросом
+        initial = initial_batch_histories([batch.pk for batch in batches])
+        context['initial_histories'] = [initial[batch.pk] for batch in batches if batch.pk in initial]
         return context
 
+@query_budget(3)
+class ProductLookup(LoginRequiredMixin, View):
+    """
+    Подсказки товаров для форм продажи и поставки.
+
+    GET ?q=цем&in_stock=1&after=<курсор> — товары по алфавиту, подпись и
+    сведения о категории, поставщике и остатке собираются в SQL.
+    """
+
+    def get(self, request):
+        queryset = Product.objects.filter(search_filter('id', 'product', request.GET.get('q')))
+        if request.GET.get('in_stock'):
+            queryset = queryset.filter(on_hand__gt=0)
+        queryset = queryset.annotate(
+            label=Concat('name', Value(' — '), 'on_hand', Value(' шт.'), output_field=CharField()),
+            details=Concat(
+                Value('Категория: '), Coalesce('category__name', Value('—')),
+                Value(' | Поставщик: '), Coalesce('supplier__name', Value('—')),
+                output_field=CharField(),
+            ),
+        )
+        return lookup_response(request, queryset, ('name', 'id'), ['id', 'name', 'label', 'details'])
+
 class CreateProduct(LoginRequiredMixin, CreateView):
     model = Product
     form_class = ProductForm
@@ -75,7 +108,34 @@ class UpdateProduct(LoginRequiredMixin, UpdateView):
     success_url = reverse_lazy('products:product-list')
 
 
+@query_budget(12)
+class ImportCatalog(ImportView):
+    """
+    Загрузка каталога поставщика файлом вместо поштучного CreateProduct.
+    Ответ — та же страница с отчётом: сколько товаров создано и обновлено.
+    """
+    form_class = CatalogImportForm
+    template_name = 'products/import_catalog.html'
+    submit_label = 'Загрузить каталог'
+    created_label = 'Создано товаров'
+    failed_message = 'Каталог не загружен'
+    reports_updates = True
+
+    def run_import(self, upload, partial):
+        return import_catalog(upload.file, name=upload.name, partial=partial)
+
+    def get_success_message(self, result):
+        if result.created or result.updated:
+            return f'Создано товаров: {result.created}, обновлено: {result.updated} за {result.duration:.1f} с'
+        return ''
+
+
+@query_budget(3)
 class AnalyticsView(LoginRequiredMixin, TemplateView):
+    """
+    Каркас страницы аналитики: отдаётся сразу, без агрегатов.
+    Графики и карточки подгружаются из AnalyticsWidget.
+    """
     template_name = 'products/analytics.html'
 
     def get_context_data(self, **kwargs):
@@ -93,37 +153,7 @@ class AnalyticsView(LoginRequiredMixin, TemplateView):
             9: 'Сентябрь', 10: 'Октябрь', 11: 'Ноябрь', 12: 'Декабрь'
         }
 
-        selected_year = int(self.request.GET.get('year', current_year))
-        selected_month = int(self.request.GET.get('month', current_month))
-
-
-        monthly_stats = Sale.objects.annotate(
-            month=TruncMonth('sale_date')
-        ).values('month').annotate(
-            monthly_revenue=Sum(F('quantity') * F('batch__price'))
-        ).aggregate(
-            total_revenue=Sum('monthly_revenue'),
-            month_count=Count('month', distinct=True)
-        )
-
-        total_revenue = monthly_stats['total_revenue'] or 0
-        month_count = monthly_stats['month_count'] or 0
-
-        days_in_month = calendar.monthrange(selected_year,selected_month)[1]
-        total_month_revenue = Sale.total_month_revenue(selected_year, selected_month)
-        avg_profit = round((total_month_revenue/days_in_month),2)
-
-        # Вычисляем среднюю выручку за предыдущие месяцы
-        avg_previous_revenue = total_revenue / month_count if month_count > 0 else 0
-        
-        # Вычисляем процент роста относительно средней выручки
-        if avg_previous_revenue > 0:
-            profit_percentage = ((total_month_revenue - avg_previous_revenue) / avg_previous_revenue) * 100
-        else:
-            profit_percentage = 0 if total_month_revenue == 0 else 100
-
-        chart_data = self.generate_chart_data(selected_year, selected_month)
-        stats_data = self.calculate_stats(selected_year, selected_month)
+        selected_year, selected_month = analytics.selected_period(self.request.GET)
 
         context.update({
             'years': years,
@@ -132,121 +162,37 @@ class AnalyticsView(LoginRequiredMixin, TemplateView):
             'selected_month': selected_month,
             'current_year': current_year,
             'current_month': current_month,
-            'chart_labels': chart_data['labels'],
-            'chart_values': chart_data['values'],
-            'chart_colors': chart_data['colors'],
-            'avg_daily_revenue': chart_data['avg_daily_revenue'],
-            'stats': stats_data,
-            'profit_percentage': round(profit_percentage, 1),
-            'avg_profit': avg_profit,
+            'widgets': {
+                name.replace('-', '_'): reverse('products:analytics-widget', kwargs={'name': name})
+                for name in analytics.WIDGETS
+            },
         })
 
         return context
 
-    def generate_chart_data(self, year, month):
-        
-        # Получаем количество дней в месяце
-        days_in_month = calendar.monthrange(year, month)[1]
-        
-        # Создаем массивы для данных
-        labels = []
-        values = []
-        colors = []
-        
-        # Названия дней недели на русском
-        weekdays = ['Пн', 'Вт', 'Ср', 'Чт', 'Пт', 'Сб', 'Вс']
-        
-        # Получаем среднюю выручку за день
-        days_in_month = calendar.monthrange(year, month)[1]
-        total_month_revenue = Sale.total_month_revenue(year, month)
-        avg_daily_revenue = total_month_revenue / days_in_month if days_in_month > 0 else 0
-        
-        # Получаем реальные данные выручки по дням
-        for day in range(1, days_in_month + 1):
-            # Получаем выручку за день
-            daily_revenue = Sale.objects.filter(
-                sale_date__year=year,
-                sale_date__month=month,
-                sale_date__day=day
-            ).aggregate(
-                revenue=Sum(F('quantity') * F('batch__price'))
-            )['revenue'] or 0
-            
-            # Получаем день недели
-            date_obj = datetime(year, month, day)
-            weekday_name = weekdays[date_obj.weekday()]
-            
-            # Определяем цвет на основе сравнения с средней выручкой
-            if daily_revenue > avg_daily_revenue:
-                color = 'rgba(40, 167, 69, 0.8)'  # Зеленый - выше среднего
-            elif daily_revenue < avg_daily_revenue:
-                color = 'rgba(220, 53, 69, 0.8)'  # Красный - ниже среднего
-            else:
-                color = 'rgba(108, 117, 125, 0.8)'  # Серый - равно среднему
-            
-            labels.append(f"{day}\n{weekday_name}")
-            values.append(float(daily_revenue))
-            colors.append(color)
-
-        return {
-            'labels': labels,
-            'values': values,
-            'colors': colors,
-            'avg_daily_revenue': avg_daily_revenue
-        }
-    def calculate_stats(self, year, month):
-        
-        total_products = Product.objects.count()
-
-        products_in_stock = Product.objects.filter(
-            batches__quantity__gt=0
-        ).distinct().count()
-
-        products_out_of_stock = total_products - products_in_stock
-        
-        total_quantity = Batch.objects.aggregate(
-            total=Sum('quantity')
-        )['total'] or 0
-        
-        total_value = sum(
-            batch.quantity * batch.price for batch in Batch.objects.all()
-        )
-        
-        average_price = total_value / total_quantity if total_quantity > 0 else 0
-        
-        sales_in_period = Sale.objects.filter(
-            sale_date__year=year,
-            sale_date__month=month
-        )
-        
-        total_sales = sales_in_period.count()
-        total_revenue = sales_in_period.aggregate(
-            revenue=Sum(F('quantity') * F('batch__price'))
-        )['revenue'] or 0
-
-        prev_month = month - 1 if month > 1 else 12
-        prev_year = year if month > 1 else year - 1
-        
-        prev_sales = Sale.objects.filter(
-            sale_date__year=prev_year,
-            sale_date__month=prev_month
-        ).count()
-
-        growth_percentage = 0
-        if prev_sales > 0:
-            growth_percentage = ((total_sales - prev_sales) / prev_sales) * 100
-        
-        return {
-            'total_products': total_products,
-            'products_in_stock': products_in_stock,
-            'products_out_of_stock': products_out_of_stock,
-            'total_quantity': total_quantity,
-            'total_value': total_value,
-            'average_price': average_price,
-            'total_sales': total_sales,
-            'total_revenue': round(total_revenue, 2),
-            'growth_percentage': round(growth_percentage, 1),
-        }
+
+@read_only
+@query_budget(4)
+class AnalyticsWidget(View):
+    """
+    GET analytics/widgets/<name>/?year=2025&month=9 — JSON одного виджета.
+
+    Представление асинхронное: запросы виджета идут одновременно в
+    отдельных потоках, а под ASGI не занимают поток сервера на время
+    ожидания базы. В бюджет входят сессия, пользователь и не больше двух
+    запросов самого виджета.
+    """
+
+    async def get(self, request, name):
+        widget = analytics.WIDGETS.get(name)
+        if widget is None:
+            raise Http404('Неизвестный виджет')
+        denied = await login_required(request)
+        if denied is not None:
+            return denied
+
+        year, month = analytics.selected_period(request.GET)
+        return JsonResponse(await widget(year, month))
 
 class Manual(TemplateView):
     template_name = 'products/manual_info.html'
\ No newline at end of file
@@ -0,0 +1,11 @@
+from core import exports
+from .views import SaleList
+
+exports.register('sales', SaleList, title='Продажи', columns=[
+    exports.Column('sale_date', 'Дата продажи'),
+    exports.Column('product', 'Товар', 'batch__product__name'),
+    exports.Column('batch', 'Партия', 'batch_id'),
+    exports.Column('quantity', 'Количество'),
+    exports.Column('price', 'Цена'),
+    exports.Column('total_price', 'Сумма'),
+])
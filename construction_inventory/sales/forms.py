@@ -1,43 +1,48 @@
 from django import forms
-from .models import Sale
-from datetime import datetime
-from warehouse.models import Batch
+from django.utils import timezone
+from products.models import Product
 
-class SaleCreateForm(forms.ModelForm):
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        # Показываем только активные партии и настраиваем подписи
-        self.fields['batch'].queryset = Batch.objects.filter(quantity__gt=0).select_related(
-            'product', 'product__category', 'product__supplier'
-        ).order_by('product__name', '-arrival_date')
-        self.fields['batch'].label_from_instance = (
-            lambda b: f"{b.product.name} — {b.quantity} шт., {b.price} BYN, #{b.id}"
-        )
-    class Meta:
-        model = Sale
-        fields = "__all__"
-        widgets = {
-            'batch': forms.Select(attrs={
-                'class': 'form-control select2-field',
-                'data-placeholder': 'Начните вводить название товара...'
-            }),
-            'quantity': forms.NumberInput(attrs={
-                'class': 'form-control',
-                'min': '1',
-                'value': '1'
-            }),
-            'sale_date': forms.DateTimeInput(attrs={
+
+class SaleCreateForm(forms.Form):
+    """
+    Продажа вводится по товару: партии подбираются автоматически,
+    начиная с самой старой поставки (см. warehouse.services.allocate_fifo).
+    """
+    product = forms.ModelChoiceField(
+        queryset=Product.objects.filter(on_hand__gt=0),
+        label='Выберите товар',
+        # Варианты подгружаются в шаблоне из products:product-lookup,
+        # queryset нужен только для проверки присланного id
+        widget=forms.HiddenInput,
+    )
+    quantity = forms.IntegerField(
+        min_value=1,
+        initial=1,
+        label='Количество',
+        help_text='Введите количество товара для продажи',
+        widget=forms.NumberInput(attrs={
+            'class': 'form-control',
+            'min': '1',
+        }),
+    )
+    sale_date = forms.DateTimeField(
+        initial=timezone.localtime,
+        label='Дата и время продажи',
+        help_text='Выберите дату и время совершения продажи',
+        widget=forms.DateTimeInput(
+            format='%Y-%m-%dT%H:%M',
+            attrs={
                 'class': 'form-control',
                 'type': 'datetime-local',
-                'value': datetime.now().strftime('%Y-%m-%dT%H:%M')
-            })
-        }
-        labels = {
-            'batch': 'Выберите партию товара',
-            'quantity': 'Количество',
-            'sale_date': 'Дата и время продажи'
-        }
-        help_texts = {
-            'quantity': 'Введите количество товара для продажи',
-            'sale_date': 'Выберите дату и время совершения продажи'
-        }
\ No newline at end of file
+            }
+        ),
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        product = cleaned_data.get('product')
+        quantity = cleaned_data.get('quantity')
+        # Предварительная проверка; окончательно остаток проверяется при списании
+        if product and quantity and quantity > product.on_hand:
+            self.add_error('quantity', f"Недостаточно товара. В наличии: {product.on_hand}")
+        return cleaned_data
@@ -0,0 +1,9 @@
+from core import jobs
+from .models import DailySalesRollup
+
+
+@jobs.register('rebuild-sales-rollup', title='Пересчёт выручки по дням', staff_only=True)
+def rebuild_sales_rollup(job, report):
+    report(0, 'Пересчёт выручки по продажам')
+    days = DailySalesRollup.rebuild()
+    report(99, f'Пересчитано дней: {days}')
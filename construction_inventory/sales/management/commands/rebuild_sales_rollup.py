@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from sales.models import DailySalesRollup
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает таблицу дневной выручки по всем продажам'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        days = DailySalesRollup.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Пересчитано дней: {days}'))
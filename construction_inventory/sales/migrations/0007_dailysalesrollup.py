@@ -0,0 +1,81 @@
+# Generated by Django 4.2.24 on 2026-10-18 14:33
+
+from django.db import migrations, models
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+
+
+def fill_rollup(apps, schema_editor):
+    Sale = apps.get_model("sales", "Sale")
+    DailySalesRollup = apps.get_model("sales", "DailySalesRollup")
+    daily = (
+        Sale.objects.annotate(day=TruncDate("sale_date"))
+        .values("day")
+        .annotate(
+            day_revenue=Sum(F("quantity") * F("batch__price")),
+            day_quantity=Sum("quantity"),
+            day_sales=Count("id"),
+        )
+        .order_by("day")
+    )
+    DailySalesRollup.objects.bulk_create(
+        [
+            DailySalesRollup(
+                day=row["day"],
+                revenue=row["day_revenue"] or 0,
+                quantity=row["day_quantity"] or 0,
+                sales_count=row["day_sales"],
+            )
+            for row in daily
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("sales", "0006_alter_sale_table"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DailySalesRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField(unique=True, verbose_name="День")),
+                (
+                    "revenue",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        max_digits=14,
+                        verbose_name="Выручка",
+                    ),
+                ),
+                (
+                    "quantity",
+                    models.IntegerField(default=0, verbose_name="Продано единиц"),
+                ),
+                (
+                    "sales_count",
+                    models.IntegerField(default=0, verbose_name="Количество продаж"),
+                ),
+            ],
+            options={
+                "verbose_name": "Выручка за день",
+                "verbose_name_plural": "Выручка по дням",
+                "db_table": "Выручка по дням",
+                "ordering": ["day"],
+            },
+        ),
+        migrations.RunPython(fill_rollup, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.24 on 2026-10-18 14:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("sales", "0007_dailysalesrollup"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="sale",
+            index=models.Index(fields=["-sale_date", "-id"], name="sale_date_id_idx"),
+        ),
+    ]
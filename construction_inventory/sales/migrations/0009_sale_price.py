@@ -0,0 +1,36 @@
+import django.core.validators
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copy_batch_prices(apps, schema_editor):
+    # Для уже проведённых продаж лучшее, что известно, — текущая цена партии
+    Sale = apps.get_model('sales', 'Sale')
+    Batch = apps.get_model('warehouse', 'Batch')
+    Sale.objects.update(price=Subquery(Batch.objects.filter(pk=OuterRef('batch_id')).values('price')[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("warehouse", "0001_initial"),
+        ("sales", "0008_sale_date_id_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="sale",
+            name="price",
+            field=models.DecimalField(
+                blank=True,
+                decimal_places=2,
+                default=0,
+                help_text="Цена партии на момент продажи; пустая — берётся из партии",
+                max_digits=10,
+                validators=[django.core.validators.MinValueValidator(0)],
+                verbose_name="Цена продажи",
+            ),
+            preserve_default=False,
+        ),
+        migrations.RunPython(copy_batch_prices, migrations.RunPython.noop),
+    ]
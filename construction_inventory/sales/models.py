@@ -1,7 +1,19 @@
-from django.core.exceptions import ValidationError
-from django.db import models
-from warehouse.models import Batch
-from django.db.models import Sum, F, Avg
+import calendar
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+from django.core.validators import MinValueValidator
+from django.db import IntegrityError, models, transaction
+from django.utils import timezone
+from warehouse.models import Batch, InsufficientStock
+from django.db.models import Sum, F, Avg, Count
+from django.db.models.functions import TruncDate
+
+
+def local_day(value):
+    if timezone.is_aware(value):
+        value = timezone.localtime(value)
+    return value.date()
 
 class Sale(models.Model):
 
@@ -12,6 +24,14 @@ class Sale(models.Model):
         verbose_name="Партия товара"
     )
     quantity = models.PositiveIntegerField(default=1)
+    price = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        blank=True,
+        validators=[MinValueValidator(0)],
+        verbose_name="Цена продажи",
+        help_text="Цена партии на момент продажи; пустая — берётся из партии"
+    )
     sale_date = models.DateTimeField()
 
     class Meta:
@@ -23,55 +43,168 @@ class Sale(models.Model):
             ('can_delete_sales', 'Может удалять продажи'),
             ('can_edit_sales', 'Может редактировать продажи'),
         ]
+        indexes = [
+            # Постраничный вывод истории продаж по курсору (sale_date, id)
+            models.Index(fields=['-sale_date', '-id'], name='sale_date_id_idx'),
+        ]
 
     def formatted_date(self):
         return self.sale_date.strftime("%d.%m.%Y %H:%M")
 
     def clean(self):
+        # Предварительная проверка для формы; окончательно остаток
+        # проверяет условное списание в Batch.take
         if self.quantity > self.batch.quantity:
-            raise ValidationError(
-                f"Недостаточно товара. В наличии: {self.batch.quantity}"
-            )
+            raise InsufficientStock(self.batch, self.quantity, self.batch.quantity)
 
     def save(self, *args, **kwargs):
+        # Цена фиксируется при продаже: выручка не меняется, если потом
+        # поменять цену партии (BatchUpdateInfo, админка)
+        if self.price is None:
+            self.price = self.batch.price
         self.full_clean()
 
-        if self._state.adding:
-            self.batch.quantity -= self.quantity
-            self.batch.save()
+        with transaction.atomic():
+            if self._state.adding:
+                self.batch.take(self.quantity)
+            else:
+                previous = Sale.objects.select_related('batch').get(pk=self.pk)
+                DailySalesRollup.apply_sales([previous], sign=-1)
+            DailySalesRollup.apply_sales([self])
 
-        super().save(*args, **kwargs)
+            super().save(*args, **kwargs)
+
+    @property
+    def revenue(self):
+        return self.quantity * self.price
 
     @classmethod
     def total_revenue(cls):
         queryset = cls.objects.aggregate(
-            total_revenue=Sum(F('quantity') * F('batch__price'))
+            total_revenue=Sum(F('quantity') * F('price'))
         )
         return queryset.get('total_revenue', 0) or 0
 
     @classmethod
     def avg_revenue(cls):
         queryset = cls.objects.aggregate(
-            avg_revenue= Avg(F('quantity') * F('batch__price'))
+            avg_revenue= Avg(F('quantity') * F('price'))
         )
         return queryset.get('avg_revenue',0) or 0
 
     @classmethod
-    def total_month_revenue(cls, year=None, month=None):
+    def summary(cls, queryset=None):
+        """
+        Выручка, число продаж, средний чек и проданные единицы по queryset
+        (по умолчанию — по всем продажам) одним агрегирующим запросом.
+        """
+        if queryset is None:
+            queryset = cls.objects.all()
+        result = queryset.order_by().select_related(None).aggregate(
+            revenue=Sum(F('quantity') * F('price')),
+            sales_count=Count('id'),
+            units=Sum('quantity'),
+        )
+        revenue = result['revenue'] or Decimal('0')
+        count = result['sales_count']
+        return {
+            'revenue': revenue,
+            'sales_count': count,
+            'avg_revenue': (revenue / count).quantize(Decimal('0.01')) if count else Decimal('0'),
+            'units': result['units'] or 0,
+        }
 
-        queryset = cls.objects.all()
+    def __str__(self):
+        return str(self.batch)
 
-        if year:
-            queryset = queryset.filter(sale_date__year=year)
-        if month:
-            queryset = queryset.filter(sale_date__month=month)
 
-        result = queryset.aggregate(
-            total_revenue=Sum(F('quantity') * F('batch__price'))
-        )
-        return result['total_revenue'] or 0
+class DailySalesRollup(models.Model):
+    """
+    Выручка и количество проданного товара за день.
+
+    Строки обновляются в той же транзакции, что и Sale.save / удаление продажи,
+    поэтому аналитика читает не больше 31 строки на месяц вместо агрегации
+    по всей таблице продаж. Пересчитать с нуля: manage.py rebuild_sales_rollup
+    """
+    day = models.DateField(unique=True, verbose_name="День")
+    revenue = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0,
+        verbose_name="Выручка"
+    )
+    quantity = models.IntegerField(default=0, verbose_name="Продано единиц")
+    sales_count = models.IntegerField(default=0, verbose_name="Количество продаж")
+
+    class Meta:
+        db_table = "Выручка по дням"
+        verbose_name = "Выручка за день"
+        verbose_name_plural = "Выручка по дням"
+        ordering = ['day']
 
     def __str__(self):
-        return str(self.batch)
+        return f"{self.day:%d.%m.%Y}: {self.revenue}"
+
+    @classmethod
+    def apply_sales(cls, sales, sign=1):
+        deltas = defaultdict(lambda: [Decimal('0'), 0, 0])
+        for sale in sales:
+            delta = deltas[local_day(sale.sale_date)]
+            delta[0] += sign * sale.revenue
+            delta[1] += sign * sale.quantity
+            delta[2] += sign
+        cls.apply(deltas)
+
+    @classmethod
+    def apply(cls, deltas):
+        """deltas: {день: (выручка, единицы, продажи)}"""
+        for day, (revenue, quantity, sales_count) in deltas.items():
+            changes = {
+                'revenue': F('revenue') + revenue,
+                'quantity': F('quantity') + quantity,
+                'sales_count': F('sales_count') + sales_count,
+            }
+            if cls.objects.filter(day=day).update(**changes):
+                continue
+            try:
+                with transaction.atomic():
+                    cls.objects.create(
+                        day=day,
+                        revenue=revenue,
+                        quantity=quantity,
+                        sales_count=sales_count,
+                    )
+            except IntegrityError:
+                # строку за этот день успел создать параллельный запрос
+                cls.objects.filter(day=day).update(**changes)
 
+    @classmethod
+    def for_month(cls, year, month):
+        days_in_month = calendar.monthrange(year, month)[1]
+        return cls.objects.filter(
+            day__range=(date(year, month, 1), date(year, month, days_in_month))
+        )
 
+    @classmethod
+    def rebuild(cls, batch_size=1000):
+        daily = Sale.objects.annotate(day=TruncDate('sale_date')).values('day').annotate(
+            day_revenue=Sum(F('quantity') * F('price')),
+            day_quantity=Sum('quantity'),
+            day_sales=Count('id'),
+        ).order_by('day')
+
+        with transaction.atomic():
+            cls.objects.all().delete()
+            cls.objects.bulk_create(
+                (
+                    cls(
+                        day=row['day'],
+                        revenue=row['day_revenue'] or 0,
+                        quantity=row['day_quantity'] or 0,
+                        sales_count=row['day_sales'],
+                    )
+                    for row in daily.iterator(chunk_size=batch_size)
+                ),
+                batch_size=batch_size,
+            )
+        return cls.objects.count()
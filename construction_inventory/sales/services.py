@@ -0,0 +1,134 @@
+from collections import defaultdict
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from products.models import Product
+from warehouse.models import Batch
+from warehouse.services import allocate_fifo, take_from_batches
+from .models import DailySalesRollup, Sale
+
+# Больше не помещается в INTEGER SQLite: запрос упал бы с OverflowError
+MAX_INTEGER = 2 ** 63 - 1
+
+
+def _positive_int(value):
+    """
+    Номер или количество из JSON: целое число (не bool) или строка из цифр
+    от 1 до MAX_INTEGER, иначе ValueError. Дробные числа не округляются.
+    """
+    if isinstance(value, str):
+        if not (value.isascii() and value.isdigit()):
+            raise ValueError(value)
+    elif isinstance(value, bool) or not isinstance(value, int):
+        raise ValueError(value)
+    number = int(value)
+    if not 1 <= number <= MAX_INTEGER:
+        raise ValueError(value)
+    return number
+
+
+def _clean_lines(lines):
+    errors = []
+    cleaned = []
+    for number, line in enumerate(lines, 1):
+        if not isinstance(line, dict):
+            errors.append(f'Позиция {number}: ожидается объект с партией или товаром и количеством')
+            continue
+        batch_id = line.get('batch')
+        product_id = line.get('product')
+        if bool(batch_id) == bool(product_id):
+            errors.append(f'Позиция {number}: укажите партию или товар')
+            continue
+        kind = 'партии' if batch_id else 'товара'
+        try:
+            object_id = _positive_int(batch_id or product_id)
+        except ValueError:
+            errors.append(f'Позиция {number}: некорректный номер {kind}: {batch_id or product_id!r}')
+            continue
+        try:
+            quantity = _positive_int(line.get('quantity'))
+        except ValueError:
+            errors.append(
+                f'Позиция {number}: количество должно быть целым числом больше нуля: {line.get("quantity")!r}'
+            )
+            continue
+        if batch_id:
+            cleaned.append((object_id, None, quantity))
+        else:
+            cleaned.append((None, object_id, quantity))
+    if not cleaned and not errors:
+        errors.append('Чек пуст')
+    if errors:
+        raise ValidationError(errors)
+    return cleaned
+
+
+def post_receipt(lines, sale_date=None):
+    """
+    Проводит чек из нескольких позиций одной транзакцией.
+
+    lines — список словарей {'batch': id, 'quantity': n} или
+    {'product': id, 'quantity': n}. Позиции по товару раскладываются по
+    партиям FIFO (allocate_fifo), все партии списываются одним UPDATE,
+    продажи создаются через bulk_create. Если хоть одной позиции не
+    хватает, не проводится ничего.
+    """
+    if not isinstance(lines, list):
+        raise ValidationError('Ожидается список позиций')
+    lines = _clean_lines(lines)
+    sale_date = sale_date or timezone.now()
+
+    requested = defaultdict(int)
+    demand = defaultdict(int)
+    for batch_id, product_id, quantity in lines:
+        if batch_id:
+            requested[batch_id] += quantity
+        else:
+            demand[product_id] += quantity
+
+    with transaction.atomic():
+        errors = []
+        available = dict(
+            Batch.objects.select_for_update().filter(pk__in=requested).values_list('id', 'quantity')
+        )
+        for batch_id, quantity in requested.items():
+            if batch_id not in available:
+                errors.append(ValidationError(f'Партия #{batch_id} не найдена'))
+            elif quantity > available[batch_id]:
+                errors.append(ValidationError(
+                    f'Партия #{batch_id}: недостаточно товара. В наличии: {available[batch_id]}',
+                    code='insufficient_stock',
+                ))
+
+        # Несуществующий товар — ошибка запроса, а не нехватка остатка
+        known = set(Product.objects.filter(pk__in=demand).values_list('pk', flat=True)) if demand else set()
+        for product_id in [product_id for product_id in demand if product_id not in known]:
+            errors.append(ValidationError(f'Товар #{product_id} не найден', code='not_found'))
+            del demand[product_id]
+
+        allocated = {}
+        try:
+            allocated = allocate_fifo(demand)
+        except ValidationError as error:
+            errors.extend(error.error_list)
+        if errors:
+            raise ValidationError(errors)
+
+        taken = defaultdict(int, requested)
+        for batch_id, quantity in allocated.items():
+            taken[batch_id] += quantity
+        batches = take_from_batches(taken)
+
+        sales = Sale.objects.bulk_create([
+            Sale(batch=batches[batch_id], quantity=quantity, price=batches[batch_id].price, sale_date=sale_date)
+            for batch_id, quantity in taken.items()
+        ])
+        DailySalesRollup.apply_sales(sales)
+    return sales
+
+
+def sell_product(product, quantity, sale_date=None):
+    """Продажа товара без выбора партии: списание с самых старых поставок."""
+    return post_receipt([{'product': product.pk, 'quantity': quantity}], sale_date)
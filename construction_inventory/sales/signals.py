@@ -0,0 +1,10 @@
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from .models import DailySalesRollup, Sale
+
+
+@receiver(post_delete, sender=Sale)
+def remove_sale_from_rollup(sender, instance, **kwargs):
+    # post_delete выполняется внутри транзакции удаления (в том числе
+    # массового из админки), поэтому дневная выручка не расходится с продажами
+    DailySalesRollup.apply_sales([instance], sign=-1)
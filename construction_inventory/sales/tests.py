@@ -1,3 +1,450 @@
-from django.test import TestCase
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import OperationalError, close_old_connections, connection
+from django.db.models import Sum
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core.testing import QueryBudgetMixin, create_store
+from products.models import Product
+from users.models import CustomUser
+from warehouse.models import Batch, BatchGroup, InsufficientStock
+from warehouse.services import allocate_fifo
+from .models import DailySalesRollup, Sale
+
+
+def make_batch(quantity, price=10, name='Цемент М500'):
+    product, _ = Product.objects.get_or_create(name=name)
+    group = BatchGroup.objects.create(product=product)
+    return Batch.objects.create(product=product, group=group, price=price, quantity=quantity)
+
+
+class SalePostingTests(TestCase):
+    def test_sale_decrements_batch_and_counters(self):
+        batch = make_batch(10)
+
+        Sale.objects.create(batch=batch, quantity=3, sale_date=timezone.now())
+
+        batch.refresh_from_db()
+        self.assertEqual(batch.quantity, 7)
+        self.assertEqual(Product.objects.get(pk=batch.product_id).on_hand, 7)
+        self.assertEqual(BatchGroup.objects.get(pk=batch.group_id).on_hand, 7)
+        self.assertEqual(DailySalesRollup.objects.get().quantity, 3)
+
+    def test_stale_batch_cannot_oversell(self):
+        batch = make_batch(5)
+        stale = Batch.objects.get(pk=batch.pk)
+        Batch.objects.filter(pk=batch.pk).update(quantity=1)
+
+        with self.assertRaises(InsufficientStock) as raised:
+            stale.take(2)
+
+        self.assertEqual(raised.exception.available, 1)
+        self.assertEqual(Batch.objects.get(pk=batch.pk).quantity, 1)
+
+
+class SalesRollupTests(TestCase):
+    def setUp(self):
+        self.batch = make_batch(100, price=10)
+        self.today = timezone.now()
+        self.yesterday = self.today - timezone.timedelta(days=1)
+
+    def rollup(self):
+        return list(DailySalesRollup.objects.order_by('day').values_list('revenue', 'quantity', 'sales_count'))
+
+    def test_revenue_keeps_price_at_sale_after_batch_price_change(self):
+        Sale.objects.create(batch=self.batch, quantity=3, sale_date=self.today)
+        self.client.force_login(CustomUser.objects.create(username='manager'))
+
+        Batch.objects.get(pk=self.batch.pk).modify_quantity(97, new_price=25)
+
+        sale = Sale.objects.get()
+        self.assertEqual(sale.price, 10)
+        self.assertEqual(Sale.summary()['revenue'], 30)
+        self.assertEqual(self.rollup(), [(30, 3, 1)])
+        response = self.client.get('/crm-system/sales/')
+        self.assertEqual(response.context['sales'][0].total_price, 30)
+
+    def test_update_and_delete_adjust_the_rollup(self):
+        sale = Sale.objects.create(batch=self.batch, quantity=3, sale_date=self.today)
+        other = Sale.objects.create(batch=self.batch, quantity=1, sale_date=self.today)
+
+        sale.quantity = 5
+        sale.sale_date = self.yesterday
+        sale.save()
+        self.assertEqual(self.rollup(), [(50, 5, 1), (10, 1, 1)])
+
+        other.delete()
+        self.assertEqual(self.rollup(), [(50, 5, 1), (0, 0, 0)])
+        Sale.objects.all().delete()
+        self.assertEqual(self.rollup(), [(0, 0, 0), (0, 0, 0)])
+
+    def test_rebuild_matches_incremental_rollup(self):
+        Sale.objects.create(batch=self.batch, quantity=2, sale_date=self.yesterday)
+        Sale.objects.create(batch=self.batch, quantity=4, sale_date=self.today)
+        Batch.objects.filter(pk=self.batch.pk).update(price=99)
+        incremental = self.rollup()
+        DailySalesRollup.objects.update(revenue=0, quantity=0, sales_count=0)
+
+        out = StringIO()
+        call_command('rebuild_sales_rollup', '--batch-size', 1, stdout=out)
+
+        self.assertIn('Пересчитано дней: 2', out.getvalue())
+        self.assertEqual(self.rollup(), incremental)
+        self.assertEqual(incremental, [(20, 2, 1), (40, 4, 1)])
+
+
+class ConcurrentSaleTests(TransactionTestCase):
+    stock = 60
+    workers = 8
+    attempts_per_worker = 12
+
+    def _sell_one(self, batch_id, results, lock):
+        try:
+            for _ in range(self.attempts_per_worker):
+                while True:
+                    try:
+                        batch = Batch.objects.get(pk=batch_id)
+                        Sale.objects.create(batch=batch, quantity=1, sale_date=timezone.now())
+                        outcome = 'sold'
+                    except ValidationError:
+                        # InsufficientStock из Batch.take или из Sale.clean
+                        outcome = 'rejected'
+                    except OperationalError as error:
+                        # Кассы соревнуются за запись в SQLite: повторяем, как повторил бы клиент
+                        if 'locked' not in str(error):
+                            raise
+                        continue
+                    break
+                with lock:
+                    results[outcome] += 1
+        finally:
+            connection.close()
+
+    def test_no_lost_updates_under_contention(self):
+        batch = make_batch(self.stock)
+        results = {'sold': 0, 'rejected': 0}
+        lock = threading.Lock()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = [
+                pool.submit(self._sell_one, batch.pk, results, lock)
+                for _ in range(self.workers)
+            ]
+            for future in futures:
+                future.result()
+        elapsed = time.perf_counter() - started
+        close_old_connections()
+
+        attempts = self.workers * self.attempts_per_worker
+        batch.refresh_from_db()
+        self.assertEqual(results['sold'] + results['rejected'], attempts)
+        self.assertEqual(results['sold'], self.stock)
+        self.assertEqual(batch.quantity, 0)
+        self.assertEqual(Sale.objects.aggregate(total=Sum('quantity'))['total'], self.stock)
+        self.assertEqual(Product.objects.get(pk=batch.product_id).on_hand, 0)
+        self.assertEqual(DailySalesRollup.objects.aggregate(total=Sum('quantity'))['total'], self.stock)
+        # Грубая нижняя граница, чтобы заметить сериализацию через таймауты блокировок
+        self.assertGreater(attempts / elapsed, 20)
+
+
+class CheckoutTests(TestCase):
+    def setUp(self):
+        self.client.force_login(CustomUser.objects.create(username='cashier'))
+
+    def checkout(self, lines):
+        return self.client.post(
+            '/crm-system/sales/checkout/',
+            data={'lines': lines},
+            content_type='application/json',
+        )
+
+    def test_receipt_posts_all_lines_in_one_transaction(self):
+        first = make_batch(5, name='Кирпич')
+        older = make_batch(2, name='Гвозди')
+        newer = Batch.objects.create(product=older.product, group=older.group, price=12, quantity=4)
+
+        response = self.checkout([
+            {'batch': first.pk, 'quantity': 2},
+            {'product': older.product_id, 'quantity': 3},
+        ])
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Sale.objects.count(), 3)
+        self.assertEqual(
+            list(Batch.objects.filter(pk__in=[first.pk, older.pk, newer.pk]).order_by('pk').values_list('quantity', flat=True)),
+            [3, 0, 3],
+        )
+        self.assertEqual(Product.objects.get(pk=older.product_id).on_hand, 3)
+        self.assertEqual(DailySalesRollup.objects.get().quantity, 5)
+
+    def test_short_line_rejects_whole_receipt(self):
+        first = make_batch(5, name='Кирпич')
+        second = make_batch(1, name='Гвозди')
+
+        response = self.checkout([
+            {'batch': first.pk, 'quantity': 2},
+            {'batch': second.pk, 'quantity': 3},
+        ])
+
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(Sale.objects.exists())
+        self.assertEqual(Batch.objects.get(pk=first.pk).quantity, 5)
+
+    def post_json(self, payload):
+        return self.client.post('/crm-system/sales/checkout/', data=payload, content_type='application/json')
+
+    def test_malformed_payloads_are_rejected_with_400(self):
+        batch = make_batch(5)
+
+        self.assertEqual(self.post_json([{'batch': batch.pk, 'quantity': 1}]).status_code, 400)
+        for sale_date in (123, ['2025-09-20'], '2025-13-40T10:00'):
+            response = self.post_json({'lines': [{'batch': batch.pk, 'quantity': 1}], 'sale_date': sale_date})
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json()['errors'], ['Некорректная дата продажи'])
+        self.assertFalse(Sale.objects.exists())
+
+    def test_bad_lines_are_reported_per_line(self):
+        batch = make_batch(5)
+
+        response = self.checkout([
+            {'batch': batch.pk, 'quantity': 1},
+            'кирпич',
+            {'batch': 'abc', 'quantity': 1},
+            {'product': {'id': 1}, 'quantity': 1},
+            {'product': 2 ** 70, 'quantity': 1},
+        ])
+
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()['errors']
+        self.assertEqual([error.split(':')[0] for error in errors], ['Позиция 2', 'Позиция 3', 'Позиция 4', 'Позиция 5'])
+        self.assertIn("некорректный номер партии: 'abc'", errors[1])
+        self.assertFalse(Sale.objects.exists())
+
+    def test_quantity_must_be_a_whole_number(self):
+        batch = make_batch(5)
+
+        for quantity in (1.9, 1.0, True, '2.5', ' 2', '-1', 0, None, [1]):
+            with self.subTest(quantity=quantity):
+                response = self.checkout([{'batch': batch.pk, 'quantity': quantity}])
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('количество должно быть целым числом', response.json()['errors'][0])
+        response = self.checkout([{'product': batch.product_id, 'quantity': 1.9}])
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Sale.objects.exists())
+
+        self.assertEqual(self.checkout([{'batch': batch.pk, 'quantity': '2'}]).status_code, 201)
+        self.assertEqual(Batch.objects.get(pk=batch.pk).quantity, 3)
+
+    def test_unknown_product_is_not_found_rather_than_short(self):
+        batch = make_batch(5)
+
+        response = self.checkout([
+            {'batch': batch.pk, 'quantity': 1},
+            {'product': 999999, 'quantity': 1},
+        ])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['errors'], ['Товар #999999 не найден'])
+        self.assertEqual(Batch.objects.get(pk=batch.pk).quantity, 5)
+
+
+class FifoSaleTests(TestCase):
+    def setUp(self):
+        self.client.force_login(CustomUser.objects.create(username='cashier'))
+
+    def test_sale_by_product_spans_oldest_batches_first(self):
+        oldest = make_batch(2)
+        middle = Batch.objects.create(product=oldest.product, group=oldest.group, price=11, quantity=3)
+        newest = Batch.objects.create(product=oldest.product, group=oldest.group, price=12, quantity=5)
+
+        response = self.client.post('/crm-system/sales/create-sale/', {
+            'product': oldest.product_id,
+            'quantity': 4,
+            'sale_date': '2025-09-20T14:30',
+        })
+
+        self.assertRedirects(response, '/crm-system/sales/', fetch_redirect_response=False)
+        self.assertEqual(
+            [Batch.objects.get(pk=batch.pk).quantity for batch in (oldest, middle, newest)],
+            [0, 1, 5],
+        )
+        self.assertEqual(
+            sorted(Sale.objects.values_list('batch_id', 'quantity')),
+            [(oldest.pk, 2), (middle.pk, 2)],
+        )
+
+    def test_allocation_is_one_plain_locking_read(self):
+        oldest = make_batch(2)
+        newer = Batch.objects.create(product=oldest.product, group=oldest.group, price=11, quantity=3)
+        newest = Batch.objects.create(product=oldest.product, group=oldest.group, price=12, quantity=5)
+        bricks = make_batch(4, name='Кирпич')
+
+        with CaptureQueriesContext(connection) as captured:
+            taken = allocate_fifo({oldest.product_id: 4, bricks.product_id: 1})
+
+        self.assertEqual(taken, {oldest.pk: 2, newer.pk: 2, bricks.pk: 1})
+        self.assertNotIn(newest.pk, taken)
+        # PostgreSQL отвергает FOR UPDATE вместе с оконными функциями
+        self.assertEqual(len(captured.captured_queries), 1)
+        self.assertNotIn(' OVER ', captured.captured_queries[0]['sql'])
+
+    def test_quantity_above_product_stock_is_rejected(self):
+        batch = make_batch(2)
+
+        response = self.client.post('/crm-system/sales/create-sale/', {
+            'product': batch.product_id,
+            'quantity': 3,
+            'sale_date': '2025-09-20T14:30',
+        })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Sale.objects.exists())
+
+
+class SalePageQueryBudgetTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.store = create_store()
+        cls.user = CustomUser.objects.create(username='manager')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_pages_stay_within_query_budget(self):
+        self.assertQueryBudget('/crm-system/sales/', 7)
+        self.assertQueryBudget('/crm-system/sales/create-sale/', 4)
+
+    def test_checkout_stays_within_query_budget(self):
+        # Бюджет не зависит от числа позиций в чеке
+        lines = [{'batch': batch.pk, 'quantity': 1} for batch in self.store['batches'][:6]]
+        lines += [{'product': product.pk, 'quantity': 2} for product in self.store['products'][2:]]
+        self.assertQueryBudget(
+            '/crm-system/sales/checkout/', 14, method='post', data={'lines': lines},
+            content_type='application/json', status=201,
+        )
+
+
+class SaleListPageTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(CustomUser.objects.create(username='manager'))
+        self.cement = make_batch(1000, price=10)
+        self.bricks = make_batch(1000, price=3, name='Кирпич')
+        moment = timezone.now()
+        Sale.objects.bulk_create(
+            Sale(batch=self.cement, quantity=2, price=self.cement.price, sale_date=moment - timezone.timedelta(minutes=number))
+            for number in range(60)
+        )
+        self.latest = Sale.objects.create(batch=self.bricks, quantity=4, sale_date=moment + timezone.timedelta(minutes=1))
+        # Продажа уже проведена: смена цены партии её не меняет
+        Batch.objects.filter(pk=self.bricks.pk).update(price=99)
+
+    def test_rows_show_the_sale_price_and_total(self):
+        response = self.client.get('/crm-system/sales/')
+
+        self.assertTemplateUsed(response, 'sales/sales.html')
+        self.assertContains(response, '<td>Кирпич</td>', html=True)
+        self.assertContains(response, '<td>3,00 BYN</td>', html=True)
+        self.assertContains(response, '<td><strong>12 BYN</strong></td>', html=True)
+        self.assertNotContains(response, '99,00 BYN')
+        self.assertContains(response, f'<td>{self.latest.formatted_date()}</td>', html=True)
+        # 50 строк на странице и ссылка на следующую
+        self.assertEqual(response.content.decode().count('<td><strong>'), 50)
+        self.assertContains(response, f'after={response.context["page"].next_cursor}')
+        # Итоги по всем продажам, а не по странице
+        self.assertContains(response, '<h2>61 </h2>', html=True)
+        self.assertContains(response, '<h2>1212 BYN </h2>', html=True)
+
+    def test_filtered_and_empty_pages(self):
+        response = self.client.get('/crm-system/sales/', {'search': 'Кирпич'})
+        self.assertEqual(response.content.decode().count('<td><strong>'), 1)
+        self.assertContains(response, 'Продаж по фильтру')
+        self.assertContains(response, 'value="Кирпич"')
+
+        response = self.client.get('/crm-system/sales/', {'start_date': '2000-01-01', 'end_date': '2000-01-02'})
+        self.assertContains(response, 'Продажи не найдены')
+
+    def test_query_budget_does_not_depend_on_page(self):
+        first = self.assertQueryBudget('/crm-system/sales/', 7)
+        self.assertQueryBudget('/crm-system/sales/', 7, data={'after': first.context['page'].next_cursor})
+        self.assertQueryBudget('/crm-system/sales/', 7, data={'search': 'Цемент'})
+
+
+class SaleListPaginationTests(TestCase):
+    def setUp(self):
+        self.client.force_login(CustomUser.objects.create(username='manager'))
+        batch = make_batch(1000)
+        moment = timezone.now()
+        # Продажи с одинаковым временем проверяют разрешение ничьих по id
+        Sale.objects.bulk_create(
+            Sale(batch=batch, quantity=1, price=batch.price, sale_date=moment - timezone.timedelta(minutes=number // 3))
+            for number in range(120)
+        )
+        self.expected = list(Sale.objects.order_by('-sale_date', '-id').values_list('id', flat=True))
+
+    def page_ids(self, response):
+        return [sale.id for sale in response.context['sales']]
+
+    def test_cursor_walks_all_sales_without_gaps(self):
+        seen = []
+        query = {}
+        while True:
+            response = self.client.get('/crm-system/sales/', query)
+            seen.extend(self.page_ids(response))
+            page = response.context['page']
+            if not page.has_next:
+                break
+            query = {'after': page.next_cursor}
+
+        self.assertEqual(seen, self.expected)
+
+    def test_previous_page_returns_same_rows(self):
+        first = self.client.get('/crm-system/sales/')
+        second = self.client.get('/crm-system/sales/', {'after': first.context['page'].next_cursor})
+        back = self.client.get('/crm-system/sales/', {'before': second.context['page'].previous_cursor})
+
+        self.assertEqual(self.page_ids(back), self.page_ids(first))
+        self.assertEqual(self.page_ids(second), self.expected[50:100])
+
+    def test_broken_cursor_falls_back_to_first_page(self):
+        response = self.client.get('/crm-system/sales/', {'after': 'не-курсор'})
+
+        self.assertEqual(self.page_ids(response), self.expected[:50])
+
+
+class SaleSummaryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(CustomUser.objects.create(username='manager'))
+        cement = make_batch(100, price=10)
+        bricks = make_batch(100, price=3, name='Кирпич')
+        Sale.objects.bulk_create([
+            Sale(batch=cement, quantity=2, price=cement.price, sale_date=timezone.now()),
+            Sale(batch=cement, quantity=1, price=cement.price, sale_date=timezone.now()),
+            Sale(batch=bricks, quantity=10, price=bricks.price, sale_date=timezone.now()),
+        ])
+
+    def test_summary_follows_filters(self):
+        response = self.client.get('/crm-system/sales/', {'search': 'Цемент'})
+
+        self.assertEqual(response.context['sales_count'], 2)
+        self.assertEqual(response.context['total_revenue'], 30)
+        self.assertEqual(response.context['avg_revenue'], 15)
+        self.assertEqual(response.context['units_sold'], 3)
+
+        response = self.client.get('/crm-system/sales/')
+        self.assertEqual(response.context['sales_count'], 3)
+        self.assertEqual(response.context['total_revenue'], 60)
+
+    def test_summary_is_one_aggregate(self):
+        with self.assertNumQueries(1):
+            Sale.summary(Sale.objects.filter(batch__product__name__icontains='Кирпич'))
@@ -6,4 +6,5 @@ app_name = 'sales'
 urlpatterns = [
     path('', views.SaleList.as_view(), name='sales-list'),
     path('create-sale/', views.SaleCreate.as_view(), name='create-sale'),
+    path('checkout/', views.SaleCheckout.as_view(), name='checkout'),
 ]
\ No newline at end of file
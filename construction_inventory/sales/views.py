@@ -1,19 +1,39 @@
+import hashlib
+import json
+from urllib.parse import urlencode
+from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.views.generic import ListView, CreateView
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.http import JsonResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.views import View
+from django.contrib import messages
+from django.views.generic import ListView, FormView
 from .models import Sale
 from django.db.models import F, Q
 from .forms import SaleCreateForm
 from django.urls import reverse_lazy
+from .services import post_receipt, sell_product
+from core.pagination import InvalidCursor, KeysetPaginator
+from core.querybudget import query_budget
+from core.search import search_filter
 
+@query_budget(7)
 class SaleList(LoginRequiredMixin, ListView):
     model = Sale
     template_name = 'sales/sales.html'
     context_object_name = 'sales'
+    # Пагинация по курсору (KeysetPaginator), а не paginate_by с OFFSET
+    per_page = 50
+    keyset_ordering = ('-sale_date', '-id')
+    summary_filters = ('start_date', 'end_date', 'search')
 
     def get_queryset(self):
         queryset = super().get_queryset()
         queryset = queryset.select_related('batch__product')
-        queryset = queryset.annotate(total_price = F('quantity')*F('batch__price'))
+        queryset = queryset.annotate(total_price = F('quantity')*F('price'))
 
         start_date = self.request.GET.get('start_date')
         end_date = self.request.GET.get('end_date')
@@ -25,30 +45,123 @@ class SaleList(LoginRequiredMixin, ListView):
         if end_date:
             filters &= Q(sale_date__lte=end_date)
         if search_name:
-            filters &= Q(batch__product__name__icontains=search_name)
+            filters &= search_filter('batch__product_id', 'product', search_name)
         if filters:
             queryset = queryset.filter(filters)
 
-        queryset = queryset.order_by('-sale_date')
+        queryset = queryset.order_by('-sale_date', '-id')
         return queryset
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['total_revenue'] = Sale.total_revenue()
-        context['sales_count'] = Sale.objects.count()
-        context['avg_revenue'] = Sale.avg_revenue()
+        paginator = KeysetPaginator(self.object_list, self.per_page, ordering=self.keyset_ordering)
+        try:
+            page = paginator.page(
+                after=self.request.GET.get('after'),
+                before=self.request.GET.get('before'),
+            )
+        except InvalidCursor:
+            page = paginator.page()
+        context['page'] = page
+        context['sales'] = page.object_list
+
+        # Фильтры сохраняются в ссылках на соседние страницы
+        params = self.request.GET.copy()
+        for key in ('after', 'before'):
+            params.pop(key, None)
+        context['filter_query'] = params.urlencode()
+        context['current_start_date'] = self.request.GET.get('start_date', '')
+        context['current_end_date'] = self.request.GET.get('end_date', '')
+        context['current_search'] = self.request.GET.get('search', '')
+
+        summary = self.get_summary()
+        context['total_revenue'] = summary['revenue']
+        context['sales_count'] = summary['sales_count']
+        context['avg_revenue'] = summary['avg_revenue']
+        context['units_sold'] = summary['units']
+        context['is_filtered'] = any(self.request.GET.get(key) for key in self.summary_filters)
         return context
 
+    def get_summary(self):
+        # Итоги по тем же фильтрам, что и таблица; кэшируются на короткое
+        # время отдельно для каждой комбинации фильтров
+        filters = [(key, self.request.GET.get(key, '').strip()) for key in self.summary_filters]
+        digest = hashlib.md5(urlencode(filters).encode()).hexdigest()
+        key = f'sales:summary:{digest}'
+        summary = cache.get(key)
+        if summary is None:
+            summary = Sale.summary(self.object_list)
+            cache.set(key, summary, settings.SALES_SUMMARY_CACHE_TIMEOUT)
+        return summary
 
-class SaleCreate(LoginRequiredMixin, CreateView):
-    model = Sale
+
+class SaleCreate(LoginRequiredMixin, FormView):
     form_class = SaleCreateForm
     template_name = "sales/modal_sale_create.html"
     success_url = reverse_lazy('sales:sales-list')
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        # Всё, что нужно для кастомного селектора, есть в form.batch.queryset
-        context['all_products'] = self.get_form().fields['batch'].queryset
-        return context
+    def form_valid(self, form):
+        product = form.cleaned_data['product']
+        quantity = form.cleaned_data['quantity']
+        try:
+            sales = sell_product(product, quantity, form.cleaned_data['sale_date'])
+        except ValidationError as error:
+            # Остаток успели забрать параллельной продажей после проверки формы
+            form.add_error('quantity', error)
+            return self.form_invalid(form)
+
+        messages.success(
+            self.request,
+            f'Продано {quantity} шт. товара "{product.name}" из {len(sales)} парт.'
+        )
+        return super().form_valid(form)
+
+
+@query_budget(14)
+class SaleCheckout(LoginRequiredMixin, View):
+    """
+    Проведение чека из нескольких позиций.
+
+    POST JSON: {"lines": [{"batch": 12, "quantity": 2}, {"product": 5, "quantity": 1}],
+                "sale_date": "2025-09-20T14:30"}
+    """
+
+    def post(self, request):
+        try:
+            payload = json.loads(request.body or b'{}')
+        except ValueError:
+            return JsonResponse({'errors': ['Некорректный JSON']}, status=400)
+
+        if not isinstance(payload, dict):
+            return JsonResponse({'errors': ['Ожидается объект с позициями lines']}, status=400)
+        lines = payload.get('lines')
+        if not isinstance(lines, list):
+            return JsonResponse({'errors': ['Ожидается список позиций lines']}, status=400)
+
+        sale_date = None
+        raw_date = payload.get('sale_date')
+        if raw_date:
+            try:
+                # Строка правильного вида с несуществующей датой даёт ValueError
+                sale_date = parse_datetime(raw_date) if isinstance(raw_date, str) else None
+            except ValueError:
+                sale_date = None
+            if sale_date is None:
+                return JsonResponse({'errors': ['Некорректная дата продажи']}, status=400)
+            if timezone.is_naive(sale_date):
+                sale_date = timezone.make_aware(sale_date)
+
+        try:
+            sales = post_receipt(lines, sale_date)
+        except ValidationError as error:
+            # 409 — только когда чек корректен, но товара не хватает
+            insufficient = all(item.code == 'insufficient_stock' for item in error.error_list)
+            return JsonResponse({'errors': error.messages}, status=409 if insufficient else 400)
 
+        return JsonResponse({
+            'sales': [
+                {'id': sale.pk, 'batch': sale.batch_id, 'quantity': sale.quantity}
+                for sale in sales
+            ],
+            'total': str(sum(sale.revenue for sale in sales)),
+        }, status=201)
@@ -0,0 +1,134 @@
+// Поиск товара в модальных формах продажи и поставки.
+// Варианты не рендерятся в шаблоне: они подгружаются страницами из
+// JSON-подсказок (products:product-lookup), адрес берётся из data-url
+// у #productOptions. Выбранный id пишется в скрытое поле #selectedProduct.
+
+const LOOKUP_DELAY = 250;
+
+let lookupTimer = null;
+let lookupRequest = null;
+
+function initializeProductSearch() {
+    const searchInput = document.getElementById('productSearch');
+    const productOptions = document.getElementById('productOptions');
+
+    if (!searchInput || !productOptions) return;
+
+    const selected = document.getElementById('selectedProduct');
+    if (selected && selected.value && selected.dataset.label) {
+        // Форма вернулась с ошибкой: показываем ранее выбранный товар
+        searchInput.value = selected.dataset.label;
+    }
+
+    searchInput.addEventListener('input', function(e) {
+        // Новый текст поиска сбрасывает выбор
+        if (selected) selected.value = '';
+        clearTimeout(lookupTimer);
+        lookupTimer = setTimeout(function() {
+            loadProducts(e.target.value.trim(), null);
+        }, LOOKUP_DELAY);
+    });
+
+    // Обработчик Enter в поле поиска
+    searchInput.addEventListener('keydown', function(e) {
+        if (e.key === 'Enter') {
+            e.preventDefault();
+            // Выбираем первый найденный вариант
+            const first = productOptions.querySelector('.product-option');
+            if (first) {
+                selectProduct(first);
+            }
+        }
+    });
+
+    loadProducts('', null);
+}
+
+function loadProducts(query, after) {
+    const productOptions = document.getElementById('productOptions');
+    const url = new URL(productOptions.dataset.url, window.location.origin);
+    if (query) url.searchParams.set('q', query);
+    if (after) url.searchParams.set('after', after);
+
+    if (lookupRequest) lookupRequest.abort();
+    lookupRequest = new AbortController();
+
+    fetch(url, { signal: lookupRequest.signal, headers: { 'Accept': 'application/json' } })
+        .then(response => response.json())
+        .then(data => renderProducts(data, query, after))
+        .catch(error => {
+            if (error.name !== 'AbortError') {
+                showNoResults('Не удалось загрузить товары');
+            }
+        });
+}
+
+function renderProducts(data, query, after) {
+    const productOptions = document.getElementById('productOptions');
+    const selectedId = document.getElementById('selectedProduct').value;
+
+    if (!after) {
+        productOptions.innerHTML = '';
+    }
+    const more = productOptions.querySelector('.load-more');
+    if (more) more.remove();
+
+    (data.results || []).forEach(item => {
+        const option = document.createElement('div');
+        option.className = 'product-option';
+        option.dataset.value = item.id;
+        option.dataset.name = item.name;
+        option.addEventListener('click', () => selectProduct(option));
+
+        const title = document.createElement('strong');
+        title.textContent = item.label;
+        const info = document.createElement('div');
+        info.className = 'product-info-small';
+        info.textContent = item.details;
+        option.append(title, info);
+
+        if (String(item.id) === selectedId) {
+            option.classList.add('selected');
+        }
+        productOptions.appendChild(option);
+    });
+
+    if (!productOptions.querySelector('.product-option')) {
+        showNoResults(query ? 'Товары не найдены' : 'Нет доступных товаров');
+    } else if (data.next) {
+        const loadMore = document.createElement('div');
+        loadMore.className = 'no-results load-more';
+        loadMore.textContent = 'Показать ещё…';
+        loadMore.style.cursor = 'pointer';
+        loadMore.addEventListener('click', () => loadProducts(query, data.next));
+        productOptions.appendChild(loadMore);
+    }
+}
+
+function showNoResults(text) {
+    const productOptions = document.getElementById('productOptions');
+    productOptions.innerHTML = '';
+    const noResults = document.createElement('div');
+    noResults.className = 'no-results';
+    noResults.textContent = text;
+    productOptions.appendChild(noResults);
+}
+
+function selectProduct(element) {
+    if (element.classList.contains('no-results')) return;
+
+    // Устанавливаем значение в скрытое поле
+    document.getElementById('selectedProduct').value = element.dataset.value;
+
+    // Подсвечиваем выбранный элемент
+    document.querySelectorAll('.product-option').forEach(opt => {
+        opt.classList.remove('selected');
+    });
+    element.classList.add('selected');
+
+    // Показываем выбранный товар в поле поиска
+    document.getElementById('productSearch').value = element.dataset.name;
+
+    // Прокручиваем к выбранному элементу
+    element.scrollIntoView({ behavior: 'smooth', block: 'nearest' });
+}
@@ -0,0 +1,9 @@
+from core import exports
+from .views import SuppliesList
+
+exports.register('supplies', SuppliesList, title='Поставщики', columns=[
+    exports.Column('name', 'Поставщик'),
+    exports.Column('contact_face', 'Менеджер'),
+    exports.Column('telephone', 'Телефон'),
+    exports.Column('email', 'Почта'),
+])
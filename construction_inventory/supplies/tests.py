@@ -1,3 +1,20 @@
 from django.test import TestCase
 
-# Create your tests here.
+from core.testing import QueryBudgetMixin, create_store
+from users.models import CustomUser
+
+
+class SupplierPageQueryBudgetTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.store = create_store()
+        cls.user = CustomUser.objects.create(username='manager')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_pages_stay_within_query_budget(self):
+        product = self.store['products'][0]
+        self.assertQueryBudget('/crm-system/supplies/', 6)
+        self.assertQueryBudget(f'/crm-system/supplies/edit-supplies/{product.supplier_id}/', 4)
+        self.assertQueryBudget(f'/crm-system/supplies/delete-supplies/{product.supplier_id}/', 5)
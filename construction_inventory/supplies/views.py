@@ -1,22 +1,26 @@
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.db.models import Count
 from django.urls import reverse_lazy
 from django.views.generic import CreateView, ListView, UpdateView, DeleteView
 from .models import Supplier
 from products.models import Product
-from warehouse.models import Batch
+from warehouse.services import active_batches
 from .forms import SuppliesForm
+from core.querybudget import query_budget
+from core.search import search_filter
 
+@query_budget(7)
 class SuppliesList(LoginRequiredMixin,ListView):
     model = Supplier
     template_name = "supplies/suppliers.html"
     context_object_name = 'supplies'
 
     def get_queryset(self):
-        queryset = super().get_queryset()
+        queryset = super().get_queryset().annotate(product_count=Count('products'))
 
         search_param = self.request.GET.get('search')
         if search_param:
-            queryset = Supplier.objects.filter(name__icontains=search_param)
+            queryset = queryset.filter(search_filter('id', 'supplier', search_param))
             return queryset
 
         return queryset
@@ -26,7 +30,7 @@ class SuppliesList(LoginRequiredMixin,ListView):
         supplier = Supplier.objects.all()
         context['total_supplies'] = supplier.count()
         context['total_products'] = Product.objects.count()
-        context['total_batch'] = Batch.objects.filter(quantity__gt=0).count()
+        context['total_batch'] = active_batches().count()
         return context
 
 
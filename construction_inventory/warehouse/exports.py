@@ -0,0 +1,10 @@
+from core import exports
+from .views import BatchList
+
+exports.register('warehouse', BatchList, title='Складские партии', columns=[
+    exports.Column('product', 'Название товара', 'product__name'),
+    exports.Column('product_id', 'ID товара'),
+    exports.Column('price', 'Цена'),
+    exports.Column('quantity', 'Количество'),
+    exports.Column('arrival_date', 'Дата поступления'),
+])
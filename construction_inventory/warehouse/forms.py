@@ -1,15 +1,13 @@
 from django import forms
 from warehouse.models import Batch
-from products.models import Product
 
 class BatchForm(forms.ModelForm):
     class Meta:
         model = Batch
         fields = '__all__'
         widgets = {
-            'product': forms.Select(attrs={
-                'class': 'form-control product-select',
-            }),
+            # Товар выбирается через products:product-lookup, список не рендерится
+            'product': forms.HiddenInput,
             'price': forms.NumberInput(attrs={
                 'class': 'form-control',
                 'step': '0.01'
@@ -24,10 +22,6 @@ class BatchForm(forms.ModelForm):
             }),
         }
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.all_products = Product.objects.select_related('category', 'supplier').all().order_by('name')
-
 class BatchUpdate(forms.ModelForm):
     class Meta:
         model = Batch
@@ -41,4 +35,19 @@ class BatchUpdate(forms.ModelForm):
                 'class': 'form-control',
                 'min': '0'
             }),
-        }
\ No newline at end of file
+        }
+
+class DeliveryImportForm(forms.Form):
+    file = forms.FileField(
+        label='Файл поставки',
+        help_text='CSV или XLSX с колонками "Название товара" (или "ID товара"), "Количество", "Цена"',
+        widget=forms.ClearableFileInput(attrs={
+            'class': 'form-control',
+            'accept': '.csv,.xlsx',
+        }),
+    )
+    partial = forms.BooleanField(
+        required=False,
+        label='Загрузить корректные строки, даже если в файле есть ошибки',
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'}),
+    )
@@ -0,0 +1,137 @@
+"""
+Политика хранения истории партий (HistoricalBatch).
+
+Каждая продажа пишет полную копию партии в историю, поэтому таблица растёт
+быстрее продаж. Для записей старше keep_days остаются только контрольные
+точки: первая запись партии (состояние при поступлении, её читает карточка
+товара) и последняя запись каждого дня. Записи старше archive_days, кроме
+первой, переносятся в ArchivedBatchHistory.
+
+Записи обходятся по history_id порциями не больше chunk_size строк, каждая
+порция — отдельная транзакция. Первая запись партии и следующая за записью
+берутся коррелированными подзапросами по индексу batch_history_timeline_idx,
+а удаление идёт одним DELETE ... WHERE history_id IN (SELECT ...) по
+диапазону порции, без списка id в Python.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import ArchivedBatchHistory, Batch
+
+ARCHIVE_FIELDS = {
+    'history_id': 'history_id',
+    'batch_id': 'id',
+    'product_id': 'product_id',
+    'group_id': 'group_id',
+    'price': 'price',
+    'quantity': 'quantity',
+    'arrival_date': 'arrival_date',
+    'is_modified': 'is_modified',
+    'history_date': 'history_date',
+    'history_change_reason': 'history_change_reason',
+    'history_type': 'history_type',
+    'history_user_id': 'history_user_id',
+}
+
+
+def _chunk_ends(queryset, chunk_size):
+    """Правые границы порций по history_id; последняя порция — None (до конца)."""
+    queryset = queryset.order_by('history_id').values_list('history_id', flat=True)
+    end = 0
+    while end is not None:
+        found = list(queryset.filter(history_id__gt=end)[chunk_size - 1:chunk_size])
+        start, end = end, found[0] if found else None
+        yield start, end
+
+
+def _in_chunk(queryset, start, end):
+    queryset = queryset.filter(history_id__gt=start)
+    if end is not None:
+        queryset = queryset.filter(history_id__lte=end)
+    return queryset.order_by()
+
+
+def _not_first(queryset, rows):
+    """Записи rows, кроме первой записи своей партии среди queryset."""
+    timeline = queryset.filter(id=OuterRef('id')).order_by('history_date', 'history_id')
+    return rows.annotate(
+        first_id=Subquery(timeline.values('history_id')[:1]),
+    ).exclude(history_id=F('first_id'))
+
+
+def _not_last_of_day(queryset, rows):
+    """Записи rows, за которыми в тот же день есть запись той же партии."""
+    # history_date >= даёт поиск по индексу, совпадения по времени
+    # отсекаются по history_id
+    later = queryset.filter(
+        id=OuterRef('id'), history_date__gte=OuterRef('history_date'),
+    ).exclude(
+        history_date=OuterRef('history_date'), history_id__lte=OuterRef('history_id'),
+    ).order_by('history_date', 'history_id')
+    return rows.annotate(
+        next_date=Subquery(later.values('history_date')[:1]),
+    ).filter(next_date__isnull=False).annotate(
+        day=TruncDate('history_date'),
+        next_day=TruncDate('next_date'),
+    ).filter(day=F('next_day'))
+
+
+def _delete(rows):
+    return Batch.history.filter(history_id__in=rows.values('history_id')).delete()[0]
+
+
+def older_than(days):
+    return Batch.history.filter(history_date__lt=timezone.now() - timedelta(days=days))
+
+
+def compaction_candidates(old, start=0, end=None):
+    """Записи порции (start, end] из old, которые compact удалит."""
+    return _not_last_of_day(old, _not_first(old, _in_chunk(old, start, end)))
+
+
+def compact(keep_days, chunk_size=500, dry_run=False):
+    """Удаляет старые записи, кроме первой по партии и последней за день."""
+    old = older_than(keep_days)
+    removed = 0
+    for start, end in _chunk_ends(old, chunk_size):
+        with transaction.atomic():
+            # Набор не зависит от порядка удаления: первая запись партии
+            # остаётся, а у оставшихся записей следующая — в тот же день
+            # или позже, как и до удаления
+            rows = compaction_candidates(old, start, end)
+            if dry_run:
+                removed += rows.count()
+            else:
+                removed += _delete(rows)
+    return removed
+
+
+def archive(archive_days, chunk_size=500, dry_run=False):
+    """Переносит записи старше archive_days в архив, первая запись партии остаётся."""
+    cold = older_than(archive_days)
+    moved = 0
+    for start, end in _chunk_ends(cold, chunk_size):
+        with transaction.atomic():
+            rows = _not_first(cold, _in_chunk(cold, start, end))
+            if dry_run:
+                moved += rows.count()
+                continue
+            # Не больше chunk_size строк в памяти
+            archived = ArchivedBatchHistory.objects.bulk_create(
+                [
+                    ArchivedBatchHistory(**{
+                        field: row[source] for field, source in ARCHIVE_FIELDS.items()
+                    })
+                    for row in rows.values(*ARCHIVE_FIELDS.values())
+                ],
+                batch_size=500,
+                ignore_conflicts=True,
+            )
+            if archived:
+                _delete(rows)
+            moved += len(archived)
+    return moved
@@ -0,0 +1,149 @@
+"""
+Импорт поставки из CSV или XLSX: одна строка файла — одна партия.
+
+Колонки узнаются по заголовку (те же, что в выгрузке склада):
+"Название товара" или "ID товара", "Количество", "Цена". Файл читается
+потоково, товары находятся по словарю имя -> id, собранному одним
+запросом, и все строки проверяются до записи. Группы, партии и их
+история создаются через bulk_create порциями по chunk_size, каждая
+порция — в своей транзакции, остатки товаров сдвигаются одним UPDATE
+на порцию.
+"""
+import time
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from core.imports import CHUNK_SIZE, ImportResult, cell, header_map, normalize, read_rows
+from products.models import Product
+from .models import Batch, BatchGroup, apply_stock_deltas
+
+CHANGE_REASON = 'Импорт поставки'
+
+COLUMNS = {
+    'product': ('название товара', 'товар', 'product'),
+    'product_id': ('id товара', 'product_id'),
+    'quantity': ('количество', 'quantity'),
+    'price': ('цена', 'price'),
+}
+
+_price_field = Batch._meta.get_field('price')
+
+
+def _header_map(header):
+    positions = header_map(header, COLUMNS)
+    if 'product' not in positions and 'product_id' not in positions:
+        raise ValidationError('Нет колонки "Название товара" или "ID товара"')
+    missing = [title for key, title in (('quantity', 'Количество'), ('price', 'Цена')) if key not in positions]
+    if missing:
+        raise ValidationError(f'Нет колонок: {", ".join(missing)}')
+    return positions
+
+
+def _parse_row(row, positions, names, ids):
+    """(product_id, price, quantity) или ValidationError с текстом для отчёта."""
+    errors = []
+
+    product_id = None
+    raw_id = cell(row, positions, 'product_id')
+    raw_name = cell(row, positions, 'product')
+    if raw_id:
+        try:
+            product_id = int(Decimal(raw_id))
+        except (InvalidOperation, ValueError):
+            errors.append(f'ID товара "{raw_id}" не число')
+        else:
+            if product_id not in ids:
+                errors.append(f'Товар #{product_id} не найден')
+    elif raw_name:
+        product_id = names.get(normalize(raw_name))
+        if product_id is None:
+            errors.append(f'Товар "{raw_name}" не найден')
+    else:
+        errors.append('Не указан товар')
+
+    quantity = None
+    raw_quantity = cell(row, positions, 'quantity')
+    try:
+        quantity = Decimal(raw_quantity)
+        if quantity != quantity.to_integral_value() or quantity < 1:
+            raise InvalidOperation
+        quantity = int(quantity)
+    except (InvalidOperation, ValueError):
+        errors.append(f'Количество "{raw_quantity}" должно быть целым числом больше нуля')
+
+    price = None
+    raw_price = cell(row, positions, 'price').replace(',', '.').replace(' ', '')
+    try:
+        price = _price_field.clean(raw_price, None)
+    except ValidationError:
+        errors.append(f'Цена "{raw_price}" некорректна')
+
+    if errors:
+        raise ValidationError(errors)
+    return product_id, price, quantity
+
+
+def _write_chunk(rows, user):
+    with transaction.atomic():
+        groups = BatchGroup.objects.bulk_create([
+            BatchGroup(product_id=product_id, on_hand=quantity)
+            for product_id, price, quantity in rows
+        ])
+        batches = Batch.objects.bulk_create([
+            Batch(product_id=product_id, group=group, price=price, quantity=quantity)
+            for (product_id, price, quantity), group in zip(rows, groups)
+        ])
+        product_deltas = defaultdict(int)
+        for product_id, price, quantity in rows:
+            product_deltas[product_id] += quantity
+        apply_stock_deltas(product_deltas)
+        Batch.history.bulk_history_create(
+            batches, default_user=user, default_change_reason=CHANGE_REASON
+        )
+    return len(batches)
+
+
+def import_delivery(file, name='', user=None, partial=False, chunk_size=CHUNK_SIZE):
+    """
+    Загружает поставку и возвращает ImportResult с отчётом по строкам.
+
+    Если есть ошибки, по умолчанию не создаётся ничего; с partial=True
+    загружаются только корректные строки. Ошибки заголовка файла
+    поднимаются как ValidationError.
+    """
+    started = time.perf_counter()
+    result = ImportResult()
+    rows = iter(read_rows(file, name))
+    header = next(rows, None)
+    if header is None:
+        raise ValidationError('Файл пуст')
+    positions = _header_map(header)
+
+    names = {}
+    ids = set()
+    for product_id, product_name in Product.objects.values_list('id', 'name'):
+        names[normalize(product_name)] = product_id
+        ids.add(product_id)
+
+    valid = []
+    # Строка 1 — заголовок, номера в отчёте совпадают с номерами в файле
+    for line, row in enumerate(rows, 2):
+        if not any(str(value).strip() for value in row):
+            continue
+        result.rows += 1
+        try:
+            valid.append(_parse_row(row, positions, names, ids))
+        except ValidationError as error:
+            result.add_error(line, '; '.join(error.messages))
+
+    if result.ok or partial:
+        valid = iter(valid)
+        while chunk := list(islice(valid, chunk_size)):
+            result.created += _write_chunk(chunk, user)
+
+    result.duration = time.perf_counter() - started
+    return result
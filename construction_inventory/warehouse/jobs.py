@@ -0,0 +1,9 @@
+from core import jobs
+from .services import reconcile_stock
+
+
+@jobs.register('reconcile-stock', title='Сверка остатков', staff_only=True)
+def reconcile_stock_job(job, report):
+    report(0, 'Сверка остатков с партиями')
+    products, groups = reconcile_stock()
+    report(99, f'Исправлено товаров: {products}, групп партий: {groups}')
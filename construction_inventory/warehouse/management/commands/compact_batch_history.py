@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+from warehouse import history
+
+
+class Command(BaseCommand):
+    help = (
+        'Сжимает историю партий: для записей старше --keep-days оставляет первую '
+        'запись партии и последнюю за каждый день; с --archive-days переносит '
+        'холодные записи в архивную таблицу'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep-days', type=int, default=90,
+                            help='Сколько дней хранить полную историю (по умолчанию 90)')
+        parser.add_argument('--archive-days', type=int, default=None,
+                            help='Переносить в архив записи старше этого числа дней')
+        parser.add_argument('--chunk-size', type=int, default=500,
+                            help='Сколько записей истории обрабатывать в одной транзакции')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Только посчитать записи, ничего не менять')
+
+    def handle(self, *args, **options):
+        if options['keep_days'] < 1 or options['chunk_size'] < 1:
+            raise CommandError('--keep-days и --chunk-size должны быть больше нуля')
+
+        prefix = 'Будет' if options['dry_run'] else 'Было'
+        removed = history.compact(
+            options['keep_days'], options['chunk_size'], options['dry_run']
+        )
+        self.stdout.write(f'{prefix} удалено промежуточных записей: {removed}')
+
+        if options['archive_days'] is not None:
+            moved = history.archive(
+                options['archive_days'], options['chunk_size'], options['dry_run']
+            )
+            self.stdout.write(f'{prefix} перенесено в архив: {moved}')
+
+        self.stdout.write(self.style.SUCCESS('Готово'))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from products.models import Product
+from warehouse.services import consolidate_batches
+
+
+class Command(BaseCommand):
+    help = 'Объединяет активные партии каждого товара в самую новую (по всему складу или по поставщику/категории)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--supplier', type=int, help='Только товары поставщика с этим id')
+        parser.add_argument('--category', type=int, help='Только товары категории с этим id')
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать, сколько партий будет объединено',
+        )
+
+    def handle(self, *args, **options):
+        products = Product.objects.all()
+        if options['supplier'] is not None:
+            products = products.filter(supplier_id=options['supplier'])
+        if options['category'] is not None:
+            products = products.filter(category_id=options['category'])
+
+        merged, emptied = consolidate_batches(products, dry_run=options['dry_run'])
+        action = 'Будет объединено' if options['dry_run'] else 'Объединено'
+        self.stdout.write(self.style.SUCCESS(
+            f'{action}: товаров — {merged}, партий перенесено в последнюю — {emptied}'
+        ))
@@ -0,0 +1,32 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from warehouse.imports import CHUNK_SIZE, import_delivery
+
+
+class Command(BaseCommand):
+    help = 'Загружает поставку из CSV или XLSX: одна строка — одна партия'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл поставки')
+        parser.add_argument('--partial', action='store_true',
+                            help='Загрузить корректные строки, даже если есть ошибки')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                            help='Строк в одной транзакции')
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['path'], 'rb') as file:
+                result = import_delivery(
+                    file, name=options['path'], partial=options['partial'],
+                    chunk_size=options['chunk_size'],
+                )
+        except (OSError, ValidationError) as error:
+            raise CommandError(error)
+
+        for line, message in result.errors:
+            self.stderr.write(f'Строка {line}: {message}')
+        style = self.style.SUCCESS if result.ok else self.style.WARNING
+        self.stdout.write(style(
+            f'Строк: {result.rows}, создано партий: {result.created}, '
+            f'ошибок: {len(result.errors)} за {result.duration:.2f} с'
+        ))
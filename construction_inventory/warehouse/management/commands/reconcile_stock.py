@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from warehouse.services import reconcile_stock
+
+
+class Command(BaseCommand):
+    help = 'Сверяет сохранённые остатки товаров и групп партий с суммой по партиям'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать количество расхождений, ничего не исправлять',
+        )
+
+    def handle(self, *args, **options):
+        products, groups = reconcile_stock(dry_run=options['dry_run'])
+        action = 'Найдено' if options['dry_run'] else 'Исправлено'
+        self.stdout.write(self.style.SUCCESS(
+            f'{action} расхождений: товары — {products}, группы партий — {groups}'
+        ))
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.24 on 2026-10-18 14:36
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def fill_on_hand(apps, schema_editor):
+    Batch = apps.get_model("warehouse", "Batch")
+    for model, link in (
+        (apps.get_model("products", "Product"), "product"),
+        (apps.get_model("warehouse", "BatchGroup"), "group"),
+    ):
+        total = (
+            Batch.objects.filter(**{link: OuterRef("pk")})
+            .order_by()
+            .values(link)
+            .annotate(total=Sum("quantity"))
+            .values("total")
+        )
+        model.objects.update(on_hand=Coalesce(Subquery(total), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0002_stock_on_hand"),
+        ("warehouse", "0002_historicalbatch"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="batchgroup",
+            name="on_hand",
+            field=models.IntegerField(
+                default=0, editable=False, verbose_name="Остаток по группе"
+            ),
+        ),
+        migrations.RunPython(fill_on_hand, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.24 on 2026-10-18 14:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("warehouse", "0003_stock_on_hand"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="batch",
+            index=models.Index(
+                condition=models.Q(("quantity__gt", 0)),
+                fields=["product", "arrival_date"],
+                name="batch_active_fifo_idx",
+            ),
+        ),
+    ]
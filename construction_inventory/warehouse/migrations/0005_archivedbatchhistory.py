@@ -0,0 +1,50 @@
+# Generated by Django 4.2.24 on 2026-10-18 14:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("warehouse", "0004_batch_active_fifo_idx"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ArchivedBatchHistory",
+            fields=[
+                ("history_id", models.IntegerField(primary_key=True, serialize=False)),
+                (
+                    "batch_id",
+                    models.BigIntegerField(db_index=True, verbose_name="Партия"),
+                ),
+                ("product_id", models.BigIntegerField(null=True, verbose_name="Товар")),
+                (
+                    "group_id",
+                    models.BigIntegerField(null=True, verbose_name="Группа партии"),
+                ),
+                (
+                    "price",
+                    models.DecimalField(
+                        decimal_places=2, max_digits=10, verbose_name="Цена реализации"
+                    ),
+                ),
+                ("quantity", models.IntegerField(verbose_name="Количество")),
+                (
+                    "arrival_date",
+                    models.DateTimeField(verbose_name="Дата поступления партии"),
+                ),
+                ("is_modified", models.BooleanField(verbose_name="Измененная партия")),
+                ("history_date", models.DateTimeField(verbose_name="Дата изменения")),
+                ("history_change_reason", models.CharField(max_length=100, null=True)),
+                ("history_type", models.CharField(max_length=1)),
+                ("history_user_id", models.BigIntegerField(null=True)),
+            ],
+            options={
+                "verbose_name": "Архивная запись истории партии",
+                "verbose_name_plural": "Архив истории партий",
+                "db_table": "Архив истории партий",
+                "ordering": ["batch_id", "history_date"],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.24 on 2026-10-18 14:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("warehouse", "0005_archivedbatchhistory"),
+    ]
+
+    operations = [
+        # Индекс таблицы истории: модель HistoricalBatch строит simple_history,
+        # Meta.indexes ей не задать. Порядок полей совпадает с окном
+        # initial_batch_histories и обходом в compact_batch_history
+        migrations.RunSQL(
+            sql='CREATE INDEX "batch_history_timeline_idx" ON "warehouse_historicalbatch" '
+            '("id", "history_date", "history_id")',
+            reverse_sql='DROP INDEX "batch_history_timeline_idx"',
+        ),
+        migrations.AddIndex(
+            model_name="batch",
+            index=models.Index(
+                fields=["product", "-arrival_date"], name="batch_product_arrival_idx"
+            ),
+        ),
+    ]
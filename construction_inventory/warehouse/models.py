@@ -1,9 +1,23 @@
-from django.db import models
+from collections import defaultdict
+from django.db import models, transaction
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator
-from django.db.models import Sum
+from django.db.models import Case, F, IntegerField, Sum, Value, When
 from products.models import Product
 from simple_history.models import HistoricalRecords
 
+
+class InsufficientStock(ValidationError):
+    def __init__(self, batch, requested, available):
+        self.batch = batch
+        self.requested = requested
+        self.available = available
+        super().__init__(
+            f"Недостаточно товара. В наличии: {available}",
+            code='insufficient_stock',
+        )
+
+
 class BatchGroup(models.Model):
     product = models.ForeignKey(
         Product,
@@ -15,6 +29,11 @@ class BatchGroup(models.Model):
         auto_now_add=True,
         verbose_name="Дата создания группы"
     )
+    on_hand = models.IntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Остаток по группе"
+    )
 
     class Meta:
         db_table = "Группы партий"
@@ -29,7 +48,7 @@ class BatchGroup(models.Model):
 
     @property
     def total_quantity(self):
-        return self.batches.aggregate(total=models.Sum('quantity'))['total'] or 0
+        return self.on_hand
 
     def get_active_batches(self):
         return self.batches.filter(quantity__gt=0)
@@ -81,12 +100,76 @@ class Batch(models.Model):
         verbose_name = "Партия товара"
         verbose_name_plural = "Партии товаров"
         ordering = ['-arrival_date']
+        indexes = [
+            # Активные партии товара в порядке поставки: FIFO-списание
+            models.Index(
+                fields=['product', 'arrival_date'],
+                condition=models.Q(quantity__gt=0),
+                name='batch_active_fifo_idx',
+            ),
+            # Все партии товара от новых к старым: карточка товара
+            models.Index(fields=['product', '-arrival_date'], name='batch_product_arrival_idx'),
+        ]
 
     def __str__(self):
         status = "Измененная" if self.is_modified else "Оригинальная"
         product_name = self.product.name if self.product else "Неизвестный товар"
         return f"Партия #{self.id} - {product_name} - {status}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_stock()
+        return instance
+
+    def _remember_stock(self):
+        state = tuple(self.__dict__.get(name) for name in ('product_id', 'group_id', 'quantity'))
+        # Если часть полей отложена (defer/only), прежнее состояние читается из базы при сохранении
+        self._stock_state = state if None not in (state[0], state[2]) else None
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            previous = None
+            if not self._state.adding:
+                previous = getattr(self, '_stock_state', None)
+                if previous is None:
+                    previous = Batch.objects.filter(pk=self.pk).values_list(
+                        'product_id', 'group_id', 'quantity'
+                    ).first()
+            super().save(*args, **kwargs)
+
+            product_deltas = defaultdict(int)
+            group_deltas = defaultdict(int)
+            if previous is not None:
+                product_id, group_id, quantity = previous
+                product_deltas[product_id] -= quantity
+                group_deltas[group_id] -= quantity
+            product_deltas[self.product_id] += self.quantity
+            group_deltas[self.group_id] += self.quantity
+            apply_stock_deltas(product_deltas, group_deltas)
+        self._remember_stock()
+
+    def take(self, quantity):
+        """
+        Списывает quantity единиц одним условным UPDATE ... WHERE quantity >= n.
+
+        Параллельные продажи из одной партии не затирают друг друга и не уводят
+        остаток в минус: если товара не хватает, поднимается InsufficientStock.
+        Вызывать внутри transaction.atomic().
+        """
+        taken = Batch.objects.filter(pk=self.pk, quantity__gte=quantity).update(
+            quantity=F('quantity') - quantity
+        )
+        if not taken:
+            available = Batch.objects.filter(pk=self.pk).values_list('quantity', flat=True).first()
+            raise InsufficientStock(self, quantity, available or 0)
+
+        self.refresh_from_db(fields=['quantity'])
+        self._remember_stock()
+        apply_stock_deltas({self.product_id: -quantity}, {self.group_id: -quantity})
+        Batch.history.bulk_history_create([self], update=True)
+        return self
+
     def modify_quantity(self, new_quantity, new_price=None):
         if new_quantity < 0:
             raise ValueError("Количество не может быть отрицательным")
@@ -102,3 +185,54 @@ class Batch(models.Model):
     def total_price(self):
         total = Batch.objects.aggregate(total_price = Sum('price'))
         return total
+
+
+
+class ArchivedBatchHistory(models.Model):
+    """
+    Холодная история партий, перенесённая из HistoricalBatch командой
+    compact_batch_history. Первичная запись каждой партии в архив не уходит.
+    """
+    history_id = models.IntegerField(primary_key=True)
+    batch_id = models.BigIntegerField(db_index=True, verbose_name="Партия")
+    product_id = models.BigIntegerField(null=True, verbose_name="Товар")
+    group_id = models.BigIntegerField(null=True, verbose_name="Группа партии")
+    price = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Цена реализации")
+    quantity = models.IntegerField(verbose_name="Количество")
+    arrival_date = models.DateTimeField(verbose_name="Дата поступления партии")
+    is_modified = models.BooleanField(verbose_name="Измененная партия")
+    history_date = models.DateTimeField(verbose_name="Дата изменения")
+    history_change_reason = models.CharField(max_length=100, null=True)
+    history_type = models.CharField(max_length=1)
+    history_user_id = models.BigIntegerField(null=True)
+
+    class Meta:
+        db_table = "Архив истории партий"
+        verbose_name = "Архивная запись истории партии"
+        verbose_name_plural = "Архив истории партий"
+        ordering = ['batch_id', 'history_date']
+
+    def __str__(self):
+        return f"Партия #{self.batch_id} на {self.history_date:%d.%m.%Y %H:%M}"
+
+def _shift(queryset, deltas):
+    deltas = {pk: delta for pk, delta in deltas.items() if pk is not None and delta}
+    if not deltas:
+        return
+    queryset.filter(pk__in=deltas).update(on_hand=F('on_hand') + Case(
+        *[When(pk=pk, then=Value(delta)) for pk, delta in deltas.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    ))
+
+
+def apply_stock_deltas(product_deltas, group_deltas=None):
+    """
+    Сдвигает сохранённые остатки Product.on_hand и BatchGroup.on_hand.
+
+    Принимает словари {id: изменение количества}; на каждую таблицу уходит
+    один UPDATE. Вызывать внутри той же транзакции, что меняет партии.
+    """
+    _shift(Product.objects.all(), product_deltas)
+    _shift(BatchGroup.objects.all(), group_deltas or {})
+
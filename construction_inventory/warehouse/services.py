@@ -0,0 +1,278 @@
+from collections import defaultdict
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.db.models import Case, Count, F, IntegerField, OuterRef, Subquery, Sum, Value, When, Window
+from django.db.models.functions import Coalesce, RowNumber
+from products.models import Product
+from .models import Batch, BatchGroup, InsufficientStock, apply_stock_deltas
+
+NO_SUPPLIER_KEY = 'no_supplier'
+NO_SUPPLIER_NAME = 'Без поставщика'
+CONSOLIDATION_REASON = 'Консолидация партий'
+
+
+def active_batches():
+    """Партии с остатком; запросы по ним идут по частичному индексу batch_active_fifo_idx."""
+    return Batch.objects.filter(quantity__gt=0)
+
+
+def supplier_tree_batches(batches):
+    """
+    Партии для build_supplier_tree: остаток товара и номер партии от новой
+    к старой считаются оконными функциями в том же запросе.
+    """
+    return batches.select_related(
+        'product',
+        'product__category',
+        'product__supplier',
+        'group',
+    ).annotate(
+        product_total=Window(
+            expression=Sum('quantity'),
+            partition_by=[F('product_id')],
+        ),
+        product_position=Window(
+            expression=RowNumber(),
+            partition_by=[F('product_id')],
+            order_by=[F('arrival_date').desc(), F('id').desc()],
+        ),
+    ).order_by('product__name', 'product_id', '-arrival_date', '-id')
+
+
+def build_supplier_tree(batches):
+    """
+    Собирает дерево поставщик -> товар -> партии из queryset активных партий.
+
+    Всё дерево строится одним SELECT (supplier_tree_batches) независимо от
+    количества товаров на складе.
+    """
+    batches = supplier_tree_batches(batches)
+    suppliers = {}
+    products = {}
+    for batch in batches:
+        product_info = products.get(batch.product_id)
+        if product_info is None:
+            product = batch.product
+            supplier = product.supplier
+            supplier_key = supplier.id if supplier else NO_SUPPLIER_KEY
+
+            supplier_data = suppliers.get(supplier_key)
+            if supplier_data is None:
+                supplier_data = suppliers[supplier_key] = {
+                    'supplier': supplier,
+                    'supplier_name': supplier.name if supplier else NO_SUPPLIER_NAME,
+                    'products': [],
+                }
+
+            product_info = products[batch.product_id] = {
+                'product': product,
+                'total_quantity': batch.product_total,
+                'last_batch': None,
+                'batches': [],
+            }
+            supplier_data['products'].append(product_info)
+
+        if batch.product_position == 1:
+            product_info['last_batch'] = batch
+        product_info['batches'].append(batch)
+
+    return sorted(suppliers.values(), key=lambda data: data['supplier_name'])
+
+
+def _actual_on_hand(link):
+    return Coalesce(
+        Subquery(
+            Batch.objects.filter(**{link: OuterRef('pk')}).order_by().values(link).annotate(
+                total=Sum('quantity')
+            ).values('total')
+        ),
+        0,
+    )
+
+
+def reconcile_stock(dry_run=False):
+    """
+    Сверяет Product.on_hand и BatchGroup.on_hand с суммой по партиям.
+
+    Возвращает количество расхождений (товары, группы); без dry_run
+    исправляет их двумя UPDATE в одной транзакции.
+    """
+    result = []
+    with transaction.atomic():
+        for model, link in ((Product, 'product'), (BatchGroup, 'group')):
+            actual = _actual_on_hand(link)
+            drifted = model.objects.annotate(actual=actual).exclude(on_hand=F('actual'))
+            if dry_run:
+                result.append(drifted.count())
+            else:
+                result.append(
+                    model.objects.filter(pk__in=drifted.values('pk')).update(on_hand=actual)
+                )
+    return tuple(result)
+
+
+def consolidate_batches(products=None, user=None, dry_run=False):
+    """
+    Сливает активные партии каждого товара в самую новую из них.
+
+    products — queryset товаров (по умолчанию все). Возвращает количество
+    (товаров, обнулённых партий); с dry_run только считает их.
+
+    Всё делается в одной транзакции несколькими запросами на весь набор:
+    UPDATE новейших партий суммой активных остатков товара, чтение
+    изменившихся партий, UPDATE обнуления остальных, сдвиг остатков групп
+    и история пачкой. В SQLite первый запрос — запись, поэтому блокировка
+    на запись берётся до чтения, и параллельная продажа ждёт
+    (busy_timeout), а не меняет партии между запросами.
+    Остаток товара от слияния не меняется.
+    """
+    active = Batch.objects.filter(quantity__gt=0)
+    if products is not None:
+        active = active.filter(product__in=products.values('pk'))
+    # Товары, у которых больше одной активной партии
+    candidates = active.order_by().values('product').annotate(active_batches=Count('pk')).filter(
+        active_batches__gt=1
+    )
+
+    if dry_run:
+        rows = list(candidates.values_list('active_batches', flat=True))
+        return len(rows), sum(rows) - len(rows)
+
+    newest = Batch.objects.filter(product=OuterRef('product_id'), quantity__gt=0).order_by(
+        '-arrival_date', '-id'
+    ).values('pk')[:1]
+    product_total = Batch.objects.filter(product=OuterRef('product_id'), quantity__gt=0).order_by().values(
+        'product'
+    ).annotate(total=Sum('quantity')).values('total')
+
+    with transaction.atomic():
+        if connection.features.has_select_for_update:
+            # PostgreSQL и др.: строки блокируются до первого UPDATE, иначе
+            # продажа между запросами разойдётся с перенесённой суммой
+            list(active.select_for_update().values_list('pk', flat=True))
+        merged = active.filter(
+            product__in=candidates.values('product'), pk=Subquery(newest)
+        ).update(quantity=Subquery(product_total))
+        if not merged:
+            return 0, 0
+
+        # После первого UPDATE новейшая партия остаётся новейшей и активной:
+        # набор товаров и партий до обнуления тот же
+        changed = list(
+            Batch.objects.filter(
+                product__in=candidates.values('product'), quantity__gt=0
+            ).order_by('product_id', '-arrival_date', '-id')
+        )
+        emptied = active.exclude(pk=Subquery(newest)).update(quantity=0)
+
+        group_deltas = defaultdict(int)
+        target = None
+        for batch in changed:
+            if target is None or target.product_id != batch.product_id:
+                target = batch
+                continue
+            group_deltas[target.group_id] += batch.quantity
+            group_deltas[batch.group_id] -= batch.quantity
+            batch.quantity = 0
+        apply_stock_deltas({}, group_deltas)
+        Batch.history.bulk_history_create(
+            changed, update=True, default_user=user, default_change_reason=CONSOLIDATION_REASON
+        )
+    return merged, emptied
+
+
+def fifo_batches(product_ids):
+    """Активные партии товаров в порядке списания: от старой поставки к новой."""
+    return active_batches().filter(product_id__in=product_ids).order_by('product_id', 'arrival_date', 'id')
+
+
+def allocate_fifo(demand):
+    """
+    Раскладывает спрос {product_id: количество} по активным партиям,
+    начиная с самой старой поставки. Возвращает {batch_id: количество}.
+
+    Партии блокируются простым SELECT ... FOR UPDATE по частичному индексу
+    batch_active_fifo_idx: PostgreSQL не допускает FOR UPDATE вместе с
+    оконными функциями, поэтому нарастающий остаток считается здесь.
+    Строки читаются по порядку списания, и как только спрос товара
+    покрыт, его оставшиеся партии пропускаются.
+    """
+    demand = {int(product_id): quantity for product_id, quantity in demand.items() if quantity > 0}
+    if not demand:
+        return {}
+
+    rows = fifo_batches(demand).select_for_update().values_list('id', 'product_id', 'quantity')
+
+    taken = {}
+    covered = defaultdict(int)
+    for batch_id, product_id, quantity in rows:
+        missing = demand[product_id] - covered[product_id]
+        if missing <= 0:
+            continue
+        taken[batch_id] = min(quantity, missing)
+        covered[product_id] += taken[batch_id]
+
+    errors = [
+        ValidationError(
+            f'Товар #{product_id}: не хватает {quantity - covered[product_id]} шт.',
+            code='insufficient_stock',
+        )
+        for product_id, quantity in demand.items()
+        if covered[product_id] < quantity
+    ]
+    if errors:
+        raise ValidationError(errors)
+    return taken
+
+
+def take_from_batches(taken):
+    """
+    Списывает {batch_id: количество} одним UPDATE и возвращает {batch_id: Batch}.
+
+    После списания партии перечитываются: если параллельная продажа успела
+    забрать остаток, поднимается ValidationError и транзакция откатывается.
+    Остатки товаров и групп, история партий обновляются пачкой.
+    Вызывать внутри transaction.atomic().
+    """
+    Batch.objects.filter(pk__in=taken).update(quantity=F('quantity') - Case(
+        *[When(pk=batch_id, then=Value(quantity)) for batch_id, quantity in taken.items()],
+        output_field=IntegerField(),
+    ))
+    changed = list(Batch.objects.filter(pk__in=taken).select_related('product'))
+    short = [batch for batch in changed if batch.quantity < 0]
+    if short:
+        raise ValidationError([
+            InsufficientStock(batch, taken[batch.pk], batch.quantity + taken[batch.pk])
+            for batch in short
+        ])
+
+    product_deltas = defaultdict(int)
+    group_deltas = defaultdict(int)
+    for batch in changed:
+        product_deltas[batch.product_id] -= taken[batch.pk]
+        group_deltas[batch.group_id] -= taken[batch.pk]
+    apply_stock_deltas(product_deltas, group_deltas)
+    Batch.history.bulk_history_create(changed, update=True)
+    return {batch.pk: batch for batch in changed}
+
+
+def initial_batch_histories(batch_ids):
+    """
+    Первичные записи истории (состояние при поступлении) для набора партий.
+
+    Один запрос к таблице истории: ROW_NUMBER() по каждой партии в порядке
+    history_date, берётся первая строка. Возвращает {batch_id: запись}.
+    """
+    if not batch_ids:
+        return {}
+    return {record.id: record for record in initial_history_records(batch_ids)}
+
+
+def initial_history_records(batch_ids):
+    return Batch.history.filter(id__in=batch_ids).annotate(
+        position=Window(
+            expression=RowNumber(),
+            partition_by=[F('id')],
+            order_by=[F('history_date').asc(), F('history_id').asc()],
+        ),
+    ).filter(position=1).order_by()
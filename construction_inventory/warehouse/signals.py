@@ -0,0 +1,11 @@
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from .models import Batch, apply_stock_deltas
+
+
+@receiver(post_delete, sender=Batch)
+def remove_batch_from_stock(sender, instance, **kwargs):
+    apply_stock_deltas(
+        {instance.product_id: -instance.quantity},
+        {instance.group_id: -instance.quantity},
+    )
@@ -1,3 +1,439 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from zoneinfo import ZoneInfo
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import F
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core.testing import QueryBudgetMixin, create_store
+from core.xlsx import stream_xlsx
+from products.models import Product
+from supplies.models import Supplier
+from users.models import CustomUser
+from . import history
+from .models import ArchivedBatchHistory, Batch, BatchGroup
+from .imports import import_delivery
+from .services import active_batches, build_supplier_tree, consolidate_batches, initial_batch_histories, reconcile_stock
+
+
+class BatchHistoryRetentionTests(TestCase):
+    def setUp(self):
+        product = Product.objects.create(name='Цемент М500')
+        group = BatchGroup.objects.create(product=product)
+        self.batch = Batch.objects.create(product=product, group=group, price=10, quantity=50)
+        for _ in range(5):
+            self.batch.take(1)
+
+        # Все записи, кроме последней, уводим на 200 дней назад, по две-три в день
+        old_day = timezone.now() - timedelta(days=200)
+        records = list(Batch.history.filter(id=self.batch.pk).order_by('history_id'))
+        self.initial = records[0]
+        for offset, record in enumerate(records[:-1]):
+            Batch.history.filter(history_id=record.history_id).update(
+                history_date=old_day + timedelta(days=offset // 3, minutes=offset)
+            )
+
+    def history_ids(self):
+        return list(Batch.history.filter(id=self.batch.pk).order_by('history_id').values_list('history_id', flat=True))
+
+    def test_compaction_keeps_first_record_and_daily_checkpoints(self):
+        before = self.history_ids()
+
+        call_command('compact_batch_history', '--keep-days', '90', stdout=StringIO())
+
+        # 5 старых записей в двух днях: первая, последняя за каждый день и свежая запись
+        self.assertEqual(self.history_ids(), [before[0], before[2], before[4], before[5]])
+        self.assertEqual(initial_batch_histories([self.batch.pk])[self.batch.pk].history_id, self.initial.history_id)
+
+    def test_archive_moves_cold_records_but_not_the_initial_one(self):
+        before = self.history_ids()
+
+        call_command(
+            'compact_batch_history', '--keep-days', '365', '--archive-days', '90',
+            stdout=StringIO(),
+        )
+
+        self.assertEqual(self.history_ids(), [before[0], before[5]])
+        self.assertEqual(
+            list(ArchivedBatchHistory.objects.order_by('history_id').values_list('history_id', flat=True)),
+            before[1:5],
+        )
+        self.assertEqual(initial_batch_histories([self.batch.pk])[self.batch.pk].quantity, 50)
+
+    def test_chunks_are_bounded_by_rows_not_batches(self):
+        before = self.history_ids()
+        # Полторы тысячи записей одной партии в один день, с одинаковым временем
+        Batch.history.bulk_history_create(
+            [self.batch] * 1500, update=True, default_date=timezone.now() - timedelta(days=150)
+        )
+        last_of_burst = max(self.history_ids())
+
+        dry_run = history.compact(90, chunk_size=400, dry_run=True)
+        with CaptureQueriesContext(connection) as queries:
+            removed = history.compact(90, chunk_size=400)
+
+        self.assertEqual(removed, dry_run)
+        self.assertEqual(removed, 2 + 1499)
+        self.assertEqual(
+            self.history_ids(), sorted([before[0], before[2], before[4], before[5], last_of_burst])
+        )
+        # Удаление по подзапросу: ни один запрос не несёт список id
+        self.assertLess(max(len(query['sql']) for query in queries.captured_queries), 3000)
+
+    def test_result_does_not_depend_on_chunk_size(self):
+        other = Batch.objects.create(product=self.batch.product, group=self.batch.group, price=5, quantity=9)
+        for _ in range(4):
+            other.take(1)
+            self.batch.take(1)
+        Batch.history.update(history_date=F('history_date') - timedelta(days=100))
+        total = Batch.history.count()
+        expected = None
+        for chunk_size in (1, 2, 3, 1000):
+            with transaction.atomic():
+                history.compact(90, chunk_size=chunk_size)
+                kept = list(Batch.history.order_by('history_id').values_list('history_id', flat=True))
+                transaction.set_rollback(True)
+            expected = expected or kept
+            self.assertEqual(kept, expected)
+        self.assertLess(len(expected), total)
+
+
+class SupplierTreeTests(TestCase):
+    def setUp(self):
+        def supplier(name):
+            return Supplier.objects.create(
+                name=name, contact_face='Иванов', telephone='+70000000000', email='info@example.com',
+            )
+
+        def batch(product, quantity, days_ago):
+            created = Batch.objects.create(product=product, group=groups[product.pk], price=10, quantity=quantity)
+            Batch.objects.filter(pk=created.pk).update(arrival_date=timezone.now() - timedelta(days=days_ago))
+            return created
+
+        self.concrete = Product.objects.create(name='Бетон', supplier=supplier('Альфа'))
+        self.gravel = Product.objects.create(name='Щебень', supplier=supplier('Бета'))
+        self.sand = Product.objects.create(name='Песок')
+        groups = {
+            product.pk: BatchGroup.objects.create(product=product)
+            for product in (self.concrete, self.gravel, self.sand)
+        }
+        self.old = batch(self.concrete, 5, days_ago=10)
+        self.new = batch(self.concrete, 7, days_ago=1)
+        # Распроданная партия в дерево не попадает
+        batch(self.concrete, 0, days_ago=0)
+        self.gravel_batch = batch(self.gravel, 3, days_ago=2)
+        self.sand_batch = batch(self.sand, 4, days_ago=3)
+
+    def test_suppliers_products_and_batches(self):
+        with self.assertNumQueries(1):
+            tree = build_supplier_tree(active_batches())
+            # Шаблон обращается к товару, категории и группе: всё из того же запроса
+            products = [
+                (node['product'].name, node['product'].category, node['last_batch'].group.product_id)
+                for data in tree for node in data['products']
+            ]
+
+        self.assertEqual([data['supplier_name'] for data in tree], ['Альфа', 'Без поставщика', 'Бета'])
+        self.assertEqual(products, [
+            ('Бетон', None, self.concrete.pk), ('Песок', None, self.sand.pk), ('Щебень', None, self.gravel.pk),
+        ])
+        self.assertIsNone(tree[1]['supplier'])
+
+        concrete = tree[0]['products'][0]
+        self.assertEqual(concrete['product'], self.concrete)
+        self.assertEqual(concrete['total_quantity'], 12)
+        self.assertEqual(concrete['last_batch'], self.new)
+        self.assertEqual(concrete['batches'], [self.new, self.old])
+
+        self.assertEqual(tree[1]['products'][0]['total_quantity'], 4)
+        self.assertEqual(tree[2]['products'][0]['batches'], [self.gravel_batch])
+
+    def test_query_count_does_not_grow_with_stock(self):
+        create_store(products=6)
+        with self.assertNumQueries(1):
+            tree = build_supplier_tree(active_batches())
+        self.assertEqual(sum(len(data['products']) for data in tree), 9)
+
+
+class InitialBatchHistoriesTests(TestCase):
+    def setUp(self):
+        product = Product.objects.create(name='Цемент М500')
+        group = BatchGroup.objects.create(product=product)
+        self.busy = Batch.objects.create(product=product, group=group, price=10, quantity=50)
+        for _ in range(3):
+            self.busy.take(5)
+        self.busy.modify_quantity(30, new_price=12)
+        self.quiet = Batch.objects.create(product=product, group=group, price=7, quantity=20)
+        # История партии могла быть удалена или не записана (bulk_create)
+        self.bare = Batch.objects.create(product=product, group=group, price=5, quantity=10)
+        Batch.history.filter(id=self.bare.pk).delete()
+
+    def test_first_record_of_each_batch_in_one_query(self):
+        self.assertGreater(Batch.history.filter(id=self.busy.pk).count(), 3)
+
+        with self.assertNumQueries(1):
+            initial = initial_batch_histories([self.busy.pk, self.quiet.pk, self.bare.pk])
+
+        self.assertEqual(set(initial), {self.busy.pk, self.quiet.pk})
+        self.assertEqual((initial[self.busy.pk].quantity, initial[self.busy.pk].price), (50, 10))
+        self.assertEqual(initial[self.busy.pk].history_type, '+')
+        self.assertEqual(initial[self.quiet.pk].quantity, 20)
+
+    def test_same_timestamp_is_ordered_by_history_id(self):
+        first = Batch.history.filter(id=self.busy.pk).earliest('history_id')
+        Batch.history.filter(id=self.busy.pk).update(history_date=first.history_date)
+
+        self.assertEqual(initial_batch_histories([self.busy.pk])[self.busy.pk].history_id, first.history_id)
+
+    def test_no_batches_no_query(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(initial_batch_histories([]), {})
+        self.assertEqual(initial_batch_histories([self.bare.pk]), {})
+
+
+class ReconcileStockTests(TestCase):
+    def setUp(self):
+        store = create_store(products=3)
+        self.products = store['products']
+        self.group = self.products[2].batch_groups.get()
+        self.empty = Product.objects.create(name='Без партий')
+
+        # Остатки, разошедшиеся с партиями (правка в обход сервисов)
+        Product.objects.filter(pk=self.products[0].pk).update(on_hand=999)
+        Product.objects.filter(pk=self.products[1].pk).update(on_hand=0)
+        Product.objects.filter(pk=self.empty.pk).update(on_hand=7)
+        BatchGroup.objects.filter(pk=self.group.pk).update(on_hand=5)
+
+    def stock(self):
+        return (
+            list(Product.objects.order_by('pk').values_list('on_hand', flat=True)),
+            BatchGroup.objects.get(pk=self.group.pk).on_hand,
+        )
+
+    def test_dry_run_only_counts(self):
+        before = self.stock()
+
+        self.assertEqual(reconcile_stock(dry_run=True), (3, 1))
+        self.assertEqual(self.stock(), before)
+
+    def test_repairs_from_batches(self):
+        self.assertEqual(reconcile_stock(), (3, 1))
+
+        # 3 партии по 50, из каждой продано 2
+        self.assertEqual(self.stock(), ([144, 144, 144, 0], 144))
+        self.assertEqual(reconcile_stock(dry_run=True), (0, 0))
+
+    def test_command(self):
+        before = self.stock()
+        out = StringIO()
+        call_command('reconcile_stock', '--dry-run', stdout=out)
+        self.assertIn('Найдено расхождений: товары — 3, группы партий — 1', out.getvalue())
+        self.assertEqual(self.stock(), before)
+
+        out = StringIO()
+        call_command('reconcile_stock', stdout=out)
+        self.assertIn('Исправлено расхождений: товары — 3, группы партий — 1', out.getvalue())
+        self.assertEqual(self.stock(), ([144, 144, 144, 0], 144))
+
+
+class BatchPageQueryBudgetTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.store = create_store()
+        cls.user = CustomUser.objects.create(username='manager')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_pages_stay_within_query_budget(self):
+        batch = self.store['batches'][0]
+        self.assertQueryBudget('/crm-system/products-list/', 4)
+        # Справочники уже в кэше: остаются проверка версий и сами партии
+        self.assertQueryBudget('/crm-system/products-list/', 2)
+        self.assertQueryBudget(f'/crm-system/products-list/edit-batch/{batch.pk}/', 5)
+        self.assertQueryBudget('/crm-system/products-list/create-batch/', 2)
+        self.assertQueryBudget('/crm-system/products-list/lookup/', 3, data={'q': 'тов'})
+
+    def test_consolidation_stays_within_query_budget(self):
+        product = self.store['products'][0]
+        self.assertQueryBudget(
+            f'/crm-system/products-list/consolidation-batch/{product.pk}/', 10, method='post', status=302,
+        )
+
+    def test_delivery_import_stays_within_query_budget(self):
+        url = '/crm-system/products-list/import-delivery/'
+        rows = ''.join(f'{product.name},{number + 1},10\n' for number, product in enumerate(self.store['products']))
+        self.assertQueryBudget(url, 2)
+        # Файл в одну порцию: каждая следующая добавляет SAVEPOINT, вставки и RELEASE
+        self.assertQueryBudget(url, 9, method='post', data={
+            'file': SimpleUploadedFile('delivery.csv', f'Товар,Количество,Цена\n{rows}'.encode()),
+        })
+
+    def test_batch_lookup_lists_active_batches_fifo(self):
+        product = self.store['products'][1]
+        sold_out = self.store['batches'][3]
+        Batch.objects.filter(pk=sold_out.pk).update(quantity=0)
+
+        data = self.client.get('/crm-system/products-list/lookup/', {'q': product.name}).json()
+
+        self.assertEqual(
+            [row['id'] for row in data['results']],
+            [batch.pk for batch in self.store['batches'][4:6]],
+        )
+        self.assertEqual(data['results'][0]['label'], f'Партия #{self.store["batches"][4].pk} — {product.name}')
+        self.assertIn('48 шт. по 100.00 BYN', data['results'][0]['details'])
+
+    def test_batch_lookup_shows_local_arrival_date(self):
+        batch = self.store['batches'][0]
+        # 01:30 по Москве — ещё предыдущие сутки по UTC
+        arrival = datetime(2025, 9, 20, 1, 30, tzinfo=ZoneInfo('Europe/Moscow'))
+        Batch.objects.filter(pk=batch.pk).update(arrival_date=arrival)
+
+        data = self.client.get('/crm-system/products-list/lookup/', {'q': batch.product.name}).json()
+
+        row = next(row for row in data['results'] if row['id'] == batch.pk)
+        self.assertEqual(row['details'], '48 шт. по 100.00 BYN, поставка 20.09.2025')
+
+
+class DeliveryImportTests(TestCase):
+    def setUp(self):
+        self.cement = Product.objects.create(name='Цемент М500')
+        self.bricks = Product.objects.create(name='Кирпич')
+
+    def csv(self, text):
+        return BytesIO(text.encode('utf-8-sig'))
+
+    def test_rows_become_batches_with_groups_history_and_stock(self):
+        result = import_delivery(self.csv(
+            'Название товара;Количество;Цена\n'
+            'цемент  м500;10;12,50\n'
+            'Кирпич;5;3\n'
+            '\n'
+            'Цемент М500;2;13\n'
+        ))
+
+        self.assertTrue(result.ok)
+        self.assertEqual((result.rows, result.created), (3, 3))
+        self.assertEqual(
+            sorted(Batch.objects.values_list('product__name', 'quantity', 'price')),
+            [('Кирпич', 5, 3), ('Цемент М500', 2, 13), ('Цемент М500', 10, Decimal('12.50'))],
+        )
+        self.assertEqual(Product.objects.get(pk=self.cement.pk).on_hand, 12)
+        self.assertEqual(
+            sorted(BatchGroup.objects.values_list('on_hand', flat=True)), [2, 5, 10]
+        )
+        self.assertEqual(Batch.history.filter(history_type='+').count(), 3)
+
+    def test_errors_are_reported_per_row_and_nothing_is_written(self):
+        result = import_delivery(self.csv(
+            'ID товара,Количество,Цена\n'
+            f'{self.cement.pk},10,5\n'
+            '999,1,5\n'
+            f'{self.bricks.pk},0,-1\n'
+        ))
+
+        self.assertEqual(result.created, 0)
+        self.assertFalse(Batch.objects.exists())
+        self.assertEqual([line for line, message in result.errors], [3, 4])
+        self.assertIn('Товар #999 не найден', result.errors[0][1])
+        self.assertIn('Количество', result.errors[1][1])
+        self.assertIn('Цена', result.errors[1][1])
+
+        partial = import_delivery(self.csv(
+            f'ID товара,Количество,Цена\n{self.cement.pk},10,5\n999,1,5\n'
+        ), partial=True)
+        self.assertEqual((partial.created, len(partial.errors)), (1, 1))
+
+    def test_xlsx_upload_in_chunks(self):
+        rows = [[self.bricks.name, number % 7 + 1, '2.5'] for number in range(25)]
+        data = b''.join(stream_xlsx(['Название товара', 'Количество', 'Цена'], rows))
+
+        result = import_delivery(BytesIO(data), name='delivery.xlsx', chunk_size=10)
+
+        self.assertEqual(result.created, 25)
+        self.assertEqual(
+            Product.objects.get(pk=self.bricks.pk).on_hand, sum(row[1] for row in rows)
+        )
+
+    def test_upload_page_shows_report(self):
+        self.client.force_login(CustomUser.objects.create(username='manager'))
+
+        response = self.client.post('/crm-system/products-list/import-delivery/', {
+            'file': SimpleUploadedFile('delivery.csv', 'Товар,Количество,Цена\nЩебень,1,1\n'.encode()),
+        })
+
+        self.assertContains(response, 'Товар &quot;Щебень&quot; не найден')
+        self.assertContains(response, 'создано партий: 0,')
+        self.assertContains(response, 'Поставка не загружена')
+        response = self.client.post('/crm-system/products-list/import-delivery/', {
+            'file': SimpleUploadedFile('delivery.csv', 'Наименование,Кол-во\n'.encode()),
+        })
+        self.assertContains(response, 'Нет колонки')
+
+
+class ConsolidationTests(TestCase):
+    def setUp(self):
+        self.store = create_store(products=3, batches_per_product=3, sales_per_batch=2)
+        self.cement = self.store['products'][0]
+        # Отдельная поставка другой группой и распроданная партия
+        self.newest = Batch.objects.create(
+            product=self.cement, group=BatchGroup.objects.create(product=self.cement), price=120, quantity=10
+        )
+        self.sold_out = Batch.objects.create(product=self.cement, group=self.newest.group, price=1, quantity=0)
+
+    def active(self, product):
+        return list(product.batches.filter(quantity__gt=0).values_list('pk', 'quantity'))
+
+    def test_store_wide_merge_into_newest_batch(self):
+        self.assertEqual(consolidate_batches(dry_run=True), (3, 7))
+        manager = CustomUser.objects.create(username='manager')
+
+        with self.assertNumQueries(7):
+            self.assertEqual(consolidate_batches(user=manager), (3, 7))
+
+        self.assertEqual(self.active(self.cement), [(self.newest.pk, 3 * 48 + 10)])
+        for number in (1, 2):
+            newest = self.store['batches'][number * 3 + 2]
+            self.assertEqual(self.active(self.store['products'][number]), [(newest.pk, 3 * 48)])
+        self.assertEqual(Product.objects.get(pk=self.cement.pk).on_hand, 154)
+        self.assertEqual(BatchGroup.objects.get(pk=self.newest.group_id).on_hand, 154)
+        self.assertEqual(reconcile_stock(dry_run=True), (0, 0))
+
+        history = Batch.history.filter(history_change_reason='Консолидация партий')
+        self.assertEqual(history.count(), 3 + 7)
+        self.assertEqual(set(history.values_list('history_user_id', flat=True)), {manager.pk})
+        self.assertEqual(consolidate_batches(), (0, 0))
+
+    def test_scope_by_supplier_and_view(self):
+        # Поставщик 0 у товаров 0 и 2
+        consolidate_batches(Product.objects.filter(supplier__name='Поставщик 1'))
+
+        self.assertEqual(len(self.active(self.store['products'][1])), 1)
+        self.assertEqual(len(self.active(self.cement)), 4)
+
+        self.client.force_login(CustomUser.objects.create(username='manager'))
+        self.client.post(f'/crm-system/products-list/consolidation-batch/{self.cement.pk}/')
+        self.assertEqual(self.active(self.cement), [(self.newest.pk, 154)])
+        self.assertEqual(len(self.active(self.store['products'][2])), 3)
+
+    def test_admin_action(self):
+        self.client.force_login(CustomUser.objects.create(username='admin', is_staff=True, is_superuser=True))
+
+        response = self.client.post('/admin/products/product/', {
+            'action': 'consolidate', '_selected_action': [self.cement.pk],
+        }, follow=True)
+
+        self.assertContains(response, 'товаров 1, обнулено партий 3')
+        self.assertEqual(self.active(self.cement), [(self.newest.pk, 154)])
 
-# Create your tests here.
+    def test_command(self):
+        out = StringIO()
+        call_command('consolidate_batches', '--dry-run', stdout=out)
+        self.assertIn('товаров — 3, партий перенесено в последнюю — 7', out.getvalue())
+        self.assertEqual(len(self.active(self.cement)), 4)
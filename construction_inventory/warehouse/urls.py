@@ -10,4 +10,6 @@ urlpatterns = [
     path('edit-batch/<int:pk>/', views.BatchUpdateInfo.as_view(), name='edit-batch'),
     path('consolidation-batch/<int:pk>/', views.ConsolidationBatch.as_view(), name='consolidation-batch'),
     path('export-xml/', views.export_xlsx, name='export-xml'),
+    path('lookup/', views.BatchLookup.as_view(), name='batch-lookup'),
+    path('import-delivery/', views.ImportDelivery.as_view(), name='import-delivery'),
 ]
\ No newline at end of file
@@ -1,4 +1,5 @@
 from django.db.models import Q
+from django.contrib.auth.mixins import LoginRequiredMixin
 from django.views.generic import ListView, CreateView, UpdateView, DeleteView
 from .models import Batch
 from django.db.models import ProtectedError
@@ -7,20 +8,23 @@ from django.urls import reverse
 from django.contrib import messages
 from django.views import View
 from django.shortcuts import get_object_or_404, redirect
-from .forms import BatchForm, BatchUpdate
+from django.utils import timezone
+from .forms import BatchForm, BatchUpdate, DeliveryImportForm
+from .imports import import_delivery
+from .services import build_supplier_tree, consolidate_batches
 from django.urls import reverse_lazy
-from categories.models import Category
-from supplies.models import Supplier
 from products.models import Product
 from .models import Batch, BatchGroup
 from django.core import serializers
-from django.http import HttpResponse
-from django.utils import timezone
-import openpyxl
-from openpyxl.styles import Font
-from datetime import datetime
+from core import exports, references
+from core.querybudget import query_budget
+from core.views import ImportView
+from core.database import read_only
+from core.lookups import lookup_response
+from core.search import search_filter
 
 
+@query_budget(4)
 class BatchList(ListView):
     model = Batch
     template_name = 'warehouse/products.html'
@@ -39,7 +43,7 @@ class BatchList(ListView):
 
         search_name = self.request.GET.get('search_name')
         if search_name:
-            filters &= Q(product__name__icontains=search_name)
+            filters &= search_filter('product_id', 'product', search_name)
 
         category_id = self.request.GET.get('category')
         if category_id:
@@ -56,71 +60,10 @@ class BatchList(ListView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['categories'] = Category.objects.all().order_by('name')
-        context['suppliers'] = Supplier.objects.all().order_by('name')
+        context['categories'], context['suppliers'] = references.get_many('categories', 'suppliers')
         context['get_params'] = self.request.GET
 
-        product_ids = list(set(Batch.objects.filter(quantity__gt=0).values_list('product_id', flat=True)))
-        products_with_info = []
-
-        for product_id in product_ids:
-            try:
-                product = Product.objects.select_related('category', 'supplier').get(id=product_id)
-            except Product.DoesNotExist:
-                continue
-
-            product_batches = Batch.objects.filter(
-                product_id=product_id,
-                quantity__gt=0
-            ).select_related('group')
-
-            if product_batches.exists():
-                total_quantity = sum(batch.quantity for batch in product_batches)
-                last_batch = product_batches.order_by('-arrival_date').first()
-
-                products_with_info.append({
-                    'product': product,
-                    'total_quantity': total_quantity,
-                    'last_batch': last_batch,
-                    'batches': product_batches
-                })
-
-        if self.request.GET.get('search_name'):
-            search_name = self.request.GET.get('search_name')
-            products_with_info = [p for p in products_with_info if search_name.lower() in p['product'].name.lower()]
-
-        if self.request.GET.get('category'):
-            category_id = int(self.request.GET.get('category'))
-            products_with_info = [p for p in products_with_info if
-                                  p['product'].category and p['product'].category.id == category_id]
-
-        if self.request.GET.get('supplier'):
-            supplier_id = int(self.request.GET.get('supplier'))
-            products_with_info = [p for p in products_with_info if
-                                  p['product'].supplier and p['product'].supplier.id == supplier_id]
-
-        suppliers_dict = {}
-        for product_info in products_with_info:
-            supplier = product_info['product'].supplier
-            supplier_name = supplier.name if supplier else 'Без поставщика'
-            supplier_id = supplier.id if supplier else 'no_supplier'
-
-            if supplier_id not in suppliers_dict:
-                suppliers_dict[supplier_id] = {
-                    'supplier': supplier,
-                    'supplier_name': supplier_name,
-                    'products': []
-                }
-
-            suppliers_dict[supplier_id]['products'].append(product_info)
-
-        suppliers_list = []
-        for supplier_id in sorted(suppliers_dict.keys(), key=lambda x: suppliers_dict[x]['supplier_name']):
-            supplier_data = suppliers_dict[supplier_id]
-            supplier_data['products'].sort(key=lambda x: x['product'].name)
-            suppliers_list.append(supplier_data)
-
-        context['suppliers_list'] = suppliers_list
+        context['suppliers_list'] = build_supplier_tree(self.object_list)
         return context
 
 class CreateBatch(CreateView):
@@ -131,7 +74,6 @@ class CreateBatch(CreateView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['all_products'] = Product.objects.select_related('category', 'supplier').all().order_by('name')
         context['title'] = 'Провести новую поставку'
         context['action'] = 'Создать поставку'
         context['theme'] = 'green'
@@ -146,6 +88,21 @@ class CreateBatch(CreateView):
         form.save()
         return super().form_valid(form)
 
+@query_budget(9)
+class ImportDelivery(ImportView):
+    """
+    Загрузка поставки файлом вместо поштучного CreateBatch. Ответ —
+    та же страница с отчётом: сколько партий создано и ошибки по строкам.
+    """
+    form_class = DeliveryImportForm
+    template_name = 'warehouse/import_delivery.html'
+    submit_label = 'Загрузить поставку'
+    created_label = 'Создано партий'
+    failed_message = 'Поставка не загружена'
+
+    def run_import(self, upload, partial):
+        return import_delivery(upload.file, name=upload.name, user=self.request.user, partial=partial)
+
 class DeleteBatch(DeleteView):
     model = Batch
     template_name = 'products/modal_delete.html'
@@ -175,24 +132,14 @@ class DeleteBatch(DeleteView):
             return self.render_to_response(context)
 
 
+@query_budget(10)
 class ConsolidationBatch(View):
     def post(self, request, pk):
         product = get_object_or_404(Product, id=pk)
 
-        batches = product.batches.filter(quantity__gt=0).order_by('arrival_date')
-
-        if batches.exists():
-            last_batch = batches.last()
-
-            other_batches = batches.exclude(id=last_batch.id)
-            total_quantity = sum(batch.quantity for batch in other_batches)
-
-            if total_quantity > 0:
-                last_batch.quantity += total_quantity
-                last_batch.save()
-
-                other_batches.update(quantity=0)
-
+        if product.batches.filter(quantity__gt=0).exists():
+            merged, emptied = consolidate_batches(Product.objects.filter(pk=product.pk), user=request.user)
+            if merged:
                 messages.success(request, f'Поставки товара "{product.name}" объединены в последнюю партию!')
             else:
                 messages.info(request, f'Нет поставок для объединения у товара "{product.name}"')
@@ -222,76 +169,40 @@ class BatchUpdateInfo(UpdateView):
         messages.success(self.request, 'Партия успешно обновлена!')
         return super().form_valid(form)
 
-def export_xlsx(request):
-    batch_list_view = BatchList()
-    batch_list_view.request = request
-    queryset = batch_list_view.get_queryset()
-
-    print(queryset)
-
-    queryset = queryset.select_related('product', 'group')
-
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Складские партии"
-
-    headers = [
-        'Название товара',
-        'ID товара',
-        'Цена',
-        'Количество',
-        'Дата поступления'
-    ]
-
-    for col_num, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col_num, value=header)
-        cell.font = Font(bold=True)
-
-    for row_num, batch in enumerate(queryset, 2):
-        # Column 1: Product ID
-        if batch.product:
-            ws.cell(row=row_num, column=2, value=batch.product.pk)
-        else:
-            ws.cell(row=row_num, column=2, value="")
+@query_budget(3)
+class BatchLookup(LoginRequiredMixin, View):
+    """
+    Подсказки активных партий (например, для чека по конкретной партии).
+
+    GET ?q=цем&after=<курсор> — партии в порядке FIFO по товару, по
+    частичному индексу batch_active_fifo_idx. Подпись собирается в Python:
+    дата поставки показывается по местному времени.
+    """
+
+    @staticmethod
+    def describe(row):
+        arrival = timezone.localtime(row['arrival_date'])
+        return {
+            'id': row['id'],
+            'product': row['product'],
+            'arrival_date': row['arrival_date'],
+            'quantity': row['quantity'],
+            'label': f'Партия #{row["id"]} — {row["product__name"]}',
+            'details': f'{row["quantity"]} шт. по {row["price"]:.2f} BYN, поставка {arrival.strftime("%d.%m.%Y")}',
+        }
+
+    def get(self, request):
+        queryset = Batch.objects.filter(
+            search_filter('product_id', 'product', request.GET.get('q')),
+            quantity__gt=0,
+        )
+        return lookup_response(
+            request, queryset, ('product', 'arrival_date', 'id'),
+            ['id', 'product', 'product__name', 'arrival_date', 'quantity', 'price'],
+            describe=self.describe,
+        )
 
-        # Column 2: Product Name
-        if batch.product:
-            ws.cell(row=row_num, column=1, value=str(batch.product))
-        else:
-            ws.cell(row=row_num, column=1, value="No product")
-
-        # Column 3: Price
-        ws.cell(row=row_num, column=3, value=float(batch.price))
-
-        # Column 4: Quantity
-        ws.cell(row=row_num, column=4, value=batch.quantity)
-
-        # Column 5: Arrival Date
-        arrival_date = batch.arrival_date
-        if arrival_date:
-            if hasattr(arrival_date, 'replace') and arrival_date.tzinfo is not None:
-                arrival_date = arrival_date.replace(tzinfo=None)
-            elif hasattr(arrival_date, 'date') and not hasattr(arrival_date, 'time'):
-                arrival_date = datetime.combine(arrival_date, datetime.min.time())
-        ws.cell(row=row_num, column=5, value=arrival_date)
-
-    for column in ws.columns:
-        max_length = 0
-        column_letter = column[0].column_letter
-        for cell in column:
-            try:
-                if len(str(cell.value)) > max_length:
-                    max_length = len(str(cell.value))
-            except:
-                pass
-        adjusted_width = min(max_length + 2, 50)
-        ws.column_dimensions[column_letter].width = adjusted_width
-
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-    response[
-        'Content-Disposition'] = f'attachment; filename="warehouse_export_{timezone.now().strftime("%Y-%m-%d")}.xlsx"'
-
-    wb.save(response)
-    return response
\ No newline at end of file
+@read_only
+def export_xlsx(request):
+    export = exports.get_export('warehouse')
+    return exports.export_response(export, exports.get_format('xlsx'), export.get_view(request))